@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Acquisition timestamps for sensor readings.
+
+A ``Reading`` is a value together with the moment it was acquired, both as
+``time.monotonic_ns()`` (for ages, immune to wall-clock steps) and as
+``time.time_ns()`` (for the record). Readers that answer from a cache
+return the ``Reading`` of the original acquisition, so a cached value
+keeps its true age instead of looking fresh; readers that return plain
+values are stamped the moment the read returns.
+"""
+
+import time
+from collections import namedtuple
+
+Reading = namedtuple('Reading', 'value monotonic_ns wall_ns')
+
+
+def stamp(value):
+    """``Reading`` of ``value`` acquired now."""
+    return Reading(value, time.monotonic_ns(), time.time_ns())
+
+
+def acquire(read):
+    """Call ``read`` and return its result as a ``Reading`` (stamped on return unless it is one)."""
+    value = read()
+    return value if isinstance(value, Reading) else stamp(value)
+
+
+def unwrap(value):
+    """The plain value of a ``Reading``, anything else unchanged."""
+    return value.value if isinstance(value, Reading) else value
+
+
+def age(reading, now_ns=None):
+    """Seconds since ``reading`` was acquired."""
+    now_ns = time.monotonic_ns() if now_ns is None else now_ns
+    return (now_ns - reading.monotonic_ns) / 1e9
@@ -3,6 +3,13 @@ import time
 import requests
 import smbus2
 import struct
+import os
+import sys
+
+# crc.py lives in the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from crc import crc8  # noqa: E402
 
 # ENV III Module addresses
 SHT30_ADDR = 0x44
@@ -17,18 +24,6 @@ INTERVAL = 60  # seconds
 bus = smbus2.SMBus(13)
 print("Using I2C bus 13")
 
-def crc8(data):
-    """Calculate CRC8 for SHT30"""
-    crc = 0xFF
-    for byte in data:
-        crc ^= byte
-        for _ in range(8):
-            if crc & 0x80:
-                crc = (crc << 1) ^ 0x31
-            else:
-                crc = crc << 1
-    return crc & 0xFF
-
 def read_sht30():
     """Read SHT30 temperature and humidity sensor"""
     try:
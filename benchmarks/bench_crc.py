@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Benchmark SHT30 CRC-8 validation: bitwise loop vs. table vs. NumPy bulk.
+
+Usage: python benchmarks/bench_crc.py [frames]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from crc import crc8, crc8_bitwise, validate_frames  # noqa: E402
+
+
+def _bench(label, fn, frames):
+    started = time.perf_counter()
+    valid = fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<22} {elapsed * 1000:9.2f} ms  {elapsed / frames * 1e9:8.0f} ns/frame  valid={valid}")
+    return elapsed
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    buf = bytearray(os.urandom(frames * 6))
+    for i in range(0, len(buf), 6):
+        buf[i + 2] = crc8_bitwise(buf[i:i + 2])
+        buf[i + 5] = crc8_bitwise(buf[i + 3:i + 5])
+    buf = bytes(buf)
+
+    def per_frame(crc):
+        def run():
+            valid = 0
+            for i in range(0, len(buf), 6):
+                if crc(buf[i:i + 2]) == buf[i + 2] and crc(buf[i + 3:i + 5]) == buf[i + 5]:
+                    valid += 1
+            return valid
+        return run
+
+    validate_frames(buf[:6])  # import NumPy outside the timed section
+    print(f"Validating {frames} SHT30 frames")
+    base = _bench("bitwise (old)", per_frame(crc8_bitwise), frames)
+    table = _bench("table", per_frame(crc8), frames)
+    bulk = _bench("numpy validate_frames", lambda: int(validate_frames(buf).sum()), frames)
+    print(f"speedup: table {base / table:.1f}x, numpy {base / bulk:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
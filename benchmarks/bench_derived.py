@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Benchmark derived metrics over a year of 1-minute readings: vectorized
+arrays vs. a per-reading Python loop, as a history backfill would run.
+
+Usage: python benchmarks/bench_derived.py [days]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np  # noqa: E402
+
+from derived import absolute_humidity, dew_point, heat_index  # noqa: E402
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 365
+    rows = days * 24 * 60
+    rng = np.random.default_rng(1)
+    temps = rng.uniform(-10, 35, rows)
+    hums = rng.uniform(20, 100, rows)
+
+    started = time.perf_counter()
+    for fn in (dew_point, absolute_humidity, heat_index):
+        fn(temps, hums)
+    bulk = time.perf_counter() - started
+    print(f"vectorized: {rows} rows x 3 metrics in {bulk * 1e3:.1f} ms")
+
+    sample = 10_000
+    started = time.perf_counter()
+    for t, h in zip(temps[:sample].tolist(), hums[:sample].tolist()):
+        dew_point(t, h), absolute_humidity(t, h), heat_index(t, h)
+    loop = (time.perf_counter() - started) / sample * rows
+    print(f"scalar loop (extrapolated from {sample}): {loop:.1f} s, {loop / bulk:.0f}x slower")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Benchmark the memory-mapped history store: append a year of 1-minute
+readings for all station fields, then scan it.
+
+Usage: python benchmarks/bench_history.py [days]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np  # noqa: E402
+
+from history_store import HistoryStore  # noqa: E402
+
+
+def _disk_usage(directory):
+    return sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 365
+    rows = days * 24 * 60
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as directory:
+        store = HistoryStore(directory)
+        started = time.perf_counter()
+        for i in range(rows):
+            store.append(1760000000 + 60 * i, {
+                'temperature_indoor': rng.uniform(18, 26), 'humidity_indoor': rng.uniform(30, 60),
+                'pressure': rng.uniform(990, 1030),
+                'temperature_outdoor': rng.uniform(-10, 30), 'humidity_outdoor': rng.uniform(20, 100),
+            })
+        elapsed = time.perf_counter() - started
+        store.flush()
+        print(f"append: {rows} rows, {elapsed / rows * 1e6:.2f} us/row, "
+              f"{_disk_usage(directory) / 1e6:.1f} MB on disk ({len(store)} rows kept)")
+
+        started = time.perf_counter()
+        lo = min(float(c['temperature_outdoor'].min()) for c in store.chunks())
+        hi = max(float(c['temperature_outdoor'].max()) for c in store.chunks())
+        scan = time.perf_counter() - started
+        print(f"scan (zero-copy min/max over all chunks): {scan * 1e3:.2f} ms, raw {lo:.0f}..{hi:.0f}")
+
+        started = time.perf_counter()
+        ts, values = store.read('temperature_outdoor')
+        mean = float(np.nanmean(values))
+        read = time.perf_counter() - started
+        print(f"read + scale + nanmean: {read * 1e3:.2f} ms for {len(ts)} rows, mean {mean:.2f}")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Benchmark upload payload encodings: JSON (current) vs. payload_codec v1
+records, per reading and for a gzip'd batch.
+
+Usage: python benchmarks/bench_payload.py [readings]
+"""
+
+import gzip
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from payload import build_payload  # noqa: E402
+from payload_codec import encode_record, encode_records  # noqa: E402
+
+
+def _bench(label, encode, payloads):
+    started = time.perf_counter()
+    sizes = [len(encode(p)) for p in payloads]
+    elapsed = time.perf_counter() - started
+    mean = sum(sizes) / len(sizes)
+    print(f"{label:<16} {mean:7.1f} B/reading  {elapsed / len(payloads) * 1e6:7.2f} us/reading")
+    return mean, elapsed
+
+
+def main():
+    readings = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(1)
+    payloads = [
+        build_payload(rng.uniform(18, 26), rng.uniform(30, 60), rng.uniform(990, 1030),
+                      rng.uniform(-10, 30), rng.uniform(20, 100), timestamp=1760000000 + 60 * i)
+        for i in range(readings)
+    ]
+
+    print(f"Encoding {readings} full readings (indoor + outdoor + pressure)")
+    json_size, json_time = _bench("json", lambda p: json.dumps(p).encode('utf-8'), payloads)
+    bin_size, bin_time = _bench("binary v1", encode_record, payloads)
+    print(f"binary: {json_size / bin_size:.1f}x smaller, {json_time / bin_time:.1f}x faster to encode")
+
+    # A day of minute readings as one compressed batch
+    day = payloads[:1440]
+    json_batch = gzip.compress(json.dumps(day, separators=(',', ':')).encode('utf-8'))
+    bin_batch = gzip.compress(encode_records(day))
+    print(f"1440-reading batch, gzip: json {len(json_batch)} B, binary {len(bin_batch)} B")
+
+
+if __name__ == "__main__":
+    main()
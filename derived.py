@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Derived weather metrics and unit conversions.
+
+Every function takes scalars or NumPy arrays (broadcast against each
+other) and computes without Python-level loops, so the same code fills in
+one reading and recomputes a year of history in one call. Scalar inputs
+give a plain ``float`` (or ``str``) back; array inputs give arrays.
+
+Inputs outside a formula's domain give NaN (e.g. humidity <= 0 for the
+dew point) instead of raising, so one bad row does not spoil a backfill.
+"""
+
+import numpy as np
+
+# Magnus coefficients over water (Alduchov & Eskridge 1996), -45..60 °C
+MAGNUS_A = 17.62
+MAGNUS_B = 243.12
+MAGNUS_E0 = 6.112  # hPa, saturation vapour pressure at 0 °C
+
+COMPASS_POINTS = np.array([
+    "N", "NNE", "NE", "ENE",
+    "E", "ESE", "SE", "SSE",
+    "S", "SSW", "SW", "WSW",
+    "W", "WNW", "NW", "NNW",
+])
+
+
+def _result(value):
+    """Plain Python scalar for scalar input, the array otherwise."""
+    return value.item() if np.ndim(value) == 0 else value
+
+
+def celsius_to_fahrenheit(celsius):
+    return _result(np.asarray(celsius, dtype=np.float64) * 9 / 5 + 32)
+
+
+def fahrenheit_to_celsius(fahrenheit):
+    return _result((np.asarray(fahrenheit, dtype=np.float64) - 32) * 5 / 9)
+
+
+def hpa_to_inhg(hpa):
+    return _result(np.asarray(hpa, dtype=np.float64) * 0.02953)
+
+
+def inhg_to_hpa(inhg):
+    return _result(np.asarray(inhg, dtype=np.float64) / 0.02953)
+
+
+def ms_to_kmh(ms):
+    return _result(np.asarray(ms, dtype=np.float64) * 3.6)
+
+
+def kmh_to_ms(kmh):
+    return _result(np.asarray(kmh, dtype=np.float64) / 3.6)
+
+
+def saturation_vapour_pressure(temp_c):
+    """Saturation vapour pressure over water (hPa), Magnus formula."""
+    t = np.asarray(temp_c, dtype=np.float64)
+    return _result(MAGNUS_E0 * np.exp(MAGNUS_A * t / (MAGNUS_B + t)))
+
+
+def dew_point(temp_c, humidity_rh):
+    """Dew point (°C), Magnus formula."""
+    t = np.asarray(temp_c, dtype=np.float64)
+    rh = np.asarray(humidity_rh, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gamma = MAGNUS_A * t / (MAGNUS_B + t) + np.log(rh / 100.0)
+        dp = MAGNUS_B * gamma / (MAGNUS_A - gamma)
+    return _result(np.where(rh > 0, dp, np.nan))
+
+
+def absolute_humidity(temp_c, humidity_rh):
+    """Water vapour density (g/m³) from temperature and relative humidity."""
+    t = np.asarray(temp_c, dtype=np.float64)
+    rh = np.asarray(humidity_rh, dtype=np.float64)
+    vapour_hpa = MAGNUS_E0 * np.exp(MAGNUS_A * t / (MAGNUS_B + t)) * rh / 100.0
+    # rho = e / (R_v * T) with R_v = 461.5 J/(kg K): e in hPa to g/m³ is e * 1e5 / 461.5 / T
+    return _result(np.where(rh >= 0, vapour_hpa * 216.7 / (273.15 + t), np.nan))
+
+
+def heat_index(temp_c, humidity_rh):
+    """Heat index (°C), NWS algorithm.
+
+    Steadman's simple formula (averaged with the air temperature) where
+    that stays below 80 °F, otherwise the Rothfusz regression with the NWS
+    low- and high-humidity adjustments. Below about 27 °C the result stays
+    close to the air temperature.
+    """
+    T = np.asarray(celsius_to_fahrenheit(temp_c), dtype=np.float64)
+    R = np.asarray(humidity_rh, dtype=np.float64)
+    simple = 0.5 * (T + 61.0 + (T - 68.0) * 1.2 + R * 0.094)
+    hi = (
+        -42.379
+        + 2.04901523 * T
+        + 10.14333127 * R
+        - 0.22475541 * T * R
+        - 0.00683783 * T * T
+        - 0.05481717 * R * R
+        + 0.00122874 * T * T * R
+        + 0.00085282 * T * R * R
+        - 0.00000199 * T * T * R * R
+    )
+    with np.errstate(invalid='ignore'):
+        dry = (R < 13) & (T >= 80) & (T <= 112)
+        hi = hi - np.where(dry, (13 - R) / 4 * np.sqrt(np.clip(17 - np.abs(T - 95), 0, None) / 17), 0)
+    humid = (R > 85) & (T >= 80) & (T <= 87)
+    hi = hi + np.where(humid, (R - 85) / 10 * (87 - T) / 5, 0)
+    simple = (simple + T) / 2
+    hi = np.where(simple < 80, simple, hi)
+    return fahrenheit_to_celsius(hi)
+
+
+def wind_chill(temp_c, wind_kmh):
+    """Wind chill (°C), Environment Canada / NWS index.
+
+    Defined for T <= 10 °C and wind >= 4.8 km/h; elsewhere the air
+    temperature is returned.
+    """
+    t = np.asarray(temp_c, dtype=np.float64)
+    v = np.asarray(wind_kmh, dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        v16 = np.power(v, 0.16)
+    wc = 13.12 + 0.6215 * t - 11.37 * v16 + 0.3965 * t * v16
+    return _result(np.where((t <= 10) & (v >= 4.8), wc, t))
+
+
+def degrees_to_compass(degrees):
+    """16-point compass label ("N", "NNE", ...) for a wind direction in degrees."""
+    d = np.asarray(degrees, dtype=np.float64)
+    index = ((d % 360 + 11.25) // 22.5).astype(np.int64) % 16
+    return _result(COMPASS_POINTS[index])
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+DHT22 sensor backends for the weather station.
+
+The adafruit_dht driver starts a libgpiod pulse-in helper every time a
+DHT22 object is created, so the backend keeps one handle open for the life
+of the process and only rebuilds it after repeated failures.
+
+When the kernel dht11 driver is loaded (``dtoverlay=dht22,gpiopin=24``) the
+bit timing happens in the kernel and the sysfs backend only reads two small
+attribute files through cached file descriptors.
+"""
+
+import glob
+import os
+import time
+
+
+class DHT22Backend:
+    """Long-lived adafruit_dht DHT22 handle with read scheduling.
+
+    The sensor must not be polled more than once every ``min_interval``
+    seconds. Instead of sleeping a fixed time before each read, the backend
+    remembers when the next read is allowed and only waits for the remainder.
+    """
+
+    MIN_INTERVAL = 2.0
+
+    def __init__(self, pin='D24', use_pulseio=None, min_interval=MIN_INTERVAL,
+                 attempts=3, max_failures=5, factory=None,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.pin = pin
+        self.use_pulseio = use_pulseio
+        self.min_interval = min_interval
+        self.attempts = attempts
+        self.max_failures = max_failures
+        self._factory = factory or self._adafruit_factory
+        self._clock = clock
+        self._sleep = sleep
+
+        self._dht = None
+        self._next_read = 0.0
+        self.consecutive_failures = 0
+        self.reopens = 0
+        self.last_error = None
+
+    def _adafruit_factory(self):
+        import board
+        import adafruit_dht
+
+        pin = getattr(board, self.pin)
+        if self.use_pulseio is None:
+            return adafruit_dht.DHT22(pin)
+        return adafruit_dht.DHT22(pin, use_pulseio=self.use_pulseio)
+
+    @property
+    def is_open(self):
+        return self._dht is not None
+
+    def open(self):
+        """Create the driver handle if it does not exist yet."""
+        if self._dht is None:
+            self._dht = self._factory()
+        return self
+
+    def close(self):
+        """Release the driver handle and its pulse-in helper process."""
+        if self._dht is not None:
+            try:
+                self._dht.exit()
+            except Exception:
+                pass
+            self._dht = None
+
+    def reopen(self):
+        self.close()
+        self.reopens += 1
+        self.consecutive_failures = 0
+        return self.open()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def wait_time(self):
+        """Seconds until the sensor may be read again."""
+        return max(0.0, self._next_read - self._clock())
+
+    def _read_once(self):
+        remaining = self.wait_time()
+        if remaining:
+            self._sleep(remaining)
+        try:
+            temperature = self._dht.temperature
+            humidity = self._dht.humidity
+        finally:
+            self._next_read = self._clock() + self.min_interval
+        return temperature, humidity
+
+    def read(self):
+        """Return ``(temperature, humidity)`` or ``(None, None)``.
+
+        Transient ``RuntimeError``s (checksum, missed edges) are retried on the
+        read schedule and kept in ``last_error``. The handle is only rebuilt
+        after ``max_failures`` consecutive failed reads.
+        """
+        self.open()
+        for _ in range(self.attempts):
+            try:
+                temperature, humidity = self._read_once()
+            except RuntimeError as e:
+                self.last_error = e
+                continue
+            if temperature is not None and humidity is not None:
+                self.consecutive_failures = 0
+                return temperature, humidity
+
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.max_failures:
+            self.reopen()
+        return None, None
+
+
+# (device glob, temperature attribute, humidity attribute); values are milli-units
+SYSFS_NODES = (
+    ('sys/bus/iio/devices/iio:device*', 'in_temp_input', 'in_humidityrelative_input'),
+    ('sys/class/hwmon/hwmon*', 'temp1_input', 'humidity1_input'),
+)
+
+
+def find_sysfs_node(root='/'):
+    """Return ``(temp_path, humidity_path)`` of a kernel DHT device, or ``None``."""
+    for pattern, temp_attr, hum_attr in SYSFS_NODES:
+        for device in sorted(glob.glob(os.path.join(root, pattern))):
+            try:
+                with open(os.path.join(device, 'name')) as f:
+                    name = f.read().strip().lower()
+            except OSError:
+                continue
+            if not name.startswith('dht'):
+                continue
+            temp_path = os.path.join(device, temp_attr)
+            hum_path = os.path.join(device, hum_attr)
+            if os.path.exists(temp_path) and os.path.exists(hum_path):
+                return temp_path, hum_path
+    return None
+
+
+class DHT22SysfsBackend:
+    """DHT22 read through the kernel dht11 driver (IIO or hwmon sysfs).
+
+    The device node is discovered once and both attribute files stay open;
+    each read is two ``os.pread`` calls at offset 0. The driver itself
+    rate-limits the sensor and returns ``EIO``/``ETIMEDOUT`` on a bad
+    transfer, which is reported as a failed read.
+    """
+
+    def __init__(self, root='/', attempts=2, max_failures=5):
+        self.root = root
+        self.attempts = attempts
+        self.max_failures = max_failures
+
+        self.paths = None
+        self._fds = None
+        self.consecutive_failures = 0
+        self.reopens = 0
+        self.last_error = None
+
+    @property
+    def is_open(self):
+        return self._fds is not None
+
+    def open(self):
+        if self._fds is None:
+            if self.paths is None:
+                self.paths = find_sysfs_node(self.root)
+                if self.paths is None:
+                    raise FileNotFoundError(f"No kernel DHT device found under {self.root}")
+            self._fds = tuple(os.open(path, os.O_RDONLY) for path in self.paths)
+        return self
+
+    def close(self):
+        if self._fds is not None:
+            for fd in self._fds:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+            self._fds = None
+
+    def reopen(self):
+        self.close()
+        self.reopens += 1
+        self.consecutive_failures = 0
+        return self.open()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _read_once(self):
+        temp_fd, hum_fd = self._fds
+        temperature = int(os.pread(temp_fd, 16, 0)) / 1000.0
+        humidity = int(os.pread(hum_fd, 16, 0)) / 1000.0
+        return temperature, humidity
+
+    def read(self):
+        """Return ``(temperature, humidity)`` or ``(None, None)``."""
+        self.open()
+        for _ in range(self.attempts):
+            try:
+                reading = self._read_once()
+            except (OSError, ValueError) as e:
+                self.last_error = e
+                continue
+            self.consecutive_failures = 0
+            return reading
+
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.max_failures:
+            self.reopen()
+        return None, None
+
+
+def open_dht22_backend(pin='D24', sysfs_root='/', use_pulseio=None, **kwargs):
+    """Prefer the kernel driver when it is loaded, else fall back to adafruit_dht."""
+    if find_sysfs_node(sysfs_root) is not None:
+        return DHT22SysfsBackend(root=sysfs_root, **kwargs)
+    return DHT22Backend(pin=pin, use_pulseio=use_pulseio, **kwargs)
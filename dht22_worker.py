@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Long-lived DHT22 worker process.
+
+The GPIO bit-banging runs in a separate interpreter so a driver crash or
+hang cannot take down the station, but unlike a fresh ``python -c`` per
+read the worker stays warm: board/adafruit_dht are imported once and the
+sensor handle stays open.
+
+Protocol (stdin/stdout pipes): every message is a 4-byte big-endian length
+followed by a UTF-8 JSON object. The parent sends ``{"cmd": "read"}`` and
+gets ``{"ok": true, "temperature": t, "humidity": h}`` or
+``{"ok": false, "error": "..."}`` back. ``{"cmd": "exit"}`` stops the worker.
+
+Usage: python dht22_worker.py [--pin D4] [--use-pulseio true|false]
+"""
+
+import json
+import os
+import select
+import signal
+import struct
+import subprocess
+import sys
+import time
+
+HEADER = struct.Struct('>I')
+MAX_FRAME = 64 * 1024
+
+
+class WorkerError(Exception):
+    """The worker died, hung or sent a malformed frame."""
+
+
+def encode_frame(message):
+    body = json.dumps(message).encode('utf-8')
+    return HEADER.pack(len(body)) + body
+
+
+def _read_exact(rfile, size):
+    data = b''
+    while len(data) < size:
+        chunk = rfile.read(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def read_frame(rfile):
+    """Read one frame from a binary file object; ``None`` on clean EOF."""
+    header = _read_exact(rfile, HEADER.size)
+    if header is None:
+        return None
+    (size,) = HEADER.unpack(header)
+    if size > MAX_FRAME:
+        raise WorkerError(f"Frame of {size} bytes exceeds limit")
+    body = _read_exact(rfile, size)
+    if body is None:
+        raise WorkerError("Truncated frame")
+    return json.loads(body.decode('utf-8'))
+
+
+def handle(backend, request):
+    cmd = request.get('cmd')
+    if cmd == 'ping':
+        return {'ok': True}
+    if cmd != 'read':
+        return {'ok': False, 'error': f"unknown command {cmd!r}"}
+    try:
+        temperature, humidity = backend.read()
+    except Exception as e:
+        backend.close()
+        return {'ok': False, 'error': str(e)}
+    if temperature is None or humidity is None:
+        return {'ok': False, 'error': str(getattr(backend, 'last_error', None) or 'no reading')}
+    return {'ok': True, 'temperature': temperature, 'humidity': humidity}
+
+
+def serve(backend, rfile, wfile):
+    """Answer requests until EOF or an ``exit`` command."""
+    try:
+        while True:
+            request = read_frame(rfile)
+            if request is None or request.get('cmd') == 'exit':
+                break
+            wfile.write(encode_frame(handle(backend, request)))
+            wfile.flush()
+    finally:
+        backend.close()
+
+
+class DHT22WorkerClient:
+    """Parent side: owns the worker process and restarts it when needed.
+
+    ``argv`` is the worker command line. A request that gets no answer
+    within ``deadline`` seconds kills the worker; the next request starts a
+    fresh one.
+    """
+
+    def __init__(self, argv, deadline=10.0, log=print):
+        self.argv = list(argv)
+        self.deadline = deadline
+        self.log = log
+        self._proc = None
+        self.restarts = 0
+        self.timeouts = 0
+        self.last_error = None
+
+    @property
+    def pid(self):
+        return self._proc.pid if self._proc is not None else None
+
+    def start(self):
+        if self._proc is None or self._proc.poll() is not None:
+            if self._proc is not None:
+                self.restarts += 1
+            self._proc = subprocess.Popen(
+                self.argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=0)
+        return self
+
+    def stop(self):
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            if proc.poll() is None:
+                proc.stdin.write(encode_frame({'cmd': 'exit'}))
+                proc.wait(timeout=2)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        self._kill(proc)
+
+    @staticmethod
+    def _kill(proc):
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        for pipe in (proc.stdin, proc.stdout):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+
+    def _read_with_deadline(self, size, end):
+        fd = self._proc.stdout.fileno()
+        data = b''
+        while len(data) < size:
+            remaining = end - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                raise TimeoutError
+            chunk = os.read(fd, size - len(data))
+            if not chunk:
+                raise WorkerError("Worker exited")
+            data += chunk
+        return data
+
+    def request(self, message):
+        """Send one request and return the reply, restarting the worker on failure."""
+        self.start()
+        end = time.monotonic() + self.deadline
+        try:
+            self._proc.stdin.write(encode_frame(message))
+            (size,) = HEADER.unpack(self._read_with_deadline(HEADER.size, end))
+            if size > MAX_FRAME:
+                raise WorkerError(f"Frame of {size} bytes exceeds limit")
+            return json.loads(self._read_with_deadline(size, end).decode('utf-8'))
+        except TimeoutError:
+            self.timeouts += 1
+            self.log(f"DHT22 worker (pid {self.pid}) hung for {self.deadline}s - restarting")
+            self._kill(self._proc)
+            raise WorkerError("Worker timed out") from None
+        except (OSError, ValueError, WorkerError) as e:
+            self._kill(self._proc)
+            raise WorkerError(f"Worker failed: {e}") from None
+
+    def read(self):
+        """Return ``(temperature, humidity)`` or ``(None, None)``."""
+        try:
+            reply = self.request({'cmd': 'read'})
+        except WorkerError as e:
+            self.last_error = str(e)
+            return None, None
+        if not reply.get('ok'):
+            self.last_error = reply.get('error')
+            return None, None
+        return reply['temperature'], reply['humidity']
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    import argparse
+
+    from dht22_backend import open_dht22_backend
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--pin', default='D4')
+    parser.add_argument('--use-pulseio', choices=('true', 'false'), default=None)
+    args = parser.parse_args(argv)
+
+    # The parent owns the terminal; don't die with it on Ctrl+C before cleanup
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # stdout carries the protocol; stray prints from libraries go to stderr
+    rfile, wfile = sys.stdin.buffer, sys.stdout.buffer
+    sys.stdout = sys.stderr
+
+    use_pulseio = None if args.use_pulseio is None else args.use_pulseio == 'true'
+    backend = open_dht22_backend(pin=args.pin, use_pulseio=use_pulseio)
+    serve(backend, rfile, wfile)
+
+
+if __name__ == "__main__":
+    main()
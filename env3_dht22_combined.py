@@ -1,44 +1,182 @@
 #!/usr/bin/env python3
 import time
-import requests
 import smbus2
 import struct
 import os
 import subprocess
+import sqlite3
+import asyncio
+import threading
+
+from station_engine import StationEngine
+from dht22_backend import open_dht22_backend
+from sht30 import SHT30
+from qmp6988 import QMP6988
+from payload import add_acquisition, build_payload, describe
+from acquisition import age, stamp, unwrap
+from payload_codec import MEDIA_TYPE, encode_record
+from outbox import Outbox
+from uploader import BatchTransport, UploadSession
+from sinks import CallableSink, FanOut, NDJSONFileSink, StatsDSink
+from mqtt_publisher import MQTTPublisher, MQTTSink
+from reporting import DeadbandPolicy, ReadingLog
+from history_store import HistoryStore
+from rolling_stats import RollingStats
+from rollup import Rollup
+from hampel import DEFAULT_FLOORS, HampelStage
+from sampling_plan import SamplingPlan
+from retry import CLOSED, CircuitBreaker, UploadRetry
 
 # ENV III Module addresses (Indoor sensor)
 SHT30_ADDR = 0x44
 QMP6988_ADDR = 0x70
+QMP6988_PROFILE = "balanced"  # fast | balanced | storm-watch | low-power
+
+# SHT30 periodic acquisition rate in measurements per second (0.5, 1, 2, 4, 10);
+# None uses single-shot measurements
+SHT30_PERIODIC_MPS = 1
 
 # DHT22 Configuration (Outdoor sensor)
 DHT22_GPIO = 24  # GPIO24 (Pin 18) - with 5V power!
 
-# DHT22 cached values and timing
-last_dht22_temp = None
-last_dht22_humidity = None
-last_dht22_read_time = 0
+# Last good DHT22 reading (acquisition.Reading), handed out again while recent
+last_dht22 = None
 DHT22_CACHE_DURATION = 30  # Use cached value for 30 seconds
+DHT22_MAX_FAILURES = 5  # Re-create the driver handle after this many failed reads in a row
+
+# One long-lived driver handle; opened lazily on the first read. Uses the kernel
+# dht11 driver (dtoverlay=dht22,gpiopin=24) when loaded, else adafruit_dht.
+dht22 = open_dht22_backend(pin=f"D{DHT22_GPIO}", max_failures=DHT22_MAX_FAILURES)
 
 # Server Configuration
 SERVER_URL = "https://mrx3k1.de/weather-tracker/weather-tracker"
 REQUEST_TIMEOUT = 10
-INTERVAL = 60  # seconds
+INTERVAL = 60  # seconds; uploads start on wall-clock boundaries (:00 of every minute)
+READ_TIMEOUT = 20  # seconds a sensor may take before the cycle goes on without it
+
+# Sampling plan, in seconds: each sensor is read every "period", keeps its
+# samples for "window" and every "output" publishes their mean, which is
+# what the next upload sends. SHT30 and QMP6988 share I2C bus 1: they are
+# read under one bus lock with staggered schedules, so transactions never
+# collide. The DHT22 needs at least 2 s between reads.
+SAMPLING_PLAN = {
+    'sht30': {'period': 5, 'window': 60, 'output': 60, 'bus': 'i2c-1'},
+    'qmp6988': {'period': 10, 'window': 60, 'output': 60, 'bus': 'i2c-1'},
+    'dht22': {'period': 60, 'min_interval': 2.5},
+}
+
+# Payload fields each sensor provides
+SENSOR_FIELDS = {
+    'sht30': ('temperature_indoor', 'humidity_indoor'),
+    'qmp6988': ('pressure',),
+    'dht22': ('temperature_outdoor', 'humidity_outdoor'),
+}
+
+# Readings are stored here before upload and kept until the server accepts them
+OUTBOX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'outbox.db')
+outbox = Outbox(OUTBOX_PATH)
+
+# Change-triggered reporting: upload only when a field moves by its dead-band
+# or after HEARTBEAT seconds of silence. Every reading is kept at full
+# resolution in READINGS_DIR (one NDJSON file per day).
+DEADBANDS = {
+    'temperature_indoor': 0.1,   # °C
+    'humidity_indoor': 0.5,      # %RH
+    'temperature_outdoor': 0.1,  # °C
+    'humidity_outdoor': 0.5,     # %RH
+    'pressure': 0.2,             # hPa
+}
+HEARTBEAT = 600  # seconds
+READINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'readings')
+reporter = DeadbandPolicy(DEADBANDS, heartbeat=HEARTBEAT)
+reading_log = ReadingLog(READINGS_DIR)
+
+# Outlier filter, run on every raw sample before the sampling plan averages
+# it: a sample further than HAMPEL_THRESHOLD scaled MADs from the median of
+# the last HAMPEL_WINDOW samples of its field is replaced by that median
+# ("replace"), or kept and the next upload carries an "outliers" list ("flag").
+# HAMPEL_FLOORS sets the smallest deviation scale per field.
+HAMPEL_WINDOW = 7
+HAMPEL_THRESHOLD = 3.0
+HAMPEL_MODE = "replace"
+HAMPEL_FLOORS = DEFAULT_FLOORS
+hampel = HampelStage(HAMPEL_FLOORS, window=HAMPEL_WINDOW, threshold=HAMPEL_THRESHOLD, mode=HAMPEL_MODE)
+# Sensors are sampled on separate threads; flagged fields wait for the next upload
+hampel_lock = threading.Lock()
+hampel_flagged = set()
+
+# Local history for trends and charts without asking the server: a ring of
+# memory-mapped column chunks holding about a year of minute readings.
+HISTORY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'history')
+history = HistoryStore(HISTORY_DIR)
+
+# Rolling mean/std/min/max per field over 1 min, 10 min, 1 h and 24 h,
+# updated with every reading. UPLOAD_STATS_WINDOWS adds the chosen windows
+# to the upload payload (e.g. ("1h",) -> temperature_indoor_1h_mean ...);
+# such payloads are always sent as JSON.
+STATS_FIELDS = list(DEADBANDS)
+UPLOAD_STATS_WINDOWS = ()
+rolling = RollingStats(fields=STATS_FIELDS)
+
+# Minute/hour/day rollups (count, mean, min, max, last) for long-range
+# charts; each tier keeps its own retention (see rollup.DEFAULT_TIERS)
+ROLLUP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rollup.db')
+rollups = Rollup(ROLLUP_PATH, fields=STATS_FIELDS)
+
+# Single-reading upload encoding: "json" (default), "binary" (16-byte
+# payload_codec record) or "auto" (binary once the server lists the media
+# type in Accept-Post on the warm-up request)
+UPLOAD_ENCODING = "json"
+
+# Pooled keep-alive session: reuses one TLS connection, warmed while the sensors
+# are read when an upload is likely (heartbeat due or readings waiting)
+upload_session = UploadSession(SERVER_URL, timeout=REQUEST_TIMEOUT)
+
+# Uploads are retried with jittered exponential backoff (honouring Retry-After).
+# After UPLOAD_BREAKER_FAILURES failures in a row the breaker stops calling the
+# server and lets one probe through after about UPLOAD_BREAKER_RESET seconds.
+UPLOAD_ATTEMPTS = 3
+UPLOAD_BASE_DELAY = 2       # seconds, doubled per retry
+UPLOAD_MAX_DELAY = 30       # seconds
+UPLOAD_BREAKER_FAILURES = 5
+UPLOAD_BREAKER_RESET = 300  # seconds
+upload_retry = UploadRetry(
+    breaker=CircuitBreaker(failure_threshold=UPLOAD_BREAKER_FAILURES, reset_timeout=UPLOAD_BREAKER_RESET),
+    attempts=UPLOAD_ATTEMPTS, base_delay=UPLOAD_BASE_DELAY, max_delay=UPLOAD_MAX_DELAY,
+    log=lambda msg: plog("upload", msg, every=600),
+)
+
+# Batched upload: POST gzip'd JSON arrays instead of one object per request.
+# Off until the server accepts arrays; readings then wait in the outbox until
+# a batch is full or the oldest one is BATCH_MAX_DELAY seconds old.
+UPLOAD_BATCH = False
+BATCH_FORMAT = "json"  # or "ndjson", "binary"
+BATCH_MAX_DELAY = 300  # seconds
+batch_transport = BatchTransport(SERVER_URL, session=upload_session, retry=upload_retry, fmt=BATCH_FORMAT, timeout=REQUEST_TIMEOUT,
+                                 max_delay=BATCH_MAX_DELAY, log=lambda msg: plog("batch", msg, every=600))
+
+UPLOAD_QUEUE_SIZE = 30  # readings held in memory before spilling to the outbox
+
+# Extra outputs next to the weather-tracker server, each with its own queue
+# and worker thread. None disables them.
+NDJSON_SINK_PATH = None   # e.g. "/home/pi/weather.ndjson"
+STATSD_SINK = None        # e.g. ("127.0.0.1", 8125)
+SINK_QUEUE_SIZE = 100
+
+# MQTT for LAN consumers (Home Assistant, Node-RED): every field goes to a
+# retained <prefix>/<field> topic as soon as its sensor has been read, the
+# full payload to <prefix>/state. None disables it.
+MQTT_BROKER = None        # e.g. "192.168.2.10"
+MQTT_PORT = 1883
+MQTT_TOPIC_PREFIX = "weather-station"
+MQTT_QOS = 1
+MQTT_BUFFER = 1000        # messages kept while the broker is unreachable
 
 # Initialize I2C bus for ENV III
 bus = smbus2.SMBus(1)
 print("Using I2C bus 1 for ENV III Indoor Sensor (GPIO2/GPIO3)")
-
-def crc8(data):
-    """Calculate CRC8 for SHT30"""
-    crc = 0xFF
-    for byte in data:
-        crc ^= byte
-        for _ in range(8):
-            if crc & 0x80:
-                crc = (crc << 1) ^ 0x31
-            else:
-                crc = crc << 1
-    return crc & 0xFF
+sht30 = SHT30(bus, SHT30_ADDR)
+qmp6988 = QMP6988(bus, QMP6988_ADDR, bus_number=1, profile=QMP6988_PROFILE)
 
 # --- throttled logging: keep a dead sensor from flooding the journal (2026-07) ---
 _plog_state = {}
@@ -56,196 +194,277 @@ def plog(key, msg, every=3600):
 def read_sht30():
     """Read SHT30 temperature and humidity sensor from ENV III (Indoor)"""
     try:
-        # Send measurement command (single shot, high repeatability)
-        msg = smbus2.i2c_msg.write(SHT30_ADDR, [0x2C, 0x06])
-        bus.i2c_rdwr(msg)
-        time.sleep(0.02)  # Wait for measurement
-        
-        # Read 6 bytes (temp + humidity + CRC)
-        msg = smbus2.i2c_msg.read(SHT30_ADDR, 6)
-        bus.i2c_rdwr(msg)
-        data = list(msg)
-        
-        # Check CRC for temperature
-        if crc8(data[0:2]) != data[2]:
-            print("CRC error in ENV III temperature data")
-            return None, None
-            
-        # Check CRC for humidity
-        if crc8(data[3:5]) != data[5]:
-            print("CRC error in ENV III humidity data")
-            return None, None
-        
-        # Calculate temperature
-        temp_raw = (data[0] << 8) | data[1]
-        temperature = -45 + (175 * temp_raw / 65535.0)
-        
-        # Calculate humidity
-        hum_raw = (data[3] << 8) | data[4]
-        humidity = 100 * hum_raw / 65535.0
-        
-        return temperature, humidity
+        if SHT30_PERIODIC_MPS and not sht30.periodic:
+            sht30.start_periodic(SHT30_PERIODIC_MPS)
+        return sht30.read()
     except Exception as e:
         plog("sht30", f"ENV III SHT30 error: {e}")
+        # The chip may have been power-cycled; restart periodic mode next time
+        try:
+            sht30.stop_periodic()
+        except Exception:
+            pass
         return None, None
 
 def read_qmp6988():
     """Read QMP6988 pressure sensor from ENV III (Indoor)"""
     try:
-        # Read chip ID
-        chip_id = bus.read_byte_data(QMP6988_ADDR, 0xD1)
-        if chip_id != 0x5C:
-            print(f"QMP6988 chip ID: {hex(chip_id)} (expected 0x5C)")
-        
-        # Simple pressure reading (returns default for now)
-        # Full implementation requires complex calibration
-        return 1013.25
-        
+        pressure, _ = qmp6988.read()
+        return pressure
     except Exception as e:
         plog("qmp6988", f"ENV III QMP6988 error: {e}")
+        # Reconfigure (but keep the calibration) on the next read
+        qmp6988.started = False
         return None
 
 def read_dht22_simple():
-    """Read DHT22 with improved reliability using retries and caching (Outdoor)"""
-    global last_dht22_temp, last_dht22_humidity, last_dht22_read_time
+    """Read DHT22 through the persistent backend, with caching (Outdoor)"""
+    global last_dht22
     
-    current_time = time.time()
+    # Return cached value if it's recent enough, with its original acquisition time
+    if last_dht22 is not None and age(last_dht22) < DHT22_CACHE_DURATION:
+        return last_dht22
     
-    # Return cached value if it's recent enough
-    if (last_dht22_temp is not None and 
-        last_dht22_humidity is not None and 
-        (current_time - last_dht22_read_time) < DHT22_CACHE_DURATION):
-        return last_dht22_temp, last_dht22_humidity
+    try:
+        temp, hum = dht22.read()
+    except Exception as e:
+        if "not found" in str(e).lower():
+            plog("dht22", f"DHT22 sensor not detected on GPIO{DHT22_GPIO} - check wiring")
+        else:
+            plog("dht22", f"DHT22 error: {e}")
+        dht22.close()
+        return None, None
     
-    # Try to read fresh data with multiple attempts and different methods
-    max_attempts = 2
-    for attempt in range(max_attempts):
-        try:
-            # Try direct library access first (faster)
-            import board
-            import adafruit_dht
-            
-            # Try without use_pulseio first, then with it
-            pulseio_options = [None, False, True] if attempt == 0 else [False]
-            
-            for use_pulseio in pulseio_options:
-                try:
-                    if use_pulseio is None:
-                        dht = adafruit_dht.DHT22(board.D24)
-                    else:
-                        dht = adafruit_dht.DHT22(board.D24, use_pulseio=use_pulseio)
-                    
-                    time.sleep(3)  # DHT22 needs at least 2.5-3 seconds
-                    temp = dht.temperature
-                    hum = dht.humidity
-                    dht.exit()
-                    
-                    if temp is not None and hum is not None:
-                        # Update cache with successful read
-                        last_dht22_temp = temp
-                        last_dht22_humidity = hum
-                        last_dht22_read_time = current_time
-                        return temp, hum
-                        
-                except Exception as e:
-                    try:
-                        dht.exit()
-                    except:
-                        pass
-                    if "not found" in str(e):
-                        break  # Don't try other pulseio options if sensor not found
-                    continue
-            
-        except Exception as e:
-            if attempt == max_attempts - 1:
-                # Log the specific error only on final attempt
-                if "not found" in str(e).lower():
-                    print(f"DHT22 sensor not detected on GPIO{DHT22_GPIO} - check wiring")
-                else:
-                    plog("dht22", f"DHT22 error after {max_attempts} attempts: {e}")
-        
-        # Wait before next attempt
-        if attempt < max_attempts - 1:
-            time.sleep(3)
+    if temp is not None and hum is not None:
+        # Update cache with successful read
+        last_dht22 = stamp((temp, hum))
+        return last_dht22
     
-    # Return None if no reading possible
+    if dht22.consecutive_failures:
+        plog("dht22", f"DHT22 read failed ({dht22.consecutive_failures}x in a row): {dht22.last_error}")
     return None, None
 
-def send_data(indoor_temp, indoor_humidity, pressure, outdoor_temp, outdoor_humidity):
-    """Send combined indoor and outdoor data to server"""
+def post_payload(data):
+    """POST one payload to the server; True if it was accepted"""
+    body = None
+    if UPLOAD_ENCODING == "binary" or (UPLOAD_ENCODING == "auto" and upload_session.accepts_binary()):
+        try:
+            body = encode_record(data)
+        except ValueError as e:
+            plog("encoding", f"Binary encoding not possible, sending JSON: {e}", every=600)
+    if body is not None:
+        return upload_retry.send(lambda: upload_session.post(data=body, headers={'Content-Type': MEDIA_TYPE}))
+    return upload_retry.send(lambda: upload_session.post(json=data))
+
+def deliver(data):
+    """Store one payload and upload the outbox backlog (upload worker thread)"""
+    # Persist first: a failed upload leaves the reading in the outbox for later
     try:
-        # Prepare data with indoor and outdoor readings
-        data = {
-            'timestamp': int(time.time())
-        }
-        
-        # Add indoor data from ENV III
-        if indoor_temp is not None and indoor_humidity is not None:
-            # Primary data fields for backward compatibility
-            data['temperature'] = round(indoor_temp, 1)
-            data['humidity'] = round(indoor_humidity, 1)
-            # Explicitly marked indoor data
-            data['temperature_indoor'] = round(indoor_temp, 1)
-            data['humidity_indoor'] = round(indoor_humidity, 1)
-            data['sensor_indoor'] = 'ENV3'
-            
-        # Add outdoor data from DHT22
-        if outdoor_temp is not None and outdoor_humidity is not None:
-            data['temperature_outdoor'] = round(outdoor_temp, 1)
-            data['humidity_outdoor'] = round(outdoor_humidity, 1)
-            data['sensor_outdoor'] = 'DHT22'
-            
-            # If indoor failed, use outdoor as primary
-            if 'temperature' not in data:
-                data['temperature'] = round(outdoor_temp, 1)
-                data['humidity'] = round(outdoor_humidity, 1)
-        
-        # Add pressure if available (indoor sensor)
-        if pressure:
-            data['pressure'] = round(pressure, 1)
-            data['pressure_indoor'] = round(pressure, 1)
-        
-        # Only send if we have at least one temperature reading
-        if 'temperature' not in data:
-            plog("nodata", "✗ No sensor data available")
-            return False
-        
-        # Format output message
-        output_parts = []
-        
-        if indoor_temp is not None and indoor_humidity is not None:
-            output_parts.append(f"Indoor(ENV3): {data['temperature_indoor']}°C, {data['humidity_indoor']}%")
-            if pressure:
-                output_parts.append(f"Pressure: {data['pressure']}hPa")
-                
-        if outdoor_temp is not None and outdoor_humidity is not None:
-            output_parts.append(f"Outdoor(DHT22): {data['temperature_outdoor']}°C, {data['humidity_outdoor']}%")
-        
-        print(f"Sending: {' | '.join(output_parts)}")
-        
-        response = requests.post(SERVER_URL, json=data, timeout=REQUEST_TIMEOUT)
-        
-        if response.status_code == 200:
-            print(f"✓ Data sent successfully")
-            return True
+        outbox.append(data)
+    except Exception as e:
+        print(f"✗ Outbox error: {e}")
+        return post_payload(data)
+    
+    # From here on the reading is in the outbox: never raise, or the sink
+    # would retry this call and store it a second time
+    try:
+        if UPLOAD_BATCH:
+            if not batch_transport.due(outbox):
+                print(f"Queued, {len(outbox)}/{batch_transport.batch_size} reading(s) in batch")
+                return True
+            sent = batch_transport.flush(outbox)
         else:
-            print(f"✗ Server error: {response.status_code} - {response.text}")
-            return False
-            
+            sent = outbox.drain(post_payload)
     except Exception as e:
-        print(f"✗ Network error: {e}")
+        print(f"✗ Upload error, {len(outbox)} reading(s) waiting in outbox: {e}")
+        return True
+    backlog = len(outbox)
+    if outbox.rejected:
+        plog("rejected", f"✗ {outbox.rejected} reading(s) refused by the server, "
+                         f"kept in the rejected table of {OUTBOX_PATH}", every=3600)
+    http = upload_session.stats()
+    if http['requests']:
+        plog("http", f"HTTP: {http['requests']} requests ({http['heads']} HEAD), {http['handshakes']} handshakes, "
+                     f"{http['reuse_ratio']:.0%} reused, latency p50 {http['p50_latency']*1000:.0f}ms "
+                     f"max {http['max_latency']*1000:.0f}ms")
+    if upload_retry.breaker.state != CLOSED:
+        b = upload_retry.breaker.stats()
+        plog("breaker", f"Upload breaker {b['state']} for {b['open_for']:.0f}s "
+                        f"(opened {b['opened']}x, {b['rejected']} upload(s) held back)", every=600)
+    if backlog == 0:
+        extra = f" ({sent - 1} from backlog)" if sent > 1 else ""
+        print(f"✓ Data sent successfully{extra}")
+    else:
+        print(f"✗ Upload failed, {backlog} reading(s) waiting in outbox")
+    # The reading is safe in the outbox either way
+    return True
+
+def send_data(indoor_temp, indoor_humidity, pressure, outdoor_temp, outdoor_humidity, timestamp=None,
+              snapshot=None):
+    """Hand combined indoor and outdoor data to the upload worker"""
+    values = {
+        'temperature_indoor': indoor_temp, 'humidity_indoor': indoor_humidity,
+        'pressure': pressure,
+        'temperature_outdoor': outdoor_temp, 'humidity_outdoor': outdoor_humidity,
+    }
+    # Spikes were already filtered per sample (hampel_filter); flag mode marks them here
+    with hampel_lock:
+        outliers = sorted(hampel_flagged)
+        hampel_flagged.clear()
+    data = build_payload(indoor_temp, indoor_humidity, pressure, outdoor_temp, outdoor_humidity,
+                         timestamp=timestamp)
+    if outliers:
+        data['outliers'] = outliers
+    # Per-sensor acquisition time and age; values sent before or too old are marked
+    acquired, repeated = {}, set()
+    if snapshot is not None:
+        add_acquisition(data, snapshot.readings, snapshot.taken_ns, snapshot.cached, snapshot.stale)
+        acquired = {name: {'wall_ns': r.wall_ns, 'monotonic_ns': r.monotonic_ns}
+                    for name, r in snapshot.readings.items()}
+        repeated = {f for name in (*snapshot.cached, *snapshot.stale) for f in SENSOR_FIELDS[name]}
+        if snapshot.stale:
+            plog("stale", f"Stale: {', '.join(f'{n} {snapshot.age(n):.0f}s old' for n in snapshot.stale)}",
+                 every=600)
+    
+    # Only send if we have at least one temperature reading
+    if 'temperature' not in data:
+        plog("nodata", "✗ No sensor data available")
         return False
+    
+    # Full resolution stays local, whether or not the reading is uploaded
+    try:
+        # Unrounded, so the payload rounding can be reviewed
+        reading_log.append({'timestamp': data['timestamp'], **values, **({'outliers': outliers} if outliers else {}),
+                            **({'acquired': acquired} if acquired else {}),
+                            **{key: data[key] for key in ('cached', 'stale') if key in data}})
+    except OSError as e:
+        plog("readinglog", f"✗ Reading log error: {e}", every=600)
+    # Cached and stale values were already counted (or are too old to count):
+    # left out here, they show up as gaps instead of fresh samples
+    fresh = {key: value for key, value in data.items() if key not in repeated}
+    try:
+        history.append_payload(fresh)
+    except ValueError as e:
+        plog("history", f"✗ History not updated: {e}", every=600)
+    rolling.update(fresh)
+    log_rolling_stats()
+    log_hampel_stats()
+    try:
+        rollups.add_payload(fresh)
+    except sqlite3.Error as e:
+        plog("rollup", f"✗ Rollup not updated: {e}", every=600)
+    
+    if not reporter.should_report(data):
+        s = reporter.stats()
+        print(f"Unchanged: {describe(data)} (suppressed {s['suppressed']}/{s['seen']})")
+        return True
+    
+    if UPLOAD_STATS_WINDOWS:
+        data.update(rolling.payload_fields(windows=UPLOAD_STATS_WINDOWS))
+    print(f"Sending: {describe(data)}")
+    outputs.publish(data)
+    log_sink_stats()
+    return True
+
+# Sampling never waits on the network: every reading is fanned out to the
+# sinks, each behind its own bounded queue and thread. If the server upload
+# falls behind, its oldest readings spill to the outbox.
+outputs = FanOut(log=lambda msg: plog("sinks", msg, every=600))
+outputs.add(CallableSink('http', deliver), maxsize=UPLOAD_QUEUE_SIZE,
+            policy='spill', spill=outbox, retry_delay=INTERVAL)
+if NDJSON_SINK_PATH:
+    outputs.add(NDJSONFileSink(NDJSON_SINK_PATH), maxsize=SINK_QUEUE_SIZE, retry_delay=INTERVAL)
+if STATSD_SINK:
+    outputs.add(StatsDSink(*STATSD_SINK), maxsize=SINK_QUEUE_SIZE, retry_delay=INTERVAL)
+
+mqtt = None
+if MQTT_BROKER:
+    mqtt = MQTTPublisher(MQTT_BROKER, MQTT_PORT, topic_prefix=MQTT_TOPIC_PREFIX, qos=MQTT_QOS,
+                         buffer_size=MQTT_BUFFER, timeout=REQUEST_TIMEOUT,
+                         log=lambda msg: plog("mqtt", msg, every=600))
+    outputs.add(MQTTSink(mqtt), maxsize=SINK_QUEUE_SIZE, retry_delay=INTERVAL)
+
+def hampel_filter(name):
+    """Outlier filter for each raw sample of one sensor, before the plan averages it
+
+    The cleaned fields are published to MQTT from here, so the retained
+    topics never carry a spike the filter removed.
+    """
+    fields = SENSOR_FIELDS[name]
+    def apply(value):
+        values = value if isinstance(value, tuple) else (value,)
+        raw = dict(zip(fields, values))
+        with hampel_lock:
+            clean, outliers = hampel.apply(raw)
+            if HAMPEL_MODE == 'flag':
+                hampel_flagged.update(outliers)
+        if outliers:
+            plog(f"outlier-{name}", f"Outlier: {', '.join(f'{f}={raw[f]}' for f in outliers)} ({HAMPEL_MODE})",
+                 every=60)
+        filtered = tuple(clean[f] for f in fields)
+        if mqtt is not None:
+            for field, v in zip(fields, filtered):
+                mqtt.publish_field(field, v)  # only queues, never waits on the broker
+        return filtered if isinstance(value, tuple) else filtered[0]
+    return apply
+
+def log_sink_stats():
+    """One line per sink: queue depth, delivery lag and throughput"""
+    for name, s in outputs.stats().items():
+        lag = f"{s['last_lag']:.1f}s" if s['last_lag'] is not None else "-"
+        rate = f"{s['throughput'] * 60:.2f}/min" if s['throughput'] is not None else "-"
+        plog(f"sink-{name}", f"Sink {name}: depth {s['depth']}, lag {lag} (max {s['max_lag']:.1f}s), "
+                             f"{rate}, failures {s['failures']}, spilled {s['spilled']}, dropped {s['dropped']}")
+
+def log_rolling_stats():
+    """Hourly summary of the last 24 hours per field"""
+    parts = []
+    for field, windows in rolling.stats().items():
+        day = windows['24h']
+        if day['count']:
+            parts.append(f"{field} {day['mean']:.1f} [{day['min']:.1f}..{day['max']:.1f}]")
+    if parts:
+        plog("rolling", "Last 24h: " + ", ".join(parts), every=3600)
+
+def log_hampel_stats():
+    """Hourly outlier counts per field"""
+    s = hampel.stats()
+    fields = ", ".join(f"{f} {v['outliers']}/{v['seen']}" for f, v in s['fields'].items() if v['seen'])
+    plog("hampel", f"Outlier filter ({s['mode']}): replaced {s['replaced']}, flagged {s['flagged']} - {fields}",
+         every=3600)
+
+def warm_if_upload_likely():
+    """Reopen the server connection only when this cycle will probably upload"""
+    # A HEAD every cycle would cost as many requests as the dead-band saves
+    pending = batch_transport.due(outbox) if UPLOAD_BATCH else len(outbox) > 0
+    if pending or reporter.heartbeat_due(within=INTERVAL):
+        upload_session.warm()
+
+def upload_cycle(snapshot):
+    """Send one engine cycle snapshot to the server"""
+    indoor_temp, indoor_humidity = snapshot.get('sht30') or (None, None)
+    outdoor_temp, outdoor_humidity = snapshot.get('dht22') or (None, None)
+    pressure = snapshot.get('qmp6988')
+    # The scheduled slot time (e.g. 12:34:00), not whenever the upload thread got to it
+    timestamp = snapshot.tick.wall_time if getattr(snapshot, 'tick', None) else None
+    return send_data(indoor_temp, indoor_humidity, pressure, outdoor_temp, outdoor_humidity,
+                     timestamp=timestamp, snapshot=snapshot)
 
 def main():
     print("ENV III (Indoor) + DHT22 (Outdoor) Weather Station - Starting")
     print(f"Server: {SERVER_URL}")
     print(f"Interval: {INTERVAL} seconds")
-    print(f"Indoor Sensor - ENV III: SHT30 addr={hex(SHT30_ADDR)}, QMP6988 addr={hex(QMP6988_ADDR)}")
-    print(f"Outdoor Sensor - DHT22: GPIO{DHT22_GPIO} (Pin 18) - 5V power required!\n")
+    print(f"Outbox: {OUTBOX_PATH} ({len(outbox)} reading(s) pending)")
+    print(f"Reporting: dead-band {DEADBANDS}, heartbeat {HEARTBEAT}s, full log in {READINGS_DIR}")
+    if UPLOAD_BATCH:
+        print(f"Batched upload: {BATCH_FORMAT}+gzip, flush after {BATCH_MAX_DELAY}s at the latest")
+    print(f"Indoor Sensor - ENV III: SHT30 addr={hex(SHT30_ADDR)}, QMP6988 addr={hex(QMP6988_ADDR)} ({QMP6988_PROFILE})")
+    print(f"Outdoor Sensor - DHT22: GPIO{DHT22_GPIO} (Pin 18) - 5V power required!")
+    print(f"DHT22 backend: {type(dht22).__name__}\n")
     
     # Test initial reading
     indoor_temp, indoor_hum = read_sht30()
-    outdoor_temp, outdoor_hum = read_dht22_simple()
+    outdoor_temp, outdoor_hum = unwrap(read_dht22_simple())
     
     if indoor_temp and indoor_hum:
         print(f"✓ Indoor ENV III working: {indoor_temp:.1f}°C, {indoor_hum:.1f}%")
@@ -263,26 +482,47 @@ def main():
         print("\n⚠ WARNING: No sensors available! Check connections.\n")
     
     print("Starting monitoring loop...\n")
+    outputs.start()
+    print(f"Outputs: {', '.join(outputs.sinks)}")
+    if mqtt is not None:
+        mqtt.start()
+        print(f"MQTT: {MQTT_BROKER}:{MQTT_PORT}, topics {MQTT_TOPIC_PREFIX}/<field>, QoS {MQTT_QOS}")
+    
+    readers = {'sht30': read_sht30, 'qmp6988': read_qmp6988, 'dht22': read_dht22_simple}
+    plan = SamplingPlan()
+    for name, options in SAMPLING_PLAN.items():
+        plan.add(name, readers[name], filter=hampel_filter(name), **options)
+    print("Sampling plan:\n  " + "\n  ".join(plan.describe()))
     
-    while True:
+    engine = StationEngine(
+        sensors=plan.sensors(),
+        upload=upload_cycle,
+        interval=INTERVAL,
+        read_timeout=READ_TIMEOUT,
+        rates=plan.rates(),
+        max_age=plan.max_ages(),
+        prepare=warm_if_upload_likely,
+    )
+    try:
+        asyncio.run(engine.run())
+    except KeyboardInterrupt:
+        print("\nStopping...")
+    finally:
+        engine.close()
+        dht22.close()
+        outputs.stop(timeout=REQUEST_TIMEOUT)
+        if mqtt is not None:
+            mqtt.flush(timeout=REQUEST_TIMEOUT)
+            mqtt.stop(timeout=REQUEST_TIMEOUT)
+        outbox.close()
+        reading_log.close()
+        history.close()
+        rollups.close()
+        upload_session.close()
         try:
-            # Read indoor sensors (ENV III)
-            indoor_temp, indoor_humidity = read_sht30()
-            pressure = read_qmp6988()
-            
-            # Read outdoor sensor (DHT22)
-            outdoor_temp, outdoor_humidity = read_dht22_simple()
-            
-            # Send combined data
-            send_data(indoor_temp, indoor_humidity, pressure, outdoor_temp, outdoor_humidity)
-            
-        except KeyboardInterrupt:
-            print("\nStopping...")
-            break
-        except Exception as e:
-            print(f"Error in main loop: {e}")
-        
-        time.sleep(INTERVAL)
+            sht30.stop_periodic()
+        except Exception:
+            pass
 
 if __name__ == "__main__":
     main()
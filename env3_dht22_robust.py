@@ -5,17 +5,37 @@ Supports ENV III (I2C) and DHT22 (GPIO) sensors with fallback mechanisms
 """
 
 import time
-import requests
 import smbus2
 import struct
 import os
 import subprocess
+import sqlite3
+import sys
+import threading
 import json
 from datetime import datetime
 
+from crc import crc8
+from qmp6988 import QMP6988
+from dht22_worker import DHT22WorkerClient
+from outbox import Outbox
+from uploader import UploadSession
+from upload_worker import UploadWorker
+from reporting import DeadbandPolicy, ReadingLog
+from history_store import HistoryStore
+from rolling_stats import RollingStats
+from rollup import Rollup
+from hampel import HampelStage
+from scheduler import Schedule
+from derived import absolute_humidity, dew_point
+from acquisition import age, stamp
+from payload import add_acquisition
+from retry import CircuitBreaker, UploadRetry
+
 # Sensor Configuration
 SHT30_ADDR = 0x44
 QMP6988_ADDR = 0x70
+QMP6988_PROFILE = "balanced"  # fast | balanced | storm-watch | low-power
 DHT22_GPIO = 4
 
 # Server Configuration
@@ -23,16 +43,62 @@ SERVER_URL = "https://mrx3k1.de/weather-tracker/weather-tracker"
 REQUEST_TIMEOUT = 10
 INTERVAL = 60
 
+# DHT22 worker process: stays warm between reads, restarted if it hangs
+VENV_PYTHON = "/home/pi/apps/weather-station/venv/bin/python"
+DHT22_WORKER_DEADLINE = 20  # seconds
+
+# Readings wait here until the server has accepted them
+OUTBOX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'outbox.db')
+UPLOAD_QUEUE_SIZE = 30  # readings held in memory before spilling to the outbox
+
+# Upload only on a change beyond the dead-band or after HEARTBEAT seconds;
+# every reading is kept in READINGS_DIR
+DEADBANDS = {
+    'indoor.temperature': 0.1,   # °C
+    'indoor.humidity': 0.5,      # %RH
+    'indoor.pressure': 0.2,      # hPa
+    'outdoor.temperature': 0.1,  # °C
+    'outdoor.humidity': 0.5,     # %RH
+}
+HEARTBEAT = 600  # seconds
+READINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'readings')
+# Outlier filter: replace readings further than HAMPEL_THRESHOLD scaled
+# MADs from the median of the last HAMPEL_WINDOW readings of their field
+HAMPEL_WINDOW = 7
+HAMPEL_THRESHOLD = 3.0
+HAMPEL_FLOORS = {
+    'indoor.temperature': 0.2,   # °C
+    'indoor.humidity': 1.0,      # %RH
+    'indoor.pressure': 0.3,      # hPa
+    'outdoor.temperature': 0.3,  # °C
+    'outdoor.humidity': 1.5,     # %RH
+}
+HISTORY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'history')
+ROLLUP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rollup.db')
+
 # Retry Configuration
 MAX_RETRIES = 3
 RETRY_DELAY = 2
 
-# Cache for sensor values
-sensor_cache = {
-    'indoor': {'temperature': None, 'humidity': None, 'pressure': None, 'last_update': 0},
-    'outdoor': {'temperature': None, 'humidity': None, 'last_update': 0}
-}
+# Uploads: exponential backoff with full jitter, honouring Retry-After; the
+# breaker stops calling the server after UPLOAD_BREAKER_FAILURES failures in
+# a row and probes again after about UPLOAD_BREAKER_RESET seconds
+UPLOAD_BASE_DELAY = 2      # seconds, doubled per retry
+UPLOAD_MAX_DELAY = 30      # seconds
+UPLOAD_BREAKER_FAILURES = 5
+UPLOAD_BREAKER_RESET = 300  # seconds
+
+# Last good reading per sensor (acquisition.Reading), kept with its acquisition time
+sensor_cache = {'sht30': None, 'qmp6988': None, 'dht22': None}
 CACHE_TIMEOUT = 300  # Use cached values for up to 5 minutes
+STALE_AFTER = 2 * INTERVAL  # seconds; older values are marked stale in the payload
+
+# Payload fields (flattened) each sensor provides
+SENSOR_FIELDS = {
+    'sht30': ('indoor.temperature', 'indoor.humidity'),
+    'qmp6988': ('indoor.pressure',),
+    'dht22': ('outdoor.temperature', 'outdoor.humidity'),
+}
 
 # Statistics
 stats = {
@@ -88,18 +154,21 @@ def init_i2c_with_retry():
 
 # Initialize I2C bus
 bus = init_i2c_with_retry()
+# Compensated pressure driver; re-bound when the bus is re-opened
+qmp6988 = QMP6988(bus, QMP6988_ADDR, bus_number=1, profile=QMP6988_PROFILE)
 
-def crc8(data):
-    """Calculate CRC8 for SHT30"""
-    crc = 0xFF
-    for byte in data:
-        crc ^= byte
-        for _ in range(8):
-            if crc & 0x80:
-                crc = (crc << 1) ^ 0x31
-            else:
-                crc = crc << 1
-    return crc & 0xFF
+outbox = Outbox(OUTBOX_PATH)
+
+# One keep-alive connection to the server instead of a TLS handshake per upload
+upload_session = UploadSession(SERVER_URL, timeout=REQUEST_TIMEOUT)
+
+dht22_worker = DHT22WorkerClient(
+    [VENV_PYTHON if os.path.exists(VENV_PYTHON) else sys.executable,
+     os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dht22_worker.py'),
+     '--pin', f'D{DHT22_GPIO}', '--use-pulseio', 'false'],
+    deadline=DHT22_WORKER_DEADLINE,
+    log=lambda msg: log_message("WARNING", msg),
+)
 
 def read_sht30_with_retry():
     """Read SHT30 with multiple retry attempts"""
@@ -170,18 +239,25 @@ def read_qmp6988_with_retry():
         bus = init_i2c_with_retry()
         if bus is None:
             return None
+    if qmp6988.bus is not bus:
+        # Bus was re-opened: keep the calibration, reconfigure on the next read
+        qmp6988.bus = bus
+        qmp6988.started = False
     
     for attempt in range(MAX_RETRIES):
         try:
-            chip_id = bus.read_byte_data(QMP6988_ADDR, 0xD1)
-            if chip_id == 0x5C:
-                # Return default pressure for now
-                # Full implementation would include calibration
-                return 1013.25
+            pressure, _ = qmp6988.read()
+            # Sanity check
+            if 300 <= pressure <= 1100:
+                return pressure
+            log_message("ERROR", f"QMP6988 pressure out of range: {pressure:.1f} hPa")
+            qmp6988.started = False
                 
         except Exception as e:
             if attempt == 0:
                 log_message("ERROR", f"QMP6988 read failed: {e}")
+            # Reconfigure (but keep the calibration) on the next read
+            qmp6988.started = False
             
             if attempt < MAX_RETRIES - 1:
                 time.sleep(RETRY_DELAY)
@@ -189,159 +265,130 @@ def read_qmp6988_with_retry():
     return None
 
 def read_dht22_with_retry():
-    """Read DHT22 with enhanced retry logic"""
+    """Read DHT22 through the persistent worker process"""
     global stats
     
-    venv_python = "/home/pi/apps/weather-station/venv/bin/python"
-    if not os.path.exists(venv_python):
-        log_message("ERROR", "Virtual environment not found")
-        return None, None
-    
     for attempt in range(MAX_RETRIES):
-        try:
-            result = subprocess.run(
-                [venv_python, "-c", """
-import board
-import adafruit_dht
-import time
-import sys
-
-dht = adafruit_dht.DHT22(board.D4, use_pulseio=False)
-time.sleep(2)
-
-for i in range(5):
-    try:
-        temp = dht.temperature
-        humidity = dht.humidity
-        if temp is not None and humidity is not None:
-            print(f"{temp:.1f},{humidity:.1f}")
-            sys.exit(0)
-        time.sleep(2)
-    except RuntimeError:
-        if i < 4:
-            time.sleep(2)
-            continue
-    except Exception:
-        break
-
-dht.exit()
-sys.exit(1)
-"""],
-                capture_output=True,
-                text=True,
-                timeout=20
-            )
-            
-            if result.returncode == 0 and result.stdout.strip():
-                parts = result.stdout.strip().split(',')
-                if len(parts) == 2:
-                    temp = float(parts[0])
-                    humidity = float(parts[1])
-                    
-                    # Sanity check
-                    if -40 <= temp <= 80 and 0 <= humidity <= 100:
-                        stats['outdoor_success'] += 1
-                        return temp, humidity
-            
-            stats['outdoor_fail'] += 1
-            
-        except subprocess.TimeoutExpired:
-            log_message("ERROR", "DHT22 read timeout")
-            stats['outdoor_fail'] += 1
-        except Exception as e:
-            if attempt == 0:
-                log_message("ERROR", f"DHT22 read error: {e}")
-            stats['outdoor_fail'] += 1
+        temp, humidity = dht22_worker.read()
+        
+        # Sanity check
+        if temp is not None and -40 <= temp <= 80 and 0 <= humidity <= 100:
+            stats['outdoor_success'] += 1
+            return temp, humidity
         
-        if attempt < MAX_RETRIES - 1:
-            time.sleep(RETRY_DELAY * 2)  # Longer delay for DHT22
+        stats['outdoor_fail'] += 1
+        if attempt == 0:
+            log_message("ERROR", f"DHT22 read error: {dht22_worker.last_error}")
     
     return None, None
 
 def get_sensor_data():
-    """Get sensor data with caching fallback"""
-    global sensor_cache
-    current_time = time.time()
+    """Get sensor data with caching fallback
     
-    # Read indoor sensors
-    indoor_temp, indoor_hum = read_sht30_with_retry()
-    indoor_pressure = read_qmp6988_with_retry()
+    Besides the values, returns the acquisition ``readings`` per sensor and
+    the sensors whose value came from the cache (``cached``).
+    """
+    cached = []
     
-    # Update cache if successful
-    if indoor_temp is not None and indoor_hum is not None:
-        sensor_cache['indoor']['temperature'] = indoor_temp
-        sensor_cache['indoor']['humidity'] = indoor_hum
-        sensor_cache['indoor']['last_update'] = current_time
-    elif current_time - sensor_cache['indoor']['last_update'] < CACHE_TIMEOUT:
-        # Use cached values
-        indoor_temp = sensor_cache['indoor']['temperature']
-        indoor_hum = sensor_cache['indoor']['humidity']
-        log_message("WARNING", "Using cached indoor values")
+    def fresh_or_cached(name, reading, timeout=CACHE_TIMEOUT):
+        last = sensor_cache[name]
+        if reading.value is not None:
+            sensor_cache[name] = reading
+            return reading
+        if last is not None and (timeout is None or age(last) < timeout):
+            cached.append(name)
+            return last
+        return None
     
-    if indoor_pressure is not None:
-        sensor_cache['indoor']['pressure'] = indoor_pressure
-    elif sensor_cache['indoor']['pressure'] is not None:
-        indoor_pressure = sensor_cache['indoor']['pressure']
+    # Read indoor sensors, each stamped the moment its read returns
+    sht30 = stamp(read_sht30_with_retry())
+    if sht30.value[0] is None or sht30.value[1] is None:
+        sht30 = sht30._replace(value=None)
+    pressure = stamp(read_qmp6988_with_retry())
     
-    # Read outdoor sensor
-    outdoor_temp, outdoor_hum = read_dht22_with_retry()
+    sht30 = fresh_or_cached('sht30', sht30)
+    if 'sht30' in cached:
+        log_message("WARNING", "Using cached indoor values")
+    # Pressure falls back to the last good value however old (marked stale then)
+    pressure = fresh_or_cached('qmp6988', pressure, timeout=None)
     
-    # Update cache if successful
-    if outdoor_temp is not None and outdoor_hum is not None:
-        sensor_cache['outdoor']['temperature'] = outdoor_temp
-        sensor_cache['outdoor']['humidity'] = outdoor_hum
-        sensor_cache['outdoor']['last_update'] = current_time
-    elif current_time - sensor_cache['outdoor']['last_update'] < CACHE_TIMEOUT:
-        # Use cached values
-        outdoor_temp = sensor_cache['outdoor']['temperature']
-        outdoor_hum = sensor_cache['outdoor']['humidity']
+    # Read outdoor sensor
+    dht22 = stamp(read_dht22_with_retry())
+    if dht22.value[0] is None or dht22.value[1] is None:
+        dht22 = dht22._replace(value=None)
+    dht22 = fresh_or_cached('dht22', dht22)
+    if 'dht22' in cached:
         log_message("WARNING", "Using cached outdoor values")
     
+    readings = {name: r for name, r in (('sht30', sht30), ('qmp6988', pressure), ('dht22', dht22))
+                if r is not None}
+    indoor_temp, indoor_hum = sht30.value if sht30 else (None, None)
+    outdoor_temp, outdoor_hum = dht22.value if dht22 else (None, None)
+    
     return {
         'indoor': {
             'temperature': indoor_temp,
             'humidity': indoor_hum,
-            'pressure': indoor_pressure
+            'pressure': pressure.value if pressure else None
         },
         'outdoor': {
             'temperature': outdoor_temp,
             'humidity': outdoor_hum
-        }
+        },
+        'readings': readings,
+        'cached': cached,
     }
 
 def send_data_with_retry(data):
-    """Send data to server with retry logic"""
+    """Send data to server with backoff, Retry-After and circuit breaker"""
     global stats
     
-    for attempt in range(MAX_RETRIES):
-        try:
-            response = requests.post(
-                SERVER_URL,
-                json=data,
-                timeout=REQUEST_TIMEOUT,
-                headers={'Content-Type': 'application/json'}
-            )
-            
-            if response.status_code == 200:
-                stats['send_success'] += 1
-                return True
-            elif response.status_code == 429:
-                log_message("WARNING", "Rate limited by server")
-                stats['send_fail'] += 1
-                return False
-            else:
-                log_message("ERROR", f"Server returned {response.status_code}")
-                
-        except requests.exceptions.Timeout:
-            log_message("ERROR", "Request timeout")
-        except Exception as e:
-            log_message("ERROR", f"Send failed: {e}")
-        
-        if attempt < MAX_RETRIES - 1:
-            time.sleep(RETRY_DELAY)
-    
-    stats['send_fail'] += 1
-    return False
+    ok = upload_retry.send(lambda: upload_session.post(
+        json=data,
+        headers={'Content-Type': 'application/json'}
+    ))
+    stats['send_success' if ok else 'send_fail'] += 1
+    return ok
+
+def deliver(payload):
+    """Store one payload, then upload the backlog in order (upload worker thread)"""
+    outbox.append(payload)
+    # The reading is stored now: never raise, or the worker would retry this
+    # call and store it a second time
+    try:
+        refused = outbox.rejected
+        sent = outbox.drain(send_data_with_retry)
+        if outbox.rejected > refused:
+            log_message("ERROR", f"Server refused {outbox.rejected - refused} reading(s), "
+                                 f"kept in the rejected table of {OUTBOX_PATH}")
+    except Exception as e:
+        log_message("ERROR", f"Upload error, {len(outbox)} reading(s) waiting in outbox: {e}")
+        return True
+    backlog = len(outbox)
+    if backlog == 0:
+        log_message("SUCCESS", f"Data sent successfully ({sent} reading(s))")
+    else:
+        log_message("ERROR", f"Failed to send data, {backlog} reading(s) waiting in outbox")
+    return True
+
+upload_retry = UploadRetry(
+    breaker=CircuitBreaker(failure_threshold=UPLOAD_BREAKER_FAILURES, reset_timeout=UPLOAD_BREAKER_RESET),
+    attempts=MAX_RETRIES, base_delay=UPLOAD_BASE_DELAY, max_delay=UPLOAD_MAX_DELAY,
+    log=lambda msg: log_message("ERROR", msg),
+)
+
+reporter = DeadbandPolicy(DEADBANDS, heartbeat=HEARTBEAT)
+reading_log = ReadingLog(READINGS_DIR)
+history = HistoryStore(HISTORY_DIR)
+rolling = RollingStats(fields=DEADBANDS)
+# Cycles start at :00 of every minute (for INTERVAL = 60)
+schedule = Schedule(INTERVAL)
+hampel = HampelStage(HAMPEL_FLOORS, window=HAMPEL_WINDOW, threshold=HAMPEL_THRESHOLD)
+rollups = Rollup(ROLLUP_PATH, fields=DEADBANDS)
+
+# Bounded hand-off queue; if the uploader falls behind the oldest readings spill to the outbox
+upload_worker = UploadWorker(deliver, maxsize=UPLOAD_QUEUE_SIZE, policy='spill', spill=outbox,
+                             retry_delay=INTERVAL, log=lambda msg: log_message("WARNING", msg))
 
 def print_stats():
     """Print statistics periodically"""
@@ -367,6 +414,38 @@ def print_stats():
         
         log_message("INFO", f"Stats - Indoor: {indoor_rate:.0f}% | Outdoor: {outdoor_rate:.0f}% | Send: {send_rate:.0f}% | I2C Resets: {stats['i2c_resets']}")
 
+        queue = upload_worker.stats()
+        age = f"{queue['oldest_age']:.0f}s" if queue['oldest_age'] is not None else "-"
+        up = upload_retry.stats()
+        log_message("INFO", f"Upload retry - breaker: {up['breaker_state']} (opened {up['breaker_opened']}x) | "
+                            f"retries: {up['retries']} | short-circuited: {up['short_circuits']}")
+        rep = reporter.stats()
+        log_message("INFO", f"Reporting - seen: {rep['seen']} | uploaded: {rep['reported']} | "
+                            f"heartbeats: {rep['heartbeats']}")
+        log_message("INFO", f"Upload queue - depth: {queue['depth']} (max {queue['max_depth']}) | oldest: {age} | "
+                            f"spilled: {queue['spilled']} | dropped: {queue['dropped']}")
+
+        filt = hampel.stats()
+        log_message("INFO", f"Outlier filter - replaced: {filt['replaced']} | " + " | ".join(
+            f"{f}: {v['outliers']}/{v['seen']}" for f, v in filt['fields'].items() if v['seen']))
+
+        sched = schedule.stats()
+        lateness = f"{sched['max_lateness']*1000:.0f}ms"
+        log_message("INFO", f"Schedule - cycles: {sched['ticks']} | late: {sched['late']} | "
+                            f"skipped: {sched['skipped']} | max lateness: {lateness} | resyncs: {sched['resyncs']}")
+
+        hour = {field: w['1h'] for field, w in rolling.stats().items() if w['1h']['count']}
+        if hour:
+            log_message("INFO", "Last hour - " + " | ".join(
+                f"{field}: {h['mean']:.1f} [{h['min']:.1f}..{h['max']:.1f}]" for field, h in hour.items()))
+
+        http = upload_session.stats()
+        if http['requests']:
+            log_message("INFO", f"HTTP - requests: {http['requests']} (HEAD: {http['heads']}) | "
+                                f"handshakes: {http['handshakes']} | "
+                                f"reuse: {http['reuse_ratio']:.0%} | latency p50: {http['p50_latency']*1000:.0f}ms "
+                                f"max: {http['max_latency']*1000:.0f}ms")
+
 def main():
     """Main loop with robust error handling"""
     log_message("INFO", "Weather Station starting with robust error handling...")
@@ -374,21 +453,40 @@ def main():
     log_message("INFO", f"DHT22 on GPIO{DHT22_GPIO}")
     
     cycle = 0
+    upload_worker.start()
     
     while True:
         try:
+            # Absolute deadlines on the minute; work time never stretches the period
+            tick = schedule.wait_blocking()
+            if tick.skipped:
+                log_message("WARNING", f"Previous cycle overran, skipped {tick.skipped} cycle(s)")
             cycle += 1
             
+            # Reopen the server connection while the sensors are read, but only
+            # when an upload is likely: a HEAD every cycle would cost as many
+            # requests as the dead-band saves
+            if len(outbox) or reporter.heartbeat_due(within=INTERVAL):
+                threading.Thread(target=upload_session.warm, daemon=True).start()
+            
             # Get sensor data
             data = get_sensor_data()
             
+            # Replace single-sample spikes that pass the range checks
+            flat, outliers = hampel.apply({f"{side}.{k}": v for side in ('indoor', 'outdoor')
+                                           for k, v in data[side].items()})
+            for field in outliers:
+                side, key = field.split('.')
+                log_message("WARNING", f"Outlier {field}={data[side][key]}, using median {flat[field]}")
+                data[side][key] = flat[field]
+            
             # Check if we have any valid data
             has_indoor = any(v is not None for v in data['indoor'].values())
             has_outdoor = any(v is not None for v in data['outdoor'].values())
             
             if has_indoor or has_outdoor:
                 # Build payload with available data
-                payload = {}
+                payload = {'timestamp': int(tick.wall_time)}
                 
                 if has_indoor:
                     payload['indoor'] = {k: v for k, v in data['indoor'].items() if v is not None}
@@ -396,6 +494,26 @@ def main():
                 if has_outdoor:
                     payload['outdoor'] = {k: v for k, v in data['outdoor'].items() if v is not None}
                 
+                # Dew point and absolute humidity ride along with each reading
+                for side in ('indoor', 'outdoor'):
+                    values = payload.get(side, {})
+                    if 'temperature' in values and 'humidity' in values:
+                        values['dew_point'] = round(dew_point(values['temperature'], values['humidity']), 1)
+                        values['absolute_humidity'] = round(
+                            absolute_humidity(values['temperature'], values['humidity']), 1)
+                
+                # When each value was acquired and how old it is; cached and stale ones are marked
+                now_ns = time.monotonic_ns()
+                stale = [name for name, r in data['readings'].items() if age(r, now_ns) > STALE_AFTER]
+                add_acquisition(payload, data['readings'], now_ns, data['cached'], stale)
+                if stale:
+                    log_message("WARNING", f"Stale values: {', '.join(stale)}")
+                # Cached and stale values are not stored again, so they show up as gaps
+                repeated = {f for name in (*data['cached'], *stale) for f in SENSOR_FIELDS[name]}
+                fresh = {side: {k: v for k, v in values.items() if f"{side}.{k}" not in repeated}
+                         if side in ('indoor', 'outdoor') else values
+                         for side, values in payload.items()}
+                
                 # Display data
                 if has_indoor:
                     ind = payload.get('indoor', {})
@@ -409,11 +527,31 @@ def main():
                 else:
                     log_message("WARNING", "No outdoor data available")
                 
-                # Send data
-                if send_data_with_retry(payload):
-                    log_message("SUCCESS", "Data sent successfully")
+                try:
+                    reading_log.append(payload)
+                except OSError as e:
+                    log_message("ERROR", f"Reading log error: {e}")
+                try:
+                    history.append(payload['timestamp'], {
+                        'temperature_indoor': fresh.get('indoor', {}).get('temperature'),
+                        'humidity_indoor': fresh.get('indoor', {}).get('humidity'),
+                        'pressure': fresh.get('indoor', {}).get('pressure'),
+                        'temperature_outdoor': fresh.get('outdoor', {}).get('temperature'),
+                        'humidity_outdoor': fresh.get('outdoor', {}).get('humidity'),
+                    })
+                except ValueError as e:
+                    log_message("ERROR", f"History not updated: {e}")
+                rolling.update(fresh)
+                try:
+                    rollups.add_payload(fresh)
+                except sqlite3.Error as e:
+                    log_message("ERROR", f"Rollup not updated: {e}")
+                
+                # Upload happens on the worker thread; the loop never waits on the network
+                if reporter.should_report(payload):
+                    upload_worker.submit(payload)
                 else:
-                    log_message("ERROR", "Failed to send data")
+                    log_message("INFO", "Unchanged within dead-band, not uploaded")
             else:
                 log_message("ERROR", "No sensor data available")
             
@@ -421,17 +559,20 @@ def main():
             if cycle % 10 == 0:
                 print_stats()
             
-            # Wait for next cycle
-            time.sleep(INTERVAL)
-            
         except KeyboardInterrupt:
             log_message("INFO", "Shutting down...")
             break
         except Exception as e:
             log_message("ERROR", f"Unexpected error: {e}")
-            time.sleep(INTERVAL)
     
     # Cleanup
+    dht22_worker.stop()
+    upload_worker.stop(timeout=REQUEST_TIMEOUT)
+    outbox.close()
+    reading_log.close()
+    history.close()
+    rollups.close()
+    upload_session.close()
     try:
         if bus:
             bus.close()
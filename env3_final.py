@@ -4,6 +4,8 @@ import requests
 import smbus2
 import struct
 
+from crc import crc8
+
 # ENV III Module addresses
 SHT30_ADDR = 0x44
 QMP6988_ADDR = 0x70
@@ -17,18 +19,6 @@ INTERVAL = 60  # seconds
 bus = smbus2.SMBus(1)
 print("Using I2C bus 1 (GPIO2/GPIO3)")
 
-def crc8(data):
-    """Calculate CRC8 for SHT30"""
-    crc = 0xFF
-    for byte in data:
-        crc ^= byte
-        for _ in range(8):
-            if crc & 0x80:
-                crc = (crc << 1) ^ 0x31
-            else:
-                crc = crc << 1
-    return crc & 0xFF
-
 def read_sht30():
     """Read SHT30 temperature and humidity sensor"""
     try:
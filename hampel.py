@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Streaming Hampel (rolling median + MAD) outlier filter.
+
+The DHT22 now and then returns a single garbage sample that still passes
+the static range checks. ``HampelFilter`` judges each new sample against
+the last ``window`` samples of the same field: it is an outlier when
+
+    |x - median| > threshold * max(1.4826 * MAD, floor)
+
+where MAD is the median absolute deviation of the window. ``floor`` keeps
+a run of identical (rounded) readings, whose MAD is 0, from flagging the
+next legitimate 0.1 step.
+
+The window is kept as an insertion-order deque plus a sorted list, so the
+median is an index lookup; inserting and removing a sample is a bisect,
+O(log w) comparisons (plus a short memmove). The MAD is the median of the
+two sorted distance sequences on either side of the median, found by a
+binary search over both without building them: O(log w) as well.
+
+Every sample, outlier or not, enters the window, so a genuine step change
+is accepted once it fills half the window.
+
+``HampelStage`` runs one filter per field over a reading dict and either
+replaces outliers with the window median or only flags them.
+"""
+
+import bisect
+from collections import deque
+
+MAD_SCALE = 1.4826  # MAD -> standard deviation for normal data
+
+# Field -> floor for the scale (same units as the field)
+DEFAULT_FLOORS = {
+    'temperature_indoor': 0.2,
+    'humidity_indoor': 1.0,
+    'pressure': 0.3,
+    'temperature_outdoor': 0.3,
+    'humidity_outdoor': 1.5,
+}
+
+MODES = ('replace', 'flag')
+
+
+class HampelFilter:
+    """Rolling median/MAD outlier test for one stream of numbers."""
+
+    def __init__(self, window=7, threshold=3.0, floor=0.0):
+        if window < 3:
+            raise ValueError("Hampel window must hold at least 3 samples")
+        self.window = window
+        self.threshold = threshold
+        self.floor = floor
+        self._order = deque()
+        self._sorted = []
+
+        self.seen = 0
+        self.outliers = 0
+
+    def __len__(self):
+        return len(self._order)
+
+    def median(self):
+        a, n = self._sorted, len(self._sorted)
+        if not n:
+            return None
+        mid = n // 2
+        return a[mid] if n % 2 else (a[mid - 1] + a[mid]) / 2
+
+    def _kth_distance(self, m, split, k):
+        """k-th smallest |a[i] - m| (0-based).
+
+        Distances left of ``split`` grow as the index falls (m - a[split-1-t]),
+        those from ``split`` on grow with the index (a[split+t] - m): two
+        sorted sequences, searched for their k-th element together.
+        """
+        a = self._sorted
+        left_len, right_len = split, len(a) - split
+        lo, hi = max(0, k + 1 - right_len), min(k + 1, left_len)
+        # Smallest i (taken from the left, k + 1 - i from the right) whose
+        # last right element is not larger than the next left one
+        while lo < hi:
+            i = (lo + hi) // 2
+            j = k + 1 - i
+            if j > 0 and a[split + j - 1] - m > m - a[split - 1 - i]:
+                lo = i + 1
+            else:
+                hi = i
+        i = lo
+        j = k + 1 - i
+        candidates = []
+        if i > 0:
+            candidates.append(m - a[split - i])
+        if j > 0:
+            candidates.append(a[split + j - 1] - m)
+        return max(candidates)
+
+    def mad(self):
+        n = len(self._sorted)
+        if not n:
+            return None
+        m = self.median()
+        split = bisect.bisect_left(self._sorted, m)
+        mid = n // 2
+        if n % 2:
+            return self._kth_distance(m, split, mid)
+        return (self._kth_distance(m, split, mid - 1) + self._kth_distance(m, split, mid)) / 2
+
+    def is_outlier(self, x):
+        """Test ``x`` against the current window without adding it."""
+        if len(self._order) < self.window // 2 + 1:
+            return False
+        scale = max(MAD_SCALE * self.mad(), self.floor)
+        return abs(x - self.median()) > self.threshold * scale
+
+    def push(self, x):
+        self._order.append(x)
+        bisect.insort(self._sorted, x)
+        if len(self._order) > self.window:
+            old = self._order.popleft()
+            del self._sorted[bisect.bisect_left(self._sorted, old)]
+
+    def update(self, x):
+        """Test ``x``, add it to the window; returns ``(median_before, is_outlier)``."""
+        median = self.median()
+        outlier = self.is_outlier(x)
+        self.push(x)
+        self.seen += 1
+        if outlier:
+            self.outliers += 1
+        return median, outlier
+
+    def stats(self):
+        return {
+            'seen': self.seen,
+            'outliers': self.outliers,
+            'rate': self.outliers / self.seen if self.seen else 0.0,
+            'median': self.median(),
+            'mad': self.mad(),
+        }
+
+
+class HampelStage:
+    """Per-field Hampel filters over reading dicts."""
+
+    def __init__(self, floors=None, window=7, threshold=3.0, mode='replace'):
+        if mode not in MODES:
+            raise ValueError(f"Unknown Hampel mode {mode!r}, expected one of {MODES}")
+        self.mode = mode
+        floors = DEFAULT_FLOORS if floors is None else floors
+        self.filters = {field: HampelFilter(window, threshold, floor) for field, floor in floors.items()}
+        self.replaced = 0
+        self.flagged = 0
+
+    def apply(self, values):
+        """Filter a ``{field: value}`` dict; returns ``(values, outlier_fields)``.
+
+        In ``replace`` mode outliers are swapped for the window median; in
+        ``flag`` mode values pass unchanged. None values are skipped.
+        """
+        out = dict(values)
+        outliers = []
+        for field, value in values.items():
+            hampel = self.filters.get(field)
+            if hampel is None or value is None:
+                continue
+            median, outlier = hampel.update(value)
+            if outlier:
+                outliers.append(field)
+                if self.mode == 'replace':
+                    out[field] = median
+                    self.replaced += 1
+                else:
+                    self.flagged += 1
+        return out, outliers
+
+    def stats(self):
+        """``{field: filter stats}`` plus the stage totals."""
+        return {
+            'mode': self.mode,
+            'replaced': self.replaced,
+            'flagged': self.flagged,
+            'fields': {field: hampel.stats() for field, hampel in self.filters.items()},
+        }
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Local time-series history as memory-mapped column chunks.
+
+The store is a ring of ``chunks`` fixed-size chunks of ``chunk_size`` rows.
+Every chunk is one file per column, memory-mapped with NumPy:
+
+- ``chunk-NNN.timestamp``: int64 epoch milliseconds, 0 marks an unused row
+- ``chunk-NNN.<field>``: float32, or int16 raw counts of ``scale`` units
+
+``append()`` writes one row into the current chunk: O(1), no file grows.
+When the chunk is full the oldest chunk is cleared and reused, so the
+store never holds more than ``chunks * chunk_size`` rows. Readers get
+zero-copy views of the mapped files through ``chunks()`` and ``query()``;
+``read()`` concatenates and scales them for convenience.
+
+With the defaults (one week of 1-minute rows per chunk, 53 chunks, int16
+counts for the five station fields) a year of data takes about 9.5 MB:
+8 bytes of timestamp plus 2 bytes per field per row.
+"""
+
+import json
+import os
+
+import numpy as np
+
+# name -> (dtype, scale); int16 fields store round(value / scale)
+DEFAULT_FIELDS = {
+    'temperature_indoor': ('int16', 0.01),
+    'humidity_indoor': ('int16', 0.01),
+    'pressure': ('int16', 0.1),
+    'temperature_outdoor': ('int16', 0.01),
+    'humidity_outdoor': ('int16', 0.01),
+}
+DEFAULT_CHUNK_SIZE = 7 * 24 * 60  # one week of 1-minute readings
+DEFAULT_CHUNKS = 53
+
+# Missing value markers
+INT16_MISSING = np.iinfo(np.int16).min
+_DTYPES = {'int16': np.int16, 'float32': np.float32}
+
+
+class HistoryStore:
+    """Ring buffer of memory-mapped column chunks under ``directory``."""
+
+    def __init__(self, directory, fields=None, chunk_size=DEFAULT_CHUNK_SIZE, chunks=DEFAULT_CHUNKS):
+        fields = dict(DEFAULT_FIELDS if fields is None else fields)
+        for name, (dtype, _) in fields.items():
+            if dtype not in _DTYPES:
+                raise ValueError(f"Field {name!r}: dtype must be 'int16' or 'float32', not {dtype!r}")
+        if chunks < 2:
+            raise ValueError("A ring needs at least 2 chunks")
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._check_layout(fields, chunk_size, chunks)
+        self.fields = fields
+        self.chunk_size = chunk_size
+        self.n_chunks = chunks
+
+        # Columns are mapped once; r+ keeps the files fixed-size
+        self._columns = [self._map(i) for i in range(chunks)]
+        self._fill = [int(np.count_nonzero(c['timestamp'])) for c in self._columns]
+        used = [i for i in range(chunks) if self._fill[i]]
+        self._current = max(used, key=lambda i: self._columns[i]['timestamp'][0]) if used else 0
+        pos = self._fill[self._current]
+        self._last = int(self._columns[self._current]['timestamp'][pos - 1]) if pos else 0
+
+    def _check_layout(self, fields, chunk_size, chunks):
+        meta_path = os.path.join(self.directory, 'store.json')
+        layout = {'fields': {k: list(v) for k, v in fields.items()},
+                  'chunk_size': chunk_size, 'chunks': chunks}
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding='utf-8') as f:
+                existing = json.load(f)
+            if existing != layout:
+                raise ValueError(f"{self.directory} holds a store with a different layout: {existing}")
+        else:
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump(layout, f, indent=1)
+
+    def _map(self, index):
+        columns = {}
+        specs = [('timestamp', np.int64)] + [(k, _DTYPES[v[0]]) for k, v in self.fields.items()]
+        for name, dtype in specs:
+            path = os.path.join(self.directory, f"chunk-{index:03d}.{name}")
+            mode = 'r+' if os.path.exists(path) else 'w+'
+            columns[name] = np.memmap(path, dtype=dtype, mode=mode, shape=(self.chunk_size,))
+        return columns
+
+    def __len__(self):
+        return sum(self._fill)
+
+    @property
+    def capacity(self):
+        return self.chunk_size * self.n_chunks
+
+    def _encode(self, name, value):
+        dtype, scale = self.fields[name]
+        if dtype == 'float32':
+            return np.nan if value is None else value
+        if value is None:
+            return INT16_MISSING
+        count = round(value / scale)
+        if not INT16_MISSING < count <= np.iinfo(np.int16).max:
+            raise ValueError(f"{name}={value} does not fit int16 counts of {scale}")
+        return count
+
+    def append(self, timestamp, values):
+        """Store one row; ``timestamp`` in epoch seconds, ``values`` a dict of fields.
+
+        Fields not in ``values`` (or None) are stored as missing. Timestamps
+        must not go backwards, so every chunk stays sorted for ``query()``.
+        """
+        ts = int(round(timestamp * 1000))
+        if ts <= 0:
+            raise ValueError(f"Timestamp must be positive, got {timestamp}")
+        if ts < self._last:
+            raise ValueError(f"Timestamp {timestamp} is older than the last stored row")
+        encoded = {name: self._encode(name, values.get(name)) for name in self.fields}
+
+        if self._fill[self._current] == self.chunk_size:
+            self._rotate()
+        columns, pos = self._columns[self._current], self._fill[self._current]
+        for name, value in encoded.items():
+            columns[name][pos] = value
+        # Timestamp last: a row is only visible once all its values are in
+        columns['timestamp'][pos] = ts
+        self._fill[self._current] = pos + 1
+        self._last = ts
+
+    def append_payload(self, payload):
+        """Store a ``payload.build_payload`` dict."""
+        self.append(payload['timestamp'], payload)
+
+    def _rotate(self):
+        self._current = (self._current + 1) % self.n_chunks
+        # Overwrite the oldest chunk; clearing timestamps marks every row unused
+        self._columns[self._current]['timestamp'][:] = 0
+        self._fill[self._current] = 0
+
+    def chunks(self):
+        """Yield ``{column: view}`` for each non-empty chunk, oldest first.
+
+        The views map the files directly (no copy) and are trimmed to the
+        rows in use; they stay valid until the ring wraps onto that chunk.
+        """
+        for step in range(1, self.n_chunks + 1):
+            index = (self._current + step) % self.n_chunks
+            fill = self._fill[index]
+            if fill:
+                yield {name: column[:fill] for name, column in self._columns[index].items()}
+
+    def query(self, start=None, end=None):
+        """Like ``chunks()``, restricted to ``start <= t < end`` (epoch seconds)."""
+        lo = None if start is None else int(round(start * 1000))
+        hi = None if end is None else int(round(end * 1000))
+        for chunk in self.chunks():
+            ts = chunk['timestamp']
+            if (hi is not None and ts[0] >= hi) or (lo is not None and ts[-1] < lo):
+                continue
+            a = 0 if lo is None else int(np.searchsorted(ts, lo, side='left'))
+            b = len(ts) if hi is None else int(np.searchsorted(ts, hi, side='left'))
+            yield {name: column[a:b] for name, column in chunk.items()}
+
+    def values(self, name, raw):
+        """Scale a raw column view of ``name`` to float64, missing values as NaN."""
+        dtype, scale = self.fields[name]
+        if dtype == 'float32':
+            return raw.astype(np.float64)
+        out = raw.astype(np.float64) * scale
+        out[raw == INT16_MISSING] = np.nan
+        return out
+
+    def read(self, name, start=None, end=None):
+        """``(timestamps_ms, values)`` of one field as new contiguous arrays."""
+        parts = list(self.query(start, end))
+        if not parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        ts = np.concatenate([p['timestamp'] for p in parts])
+        return ts, self.values(name, np.concatenate([p[name] for p in parts]))
+
+    def flush(self):
+        """Write the current chunk's dirty pages to disk."""
+        for column in self._columns[self._current].values():
+            column.flush()
+
+    def close(self):
+        for columns in self._columns:
+            for column in columns.values():
+                column.flush()
+        # numpy unmaps each file once no reader view refers to it any more
+        self._columns = []
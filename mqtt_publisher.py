@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Minimal MQTT 3.1.1 publisher for LAN consumers (Home Assistant, Node-RED).
+
+Only what the station needs: CONNECT, PUBLISH at QoS 0/1/2, PINGREQ and
+DISCONNECT over plain TCP, standard library only. ``MQTTPublisher`` keeps
+the broker connection on a background thread; ``publish()`` and
+``publish_field()`` only append to a bounded in-memory buffer, so the
+sampling loop never waits on the broker. While the broker is unreachable
+the buffer holds the newest ``buffer_size`` messages and is flushed in
+order after reconnecting.
+
+Each field goes to its own retained topic, ``<prefix>/<field>``, with the
+value as plain text, so a consumer that subscribes later gets the latest
+reading right away.
+"""
+
+import json
+import socket
+import struct
+import threading
+import time
+from collections import deque
+
+CONNECT = 1
+CONNACK = 2
+PUBLISH = 3
+PUBACK = 4
+PUBREC = 5
+PUBREL = 6
+PUBCOMP = 7
+PINGREQ = 12
+PINGRESP = 13
+DISCONNECT = 14
+
+
+class MQTTError(Exception):
+    """Protocol error or broker refusal."""
+
+
+def encode_length(length):
+    """MQTT variable-length "remaining length" encoding."""
+    out = bytearray()
+    while True:
+        byte, length = length % 128, length // 128
+        out.append(byte | (0x80 if length else 0))
+        if not length:
+            return bytes(out)
+
+
+def _string(value):
+    data = value.encode('utf-8') if isinstance(value, str) else value
+    return struct.pack('>H', len(data)) + data
+
+
+def _packet(first_byte, body=b''):
+    return bytes([first_byte]) + encode_length(len(body)) + body
+
+
+def connect_packet(client_id, keepalive=60, username=None, password=None):
+    flags = 0x02  # clean session
+    payload = _string(client_id)
+    if username is not None:
+        flags |= 0x80
+        payload += _string(username)
+        if password is not None:
+            flags |= 0x40
+            payload += _string(password)
+    variable = _string('MQTT') + bytes([4, flags]) + struct.pack('>H', int(keepalive))
+    return _packet(CONNECT << 4, variable + payload)
+
+
+def publish_packet(topic, payload, qos=0, retain=False, packet_id=None, dup=False):
+    first = (PUBLISH << 4) | (qos << 1) | (0x01 if retain else 0) | (0x08 if dup and qos else 0)
+    body = _string(topic)
+    if qos:
+        body += struct.pack('>H', packet_id)
+    return _packet(first, body + payload)
+
+
+def _recv_exact(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise MQTTError("Connection closed by broker")
+        data += chunk
+    return data
+
+
+def read_packet(sock):
+    """Read one packet; returns ``(type, flags, body)``."""
+    first = _recv_exact(sock, 1)[0]
+    length, shift = 0, 0
+    while True:
+        byte = _recv_exact(sock, 1)[0]
+        length |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            break
+        shift += 7
+        if shift > 21:
+            raise MQTTError("Malformed remaining length")
+    return first >> 4, first & 0x0F, _recv_exact(sock, length) if length else b''
+
+
+def format_value(value):
+    """Plain-text payload for a field value."""
+    if isinstance(value, float):
+        return f"{value:.1f}".encode('ascii')
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(',', ':')).encode('utf-8')
+    return str(value).encode('utf-8')
+
+
+class MQTTPublisher:
+    """Background MQTT publisher with a bounded offline buffer."""
+
+    def __init__(self, host, port=1883, client_id='weather-station', topic_prefix='weather-station',
+                 qos=1, retain=True, buffer_size=1000, keepalive=60, timeout=5.0,
+                 reconnect_delay=5.0, username=None, password=None, log=print):
+        if qos not in (0, 1, 2):
+            raise ValueError(f"QoS must be 0, 1 or 2, not {qos!r}")
+        self.address = (host, port)
+        self.client_id = client_id
+        self.topic_prefix = topic_prefix.rstrip('/')
+        self.qos = qos
+        self.retain = retain
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self.reconnect_delay = reconnect_delay
+        self.username = username
+        self.password = password
+        self.log = log
+
+        self._buffer = deque(maxlen=buffer_size)
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        self._sock = None
+        self._packet_id = 0
+
+        self.published = 0
+        self.dropped = 0
+        self.connects = 0
+        self.connect_failures = 0
+        self.send_failures = 0
+
+    @property
+    def connected(self):
+        return self._sock is not None
+
+    # -- producer side -------------------------------------------------------
+
+    def publish(self, topic, payload, qos=None, retain=None):
+        """Queue one message; never blocks on the network."""
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        message = (topic, payload, self.qos if qos is None else qos,
+                   self.retain if retain is None else retain)
+        with self._cond:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append(message)
+            self._cond.notify()
+
+    def publish_field(self, field, value):
+        """Publish ``value`` to the retained ``<prefix>/<field>`` topic."""
+        if value is not None:
+            self.publish(f"{self.topic_prefix}/{field}", format_value(value))
+
+    def buffered(self):
+        with self._cond:
+            return len(self._buffer)
+
+    # -- connection thread ---------------------------------------------------
+
+    def _next_packet_id(self):
+        self._packet_id = self._packet_id % 0xFFFF + 1
+        return self._packet_id
+
+    def _connect(self):
+        sock = socket.create_connection(self.address, timeout=self.timeout)
+        try:
+            sock.sendall(connect_packet(self.client_id, self.keepalive, self.username, self.password))
+            kind, _, body = read_packet(sock)
+            if kind != CONNACK or len(body) != 2:
+                raise MQTTError(f"Expected CONNACK, got packet type {kind}")
+            if body[1] != 0:
+                raise MQTTError(f"Broker refused connection (return code {body[1]})")
+        except BaseException:
+            sock.close()
+            raise
+        self._sock = sock
+        self.connects += 1
+
+    def _disconnect(self, graceful=False):
+        sock, self._sock = self._sock, None
+        if sock is None:
+            return
+        if graceful:
+            try:
+                sock.sendall(_packet(DISCONNECT << 4))
+            except OSError:
+                pass
+        sock.close()
+
+    def _expect(self, kind, packet_id):
+        got, _, body = read_packet(self._sock)
+        if got != kind or struct.unpack('>H', body[:2])[0] != packet_id:
+            raise MQTTError(f"Expected packet type {kind} for id {packet_id}, got {got}")
+
+    def _send(self, message, dup=False):
+        topic, payload, qos, retain = message
+        packet_id = self._next_packet_id() if qos else None
+        self._sock.sendall(publish_packet(topic, payload, qos, retain, packet_id, dup))
+        if qos == 1:
+            self._expect(PUBACK, packet_id)
+        elif qos == 2:
+            self._expect(PUBREC, packet_id)
+            self._sock.sendall(_packet((PUBREL << 4) | 0x02, struct.pack('>H', packet_id)))
+            self._expect(PUBCOMP, packet_id)
+
+    def _ping(self):
+        self._sock.sendall(_packet(PINGREQ << 4))
+        kind, _, _ = read_packet(self._sock)
+        if kind != PINGRESP:
+            raise MQTTError(f"Expected PINGRESP, got packet type {kind}")
+
+    def _wait(self, predicate, timeout):
+        with self._cond:
+            return self._cond.wait_for(predicate, timeout=timeout)
+
+    def _run(self):
+        retry = False
+        while not self._stopping:
+            if self._sock is None:
+                try:
+                    self._connect()
+                except (OSError, MQTTError) as e:
+                    self.connect_failures += 1
+                    self.log(f"MQTT connect to {self.address[0]}:{self.address[1]} failed: {e}")
+                    self._wait(lambda: self._stopping, self.reconnect_delay)
+                    continue
+
+            if not self._wait(lambda: self._buffer or self._stopping, self.keepalive / 2):
+                try:
+                    self._ping()
+                except (OSError, MQTTError):
+                    self._disconnect()
+                continue
+            if self._stopping:
+                break
+
+            with self._cond:
+                message = self._buffer[0]
+            try:
+                self._send(message, dup=retry)
+            except (OSError, MQTTError) as e:
+                # Keep the message at the head and resend after reconnecting
+                self.send_failures += 1
+                self.log(f"MQTT publish failed, buffering: {e}")
+                self._disconnect()
+                retry = True
+                continue
+            retry = False
+            with self._cond:
+                if self._buffer and self._buffer[0] is message:
+                    self._buffer.popleft()
+                self.published += 1
+        self._disconnect(graceful=True)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='mqtt', daemon=True)
+            self._thread.start()
+        return self
+
+    def flush(self, timeout=5.0):
+        """Wait until the buffer is empty; True if it emptied in time."""
+        end = time.monotonic() + timeout
+        while self.buffered():
+            if time.monotonic() >= end:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stop(self, timeout=5.0):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            'connected': self.connected,
+            'buffered': self.buffered(),
+            'published': self.published,
+            'dropped': self.dropped,
+            'connects': self.connects,
+            'connect_failures': self.connect_failures,
+            'send_failures': self.send_failures,
+        }
+
+
+class MQTTSink:
+    """``sinks.FanOut`` sink publishing the whole payload as JSON to ``<prefix>/<topic>``."""
+
+    def __init__(self, publisher, topic='state', name='mqtt'):
+        self.name = name
+        self.publisher = publisher
+        self.topic = f"{publisher.topic_prefix}/{topic}"
+
+    def send(self, payload):
+        self.publisher.publish(self.topic, json.dumps(payload, separators=(',', ':')))
+        return True
+
+    def close(self):
+        pass
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Durable store-and-forward outbox for readings.
+
+Every payload is appended to a SQLite database (WAL mode) with a sequence
+number before any upload is attempted. A drainer then uploads the backlog
+in sequence order and deletes what the server accepted, so a network outage
+delays readings instead of losing them.
+
+Appends are a single-row insert. With ``synchronous=NORMAL`` in WAL mode a
+commit does not fsync; the WAL is fsynced at checkpoints, which ``Outbox``
+forces every ``sync_every`` appends or ``sync_interval`` seconds. That
+groups SD-card flushes while bounding what a power cut can lose.
+
+A payload the server refuses for good (``retry.REJECTED``) would block
+the queue forever, so the drainers move it to the ``rejected`` table
+(a dead letter, kept for inspection) and go on with the next one. After
+``max_rejections`` refusals in a row they stop instead: a server that
+refuses everything is misconfigured, and the backlog must wait for it
+rather than end up in the dead letters.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+from retry import REJECTED
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    payload TEXT NOT NULL
+)
+"""
+
+REJECTED_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rejected (
+    seq INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    rejected REAL NOT NULL,
+    payload TEXT NOT NULL
+)
+"""
+
+
+class Outbox:
+    """Ordered, persistent queue of JSON payloads."""
+
+    def __init__(self, path, sync_every=32, sync_interval=300.0, clock=time.monotonic):
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        # Appends come from the sampling side, drains from the upload thread
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(SCHEMA)
+        self._db.execute(REJECTED_SCHEMA)
+
+        self._unsynced = 0
+        self._last_sync = clock()
+        self.appended = 0
+        self.delivered = 0
+        self.rejected = 0
+        self.syncs = 0
+
+    def append(self, payload):
+        """Store one payload and return its sequence number."""
+        body = json.dumps(payload, separators=(',', ':'))
+        with self._lock:
+            cur = self._db.execute(
+                "INSERT INTO outbox (created, payload) VALUES (?, ?)", (time.time(), body))
+            self.appended += 1
+            self._unsynced += 1
+            if (self._unsynced >= self.sync_every
+                    or self._clock() - self._last_sync >= self.sync_interval):
+                self._sync()
+            return cur.lastrowid
+
+    def _sync(self):
+        # A checkpoint copies the WAL into the database file and fsyncs it
+        self._db.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        self._unsynced = 0
+        self._last_sync = self._clock()
+        self.syncs += 1
+
+    def sync(self):
+        """Force pending appends to stable storage."""
+        with self._lock:
+            self._sync()
+
+    def peek(self, limit=100):
+        """Return up to ``limit`` oldest ``(seq, payload)`` pairs."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, payload FROM outbox ORDER BY seq LIMIT ?", (limit,)).fetchall()
+        return [(seq, json.loads(body)) for seq, body in rows]
+
+    def ack(self, seq):
+        """Remove every entry up to and including ``seq``."""
+        with self._lock:
+            cur = self._db.execute("DELETE FROM outbox WHERE seq <= ?", (seq,))
+            self.delivered += cur.rowcount
+
+    def reject(self, seq):
+        """Move entry ``seq`` from the queue to the ``rejected`` table."""
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.execute(
+                "INSERT OR REPLACE INTO rejected (seq, created, rejected, payload) "
+                "SELECT seq, created, ?, payload FROM outbox WHERE seq = ?", (time.time(), seq))
+            cur = self._db.execute("DELETE FROM outbox WHERE seq = ?", (seq,))
+            self._db.execute("COMMIT")
+            self.rejected += cur.rowcount
+
+    def dead_letters(self, limit=100):
+        """Return up to ``limit`` oldest rejected ``(seq, payload)`` pairs."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, payload FROM rejected ORDER BY seq LIMIT ?", (limit,)).fetchall()
+        return [(seq, json.loads(body)) for seq, body in rows]
+
+    def drain(self, send, batch=100, limit=None, max_rejections=10):
+        """Upload the backlog in order with ``send(payload) -> bool``.
+
+        Stops at the first payload ``send`` fails, so nothing is ever
+        delivered out of order; a payload answered with ``REJECTED`` is
+        moved to the dead letters instead, up to ``max_rejections`` in a
+        row. Returns the number delivered.
+        """
+        sent = 0
+        rejections = 0
+        while limit is None or sent < limit:
+            entries = self.peek(batch if limit is None else min(batch, limit - sent))
+            if not entries:
+                break
+            for seq, payload in entries:
+                ok = send(payload)
+                if ok is REJECTED:
+                    self.reject(seq)
+                    rejections += 1
+                    if rejections >= max_rejections:
+                        return sent
+                    continue
+                if not ok:
+                    return sent
+                self.ack(seq)
+                sent += 1
+                rejections = 0
+        return sent
+
+    def drain_batches(self, send_batch, batch_size=100, max_rejections=10):
+        """Upload the backlog in order, ``batch_size`` payloads per ``send_batch`` call.
+
+        ``batch_size`` may be a callable so the caller can adapt it between
+        batches. Stops at the first failed batch; returns the number of
+        payloads delivered. A batch answered with ``REJECTED`` is sent again
+        one payload at a time until the refused payload is found and moved
+        to the dead letters; ``max_rejections`` in a row stop the drain.
+        """
+        sent = 0
+        rejections = 0
+        single = False
+        while True:
+            size = 1 if single else (batch_size() if callable(batch_size) else batch_size)
+            entries = self.peek(size)
+            if not entries:
+                break
+            ok = send_batch([payload for _, payload in entries])
+            if ok is REJECTED:
+                if len(entries) == 1:
+                    self.reject(entries[0][0])
+                    rejections += 1
+                    if rejections >= max_rejections:
+                        break
+                    single = False
+                else:
+                    single = True
+                continue
+            if not ok:
+                break
+            self.ack(entries[-1][0])
+            sent += len(entries)
+            rejections = 0
+        return sent
+
+    def oldest_age(self):
+        """Seconds since the oldest undelivered payload was stored, or ``None``."""
+        with self._lock:
+            row = self._db.execute("SELECT MIN(created) FROM outbox").fetchone()
+        return None if row[0] is None else time.time() - row[0]
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._sync()
+            self._db.close()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Upload payload assembly shared by the station scripts.
+"""
+
+import time
+
+from acquisition import age
+from derived import absolute_humidity, dew_point, heat_index
+
+# Fields computed from the measured ones by add_derived()
+DERIVED_KEYS = {
+    'indoor': ('dew_point_indoor', 'absolute_humidity_indoor'),
+    'outdoor': ('dew_point_outdoor', 'absolute_humidity_outdoor', 'heat_index_outdoor'),
+}
+
+# Fields added by add_acquisition()
+ACQUISITION_KEYS = ('acquired', 'age', 'cached', 'stale')
+
+
+def build_payload(indoor_temp, indoor_humidity, pressure,
+                  outdoor_temp, outdoor_humidity, timestamp=None, derived=True):
+    """Assemble the dict POSTed to the server.
+
+    Indoor (ENV III) values are the primary ``temperature``/``humidity``
+    fields; the outdoor DHT22 takes over when the indoor sensor failed.
+    With ``derived`` the dew point and friends are added (``add_derived``).
+    """
+    data = {
+        'timestamp': int(time.time()) if timestamp is None else int(timestamp)
+    }
+
+    # Add indoor data from ENV III
+    if indoor_temp is not None and indoor_humidity is not None:
+        # Primary data fields for backward compatibility
+        data['temperature'] = round(indoor_temp, 1)
+        data['humidity'] = round(indoor_humidity, 1)
+        # Explicitly marked indoor data
+        data['temperature_indoor'] = round(indoor_temp, 1)
+        data['humidity_indoor'] = round(indoor_humidity, 1)
+        data['sensor_indoor'] = 'ENV3'
+
+    # Add outdoor data from DHT22
+    if outdoor_temp is not None and outdoor_humidity is not None:
+        data['temperature_outdoor'] = round(outdoor_temp, 1)
+        data['humidity_outdoor'] = round(outdoor_humidity, 1)
+        data['sensor_outdoor'] = 'DHT22'
+
+        # If indoor failed, use outdoor as primary
+        if 'temperature' not in data:
+            data['temperature'] = round(outdoor_temp, 1)
+            data['humidity'] = round(outdoor_humidity, 1)
+
+    # Add pressure if available (indoor sensor)
+    if pressure is not None:
+        data['pressure'] = round(pressure, 1)
+        data['pressure_indoor'] = round(pressure, 1)
+
+    return add_derived(data) if derived else data
+
+
+def add_derived(data):
+    """Add dew point, absolute humidity and heat index to a payload in place.
+
+    Computed from the rounded payload values, so anyone holding the payload
+    (or its binary record) gets exactly the same derived numbers.
+    """
+    for side, keys in DERIVED_KEYS.items():
+        temp, hum = data.get(f'temperature_{side}'), data.get(f'humidity_{side}')
+        if temp is None or hum is None:
+            continue
+        values = (dew_point(temp, hum), absolute_humidity(temp, hum), heat_index(temp, hum))
+        for key, value in zip(keys, values):
+            data[key] = round(value, 1)
+    return data
+
+
+def add_acquisition(data, readings, now_ns=None, cached=(), stale=()):
+    """Add per-sensor acquisition time and age plus the cached/stale marks, in place.
+
+    ``readings`` maps sensor names to ``acquisition.Reading``; ages are
+    taken at monotonic ``now_ns``. ``acquired`` holds epoch milliseconds
+    (nanoseconds would not survive a JSON double), ``age`` seconds.
+    ``cached`` lists sensors whose reading was already sent before,
+    ``stale`` those older than their maximum age; both only when not empty.
+    """
+    data['acquired'] = {name: r.wall_ns // 1_000_000 for name, r in readings.items()}
+    data['age'] = {name: round(age(r, now_ns), 3) for name, r in readings.items()}
+    if cached:
+        data['cached'] = sorted(cached)
+    if stale:
+        data['stale'] = sorted(stale)
+    return data
+
+
+def describe(data):
+    """One-line human readable summary of a payload for the log."""
+    output_parts = []
+    if 'temperature_indoor' in data:
+        output_parts.append(f"Indoor(ENV3): {data['temperature_indoor']}°C, {data['humidity_indoor']}%")
+        if 'pressure' in data:
+            output_parts.append(f"Pressure: {data['pressure']}hPa")
+    if 'temperature_outdoor' in data:
+        output_parts.append(f"Outdoor(DHT22): {data['temperature_outdoor']}°C, {data['humidity_outdoor']}%")
+    return ' | '.join(output_parts)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Compact binary encoding of the upload payload.
+
+The JSON payload repeats long key names and duplicates values
+(``temperature``/``temperature_indoor``, ``pressure``/``pressure_indoor``,
+``sensor_indoor: "ENV3"``) every minute. A v1 record carries each value
+once in a fixed 16-byte struct:
+
+    offset  type    field
+    0       uint8   schema version (1)
+    1       uint32  timestamp (Unix seconds)
+    5       uint8   flags: 1 = indoor, 2 = outdoor, 4 = pressure
+    6       int16   indoor temperature  (0.1 °C)
+    8       uint16  indoor humidity     (0.1 %)
+    10      int16   outdoor temperature (0.1 °C)
+    12      uint16  outdoor humidity    (0.1 %)
+    14      uint16  pressure            (0.1 hPa)
+
+All fields are big-endian; absent values are zero and their flag is clear.
+``decode_record`` rebuilds exactly the dict ``payload.build_payload``
+produces, so the server can turn a record back into the JSON it stores
+today. Derived fields (dew point etc.) are not stored: they follow from
+the measured values and ``decode_record`` recomputes them. The
+per-sensor acquisition times and ages (``acquired``, ``age``) do not fit
+the record either and are left out; send JSON to keep them. The
+``cached``/``stale`` marks are not dropped: a payload carrying them does
+not fit, so it goes out as JSON rather than as a plain fresh reading. A
+batch is records concatenated back to back.
+
+Payloads with fields outside the schema raise ``ValueError``; callers fall
+back to JSON for those.
+"""
+
+import struct
+
+from payload import DERIVED_KEYS, add_derived
+
+MEDIA_TYPE = 'application/vnd.weather-station.v1+octet-stream'
+SCHEMA_VERSION = 1
+
+RECORD = struct.Struct('>BIBhHhHH')
+
+INDOOR = 0x01
+OUTDOOR = 0x02
+PRESSURE = 0x04
+
+INDOOR_KEYS = ('temperature_indoor', 'humidity_indoor', 'sensor_indoor')
+OUTDOOR_KEYS = ('temperature_outdoor', 'humidity_outdoor', 'sensor_outdoor')
+PRESSURE_KEYS = ('pressure', 'pressure_indoor')
+
+
+DERIVED = frozenset(key for keys in DERIVED_KEYS.values() for key in keys)
+# Not stored in the record: recomputed (derived) or dropped (acquisition
+# timing); the cached/stale marks are kept out so they force JSON
+NOT_STORED = DERIVED | frozenset(('acquired', 'age'))
+
+
+def _expected_keys(flags):
+    keys = {'timestamp'}
+    if flags & (INDOOR | OUTDOOR):
+        keys.update(('temperature', 'humidity'))
+    if flags & INDOOR:
+        keys.update(INDOOR_KEYS)
+    if flags & OUTDOOR:
+        keys.update(OUTDOOR_KEYS)
+    if flags & PRESSURE:
+        keys.update(PRESSURE_KEYS)
+    return keys
+
+
+def _tenths(value):
+    return int(round(value * 10))
+
+
+def encode_record(data):
+    """Pack one ``build_payload`` dict into a 16-byte v1 record."""
+    flags = 0
+    if 'temperature_indoor' in data:
+        flags |= INDOOR
+    if 'temperature_outdoor' in data:
+        flags |= OUTDOOR
+    if 'pressure' in data:
+        flags |= PRESSURE
+    keys = set(data) - NOT_STORED
+    if keys != _expected_keys(flags):
+        extra = sorted(keys ^ _expected_keys(flags))
+        raise ValueError(f"Payload does not fit schema v{SCHEMA_VERSION}: {extra}")
+    try:
+        return RECORD.pack(
+            SCHEMA_VERSION, data['timestamp'], flags,
+            _tenths(data['temperature_indoor']) if flags & INDOOR else 0,
+            _tenths(data['humidity_indoor']) if flags & INDOOR else 0,
+            _tenths(data['temperature_outdoor']) if flags & OUTDOOR else 0,
+            _tenths(data['humidity_outdoor']) if flags & OUTDOOR else 0,
+            _tenths(data['pressure']) if flags & PRESSURE else 0,
+        )
+    except struct.error as e:
+        raise ValueError(f"Payload value out of range for schema v{SCHEMA_VERSION}: {e}") from None
+
+
+def decode_record(record, derived=True):
+    """Unpack a v1 record into the same dict ``build_payload`` returns."""
+    version, timestamp, flags, t_in, h_in, t_out, h_out, pressure = RECORD.unpack(record)
+    if version != SCHEMA_VERSION:
+        raise ValueError(f"Unsupported schema version {version}")
+    data = {'timestamp': timestamp}
+    if flags & INDOOR:
+        data['temperature'] = t_in / 10
+        data['humidity'] = h_in / 10
+        data['temperature_indoor'] = t_in / 10
+        data['humidity_indoor'] = h_in / 10
+        data['sensor_indoor'] = 'ENV3'
+    if flags & OUTDOOR:
+        data['temperature_outdoor'] = t_out / 10
+        data['humidity_outdoor'] = h_out / 10
+        data['sensor_outdoor'] = 'DHT22'
+        if 'temperature' not in data:
+            data['temperature'] = t_out / 10
+            data['humidity'] = h_out / 10
+    if flags & PRESSURE:
+        data['pressure'] = pressure / 10
+        data['pressure_indoor'] = pressure / 10
+    return add_derived(data) if derived else data
+
+
+def encode_records(payloads):
+    """Pack a batch of payloads back to back."""
+    return b''.join(encode_record(p) for p in payloads)
+
+
+def decode_records(body):
+    """Unpack a batch produced by ``encode_records``."""
+    if len(body) % RECORD.size:
+        raise ValueError(f"Batch of {len(body)} bytes is not a whole number of records")
+    return [decode_record(body[i:i + RECORD.size]) for i in range(0, len(body), RECORD.size)]
+
+
+def accepts_binary(accept_post):
+    """True if an ``Accept-Post`` header value lists the v1 media type."""
+    return any(part.split(';')[0].strip() == MEDIA_TYPE for part in (accept_post or '').split(','))
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Change-triggered reporting for the weather station.
+
+``DeadbandPolicy`` sits between the sensors and the upload path. A payload
+is reported only if a watched field moved by at least its dead-band since
+the last *reported* payload, if a field appeared or disappeared, or if
+nothing was reported for ``heartbeat`` seconds. Comparing against the last
+reported value (not the last reading) keeps a slow drift from creeping by
+unreported.
+
+``ReadingLog`` keeps every reading at full resolution on local disk, one
+NDJSON file per day, so suppressed readings are never lost.
+"""
+
+import json
+import os
+import time
+
+# Dead-bands for the flat payload from payload.build_payload
+DEFAULT_DEADBANDS = {
+    'temperature_indoor': 0.1,
+    'humidity_indoor': 0.5,
+    'temperature_outdoor': 0.1,
+    'humidity_outdoor': 0.5,
+    'pressure': 0.2,
+}
+
+# Float noise allowance so a 0.1 step on 0.1-rounded values counts as 0.1
+_EPSILON = 1e-9
+
+
+def flatten(payload, prefix=''):
+    """Flatten nested dicts to dotted keys: ``{'indoor': {'temperature': 1}}`` -> ``indoor.temperature``."""
+    flat = {}
+    for key, value in payload.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+class DeadbandPolicy:
+    """Decide which readings are worth uploading."""
+
+    def __init__(self, deadbands=None, heartbeat=600.0, clock=time.monotonic):
+        self.deadbands = dict(DEFAULT_DEADBANDS if deadbands is None else deadbands)
+        self.heartbeat = heartbeat
+        self._clock = clock
+        self._last = None
+        self._last_time = None
+
+        self.seen = 0
+        self.reported = 0
+        self.heartbeats = 0
+
+    def _watched(self, payload):
+        flat = flatten(payload)
+        return {key: flat[key] for key in self.deadbands if flat.get(key) is not None}
+
+    def changed(self, payload):
+        """Names of the watched fields that moved beyond their dead-band."""
+        current = self._watched(payload)
+        if self._last is None:
+            return sorted(current)
+        changed = set(current) ^ set(self._last)
+        for key, value in current.items():
+            if key in self._last and abs(value - self._last[key]) + _EPSILON >= self.deadbands[key]:
+                changed.add(key)
+        return sorted(changed)
+
+    def should_report(self, payload):
+        """Return True if ``payload`` should be uploaded, and remember it if so."""
+        self.seen += 1
+        now = self._clock()
+        report = self._last_time is None or bool(self.changed(payload))
+        if not report and now - self._last_time >= self.heartbeat:
+            report = True
+            self.heartbeats += 1
+        if report:
+            self._last = self._watched(payload)
+            self._last_time = now
+            self.reported += 1
+        return report
+
+    def heartbeat_due(self, within=0.0):
+        """True if the heartbeat forces a report within ``within`` seconds (or nothing was reported yet)."""
+        return self._last_time is None or self._clock() - self._last_time >= self.heartbeat - within
+
+    def stats(self):
+        """Return reporting figures for logging."""
+        return {
+            'seen': self.seen,
+            'reported': self.reported,
+            'suppressed': self.seen - self.reported,
+            'heartbeats': self.heartbeats,
+            'reduction': self.seen / self.reported if self.reported else None,
+        }
+
+
+class ReadingLog:
+    """Append-only full-resolution reading log, one NDJSON file per day."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._day = None
+        self._file = None
+        self.written = 0
+
+    def path_for(self, timestamp):
+        return os.path.join(self.directory, time.strftime('readings-%Y-%m-%d.ndjson', time.localtime(timestamp)))
+
+    def append(self, reading):
+        """Write one reading (a dict with a ``timestamp``)."""
+        path = self.path_for(reading.get('timestamp', time.time()))
+        if path != self._day:
+            self.close()
+            self._file = open(path, 'a', encoding='utf-8')
+            self._day = path
+        self._file.write(json.dumps(reading, separators=(',', ':')) + '\n')
+        self._file.flush()
+        self.written += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._day = None
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Retry and circuit breaker for the upload path.
+
+``UploadRetry.send(request)`` calls ``request()`` (which returns a
+``requests`` response) until it succeeds or runs out of attempts:
+
+- network errors and 5xx are retried after a full-jitter exponential
+  backoff, ``uniform(0, min(max_delay, base_delay * 2**attempt))``
+- 429/503 with ``Retry-After`` wait at least that long; a Retry-After
+  beyond ``max_retry_after`` gives up and holds the breaker open instead
+- 400/413/415/422 are not retried (the payload, not the server, is at
+  fault) and return ``REJECTED``: falsy like a failure, but telling the
+  caller that sending the same payload again will never succeed
+- any other 4xx (401/403/404/408/409/425, ...) says more about the server,
+  a proxy or the configuration than about the payload, so it is a failure
+  like a 5xx: retried, and counted by the breaker
+
+``CircuitBreaker`` opens after ``failure_threshold`` consecutive failed
+sends, rejects calls without touching the network while open, and after a
+jittered ``reset_timeout`` lets a single half-open probe through. Jitter
+on both keeps a fleet of stations from retrying in lock-step after an
+outage.
+"""
+
+import email.utils
+import random
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class _Rejected:
+    """Falsy result for a payload the server refused for good (``PAYLOAD_ERRORS``)."""
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return 'REJECTED'
+
+
+REJECTED = _Rejected()
+
+# 4xx statuses about the payload itself; no retry will ever get it accepted
+PAYLOAD_ERRORS = frozenset({400, 413, 415, 422})
+
+
+def parse_retry_after(value, now=None):
+    """Seconds to wait from a ``Retry-After`` header (delta-seconds or HTTP-date)."""
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    now = time.time() if now is None else now
+    return max(0.0, when.timestamp() - now)
+
+
+def full_jitter(attempt, base_delay, max_delay, rng=random.random):
+    """Full-jitter exponential backoff delay for retry number ``attempt`` (0-based)."""
+    return rng() * min(max_delay, base_delay * 2 ** attempt)
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures -> half-open probe -> closed."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=60.0, jitter=0.5,
+                 clock=time.monotonic, rng=random.random):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.jitter = jitter
+        self._clock = clock
+        self._rng = rng
+        self._lock = threading.Lock()
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self._probing = False
+
+        self.opened = 0
+        self.rejected = 0
+        self.probes = 0
+
+    def _open(self, duration):
+        self.state = OPEN
+        self.open_until = self._clock() + duration
+        self._probing = False
+        self.opened += 1
+
+    def allow(self):
+        """True if a call may go out now; in half-open only one probe at a time."""
+        with self._lock:
+            if self.state == OPEN and self._clock() >= self.open_until:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    self.rejected += 1
+                    return False
+                self._probing = True
+                self.probes += 1
+                return True
+            if self.state == OPEN:
+                self.rejected += 1
+                return False
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self._open(self.reset_timeout * (1 + self.jitter * self._rng()))
+
+    def hold(self, seconds):
+        """Open for ``seconds``, e.g. when the server asks for a long Retry-After."""
+        with self._lock:
+            self._open(seconds)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'opened': self.opened,
+                'rejected': self.rejected,
+                'probes': self.probes,
+                'open_for': max(0.0, self.open_until - self._clock()) if self.state == OPEN else 0.0,
+            }
+
+
+class UploadRetry:
+    """Send a request with backoff, Retry-After and a circuit breaker."""
+
+    def __init__(self, breaker=None, attempts=3, base_delay=1.0, max_delay=60.0,
+                 max_retry_after=120.0, rng=random.random, sleep=time.sleep,
+                 clock=time.monotonic, log=print):
+        self.breaker = breaker if breaker is not None else CircuitBreaker(clock=clock, rng=rng)
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self._rng = rng
+        self._sleep = sleep
+        self._clock = clock
+        self.log = log
+
+        self.last_rtt = None
+        self.last_status = None
+        self.sends = 0
+        self.successes = 0
+        self.failures = 0
+        self.retries = 0
+        self.retry_after_waits = 0
+        self.short_circuits = 0
+        self.rejections = 0
+
+    def send(self, request):
+        """Call ``request()`` until a 2xx; return True on success.
+
+        Returns ``REJECTED`` for a ``PAYLOAD_ERRORS`` status, False for
+        other failures.
+        """
+        self.sends += 1
+        for attempt in range(self.attempts):
+            if not self.breaker.allow():
+                self.short_circuits += 1
+                self.failures += 1
+                return False
+
+            retry_after = None
+            started = self._clock()
+            try:
+                response = request()
+            except Exception as e:
+                self.last_rtt = self._clock() - started
+                self.last_status = None
+                self.log(f"✗ Network error: {e}")
+            else:
+                self.last_rtt = self._clock() - started
+                self.last_status = response.status_code
+                if 200 <= response.status_code < 300:
+                    self.breaker.record_success()
+                    self.successes += 1
+                    return True
+                self.log(f"✗ Server error: {response.status_code} - {response.text[:200]}")
+                if response.status_code in (429, 503):
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                elif response.status_code in PAYLOAD_ERRORS:
+                    # Server is up and said no; retrying the same payload won't help
+                    self.breaker.record_success()
+                    self.failures += 1
+                    self.rejections += 1
+                    return REJECTED
+
+            self.breaker.record_failure()
+            if retry_after is not None and retry_after > self.max_retry_after:
+                self.breaker.hold(retry_after)
+                break
+            if attempt + 1 < self.attempts:
+                delay = full_jitter(attempt, self.base_delay, self.max_delay, self._rng)
+                if retry_after is not None:
+                    delay = max(delay, retry_after)
+                    self.retry_after_waits += 1
+                self.retries += 1
+                self._sleep(delay)
+
+        self.failures += 1
+        return False
+
+    def stats(self):
+        """Return retry and breaker figures for logging."""
+        stats = {
+            'sends': self.sends,
+            'successes': self.successes,
+            'failures': self.failures,
+            'retries': self.retries,
+            'retry_after_waits': self.retry_after_waits,
+            'short_circuits': self.short_circuits,
+            'rejections': self.rejections,
+        }
+        stats.update({f"breaker_{key}": value for key, value in self.breaker.stats().items()})
+        return stats
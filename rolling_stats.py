@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Streaming rolling-window statistics for the sensor fields.
+
+``RollingWindow`` keeps count, mean and variance of the samples from the
+last ``span`` seconds with Welford's update, undoing the update for each
+sample that leaves the window, and min/max with monotonic deques. Every
+sample is added and expired once, so an update is O(1) amortized and
+nothing is ever re-scanned.
+
+``RollingStats`` runs one window per span (1 min, 10 min, 1 h, 24 h by
+default) for every numeric field it is fed, queryable at any time with
+``stats()``; ``payload_fields()`` flattens chosen windows into upload
+payload keys such as ``temperature_indoor_1h_mean``.
+"""
+
+import math
+import time
+from collections import deque
+
+from reporting import flatten
+
+DEFAULT_WINDOWS = {
+    '1m': 60,
+    '10m': 600,
+    '1h': 3600,
+    '24h': 86400,
+}
+
+
+class RollingWindow:
+    """Count, mean, variance, min and max over the last ``span`` seconds."""
+
+    def __init__(self, span):
+        self.span = span
+        self._samples = deque()
+        self._min = deque()  # (t, x), x increasing: front is the minimum
+        self._max = deque()  # (t, x), x decreasing: front is the maximum
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def __len__(self):
+        return len(self._samples)
+
+    def add(self, t, x):
+        """Add sample ``x`` taken at time ``t`` (monotonic seconds)."""
+        self._samples.append((t, x))
+        n = len(self._samples)
+        delta = x - self._mean
+        self._mean += delta / n
+        self._m2 += delta * (x - self._mean)
+
+        while self._min and self._min[-1][1] >= x:
+            self._min.pop()
+        self._min.append((t, x))
+        while self._max and self._max[-1][1] <= x:
+            self._max.pop()
+        self._max.append((t, x))
+        self.expire(t)
+
+    def expire(self, now):
+        """Drop samples older than ``now - span``."""
+        cutoff = now - self.span
+        samples = self._samples
+        while samples and samples[0][0] <= cutoff:
+            _, x = samples.popleft()
+            n = len(samples)
+            if n == 0:
+                # Start over exactly; no rounding residue carries into the next run
+                self._mean = self._m2 = 0.0
+                break
+            delta = x - self._mean
+            self._mean -= delta / n
+            self._m2 -= delta * (x - self._mean)
+        while self._min and self._min[0][0] <= cutoff:
+            self._min.popleft()
+        while self._max and self._max[0][0] <= cutoff:
+            self._max.popleft()
+
+    @property
+    def mean(self):
+        return self._mean if self._samples else None
+
+    @property
+    def variance(self):
+        """Sample variance (n - 1), None below two samples."""
+        n = len(self._samples)
+        return max(self._m2, 0.0) / (n - 1) if n > 1 else None
+
+    @property
+    def std(self):
+        variance = self.variance
+        return math.sqrt(variance) if variance is not None else None
+
+    @property
+    def min(self):
+        return self._min[0][1] if self._min else None
+
+    @property
+    def max(self):
+        return self._max[0][1] if self._max else None
+
+    def summary(self):
+        return {
+            'count': len(self._samples),
+            'mean': self.mean,
+            'std': self.std,
+            'min': self.min,
+            'max': self.max,
+        }
+
+
+class RollingStats:
+    """One ``RollingWindow`` per field and window span."""
+
+    def __init__(self, windows=None, fields=None, clock=time.monotonic):
+        self.windows = dict(DEFAULT_WINDOWS if windows is None else windows)
+        self.fields = None if fields is None else set(fields)
+        self._clock = clock
+        self._windows = {}
+
+    def update(self, values, now=None):
+        """Add every numeric field of ``values`` (nested dicts are flattened)."""
+        now = self._clock() if now is None else now
+        for field, value in flatten(values).items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value != value:
+                continue
+            if field == 'timestamp' or (self.fields is not None and field not in self.fields):
+                continue
+            windows = self._windows.get(field)
+            if windows is None:
+                windows = self._windows[field] = {name: RollingWindow(span) for name, span in self.windows.items()}
+            for window in windows.values():
+                window.add(now, value)
+
+    def _expire(self):
+        now = self._clock()
+        for windows in self._windows.values():
+            for window in windows.values():
+                window.expire(now)
+
+    def stats(self, field=None):
+        """``{field: {window: summary}}``, or ``{window: summary}`` for one field."""
+        self._expire()
+        if field is not None:
+            return {name: w.summary() for name, w in self._windows.get(field, {}).items()}
+        return {f: {name: w.summary() for name, w in windows.items()} for f, windows in self._windows.items()}
+
+    def payload_fields(self, windows=('1h',), keys=('mean', 'min', 'max'), digits=2):
+        """Flat ``<field>_<window>_<key>`` entries for the upload payload."""
+        self._expire()
+        out = {}
+        for field, by_window in self._windows.items():
+            for name in windows:
+                window = by_window.get(name)
+                if window is None or not len(window):
+                    continue
+                summary = window.summary()
+                for key in keys:
+                    if summary[key] is not None:
+                        out[f"{field}_{name}_{key}"] = round(summary[key], digits)
+        return out
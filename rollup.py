@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Multi-resolution rollups of the sensor fields with tiered retention.
+
+Every reading is folded into an open bucket per field in each tier
+(1 minute, 1 hour, 1 day by default): count, sum, min, max and last
+value. Those aggregates merge exactly, so folding a reading into every
+tier gives the same buckets as cascading minute -> hour -> day, while
+keeping the open bucket of every tier current. When a reading lands past
+the open bucket, the bucket is written to SQLite and a new one is opened.
+Whenever a bucket of the finest tier closes, the still-open coarser buckets
+of that field are written as well, so a crash or a restart without
+``close()`` loses at most the open finest bucket and every tier resumes
+from the same point. Each tier drops rows older than its own retention.
+
+``query()`` picks the coarsest tier whose bucket width still meets the
+requested resolution, or by default the finest tier that covers the range
+in at most ``max_points`` buckets, so a 30-day chart reads about 720
+hourly rows instead of 43,200 minute rows. A tier whose retention no
+longer reaches back to the start of the range is skipped for the next
+coarser one, so a long query never silently returns a pruned tail.
+
+Buckets are aligned to Unix time, so daily buckets run midnight to
+midnight UTC.
+"""
+
+import sqlite3
+import threading
+
+from reporting import flatten
+
+# (name, bucket width in seconds, retention in seconds)
+DEFAULT_TIERS = (
+    ('1m', 60, 14 * 86400),
+    ('1h', 3600, 400 * 86400),
+    ('1d', 86400, 10 * 365 * 86400),
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollup (
+    tier TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    field TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    sum REAL NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    last REAL NOT NULL,
+    PRIMARY KEY (tier, start, field)
+) WITHOUT ROWID
+"""
+
+
+def _row(start, bucket):
+    return {
+        'start': start,
+        'count': bucket[0],
+        'mean': bucket[1] / bucket[0],
+        'min': bucket[2],
+        'max': bucket[3],
+        'last': bucket[4],
+    }
+
+
+class Rollup:
+    """Incremental per-field aggregates at several resolutions."""
+
+    def __init__(self, path, tiers=DEFAULT_TIERS, fields=None):
+        self.path = path
+        self.tiers = sorted(tiers, key=lambda tier: tier[1])
+        self.fields = None if fields is None else set(fields)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(SCHEMA)
+        # Newest reading folded; retention runs back from here
+        self._latest = self._db.execute("SELECT MAX(start) FROM rollup").fetchone()[0]
+        # (tier, field) -> [start, [count, sum, min, max, last]]
+        self._open = {}
+        self._pruned = {}
+        self.folded = 0
+        self.written = 0
+
+    def add(self, timestamp, values):
+        """Fold one reading (epoch seconds, dict of fields) into every tier."""
+        timestamp = int(timestamp)
+        with self._lock:
+            if self._latest is None or timestamp > self._latest:
+                self._latest = timestamp
+            for field, value in flatten(values).items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)) or value != value:
+                    continue
+                if field == 'timestamp' or (self.fields is not None and field not in self.fields):
+                    continue
+                finest, *coarser = self.tiers
+                if self._fold(*finest, field, timestamp, float(value)):
+                    self._checkpoint(coarser, field, timestamp)
+                for name, width, retention in coarser:
+                    self._fold(name, width, retention, field, timestamp, float(value))
+            self.folded += 1
+
+    def add_payload(self, payload):
+        self.add(payload['timestamp'], payload)
+
+    def _fold(self, tier, width, retention, field, timestamp, value):
+        """Fold ``value`` into the open bucket; True if the previous one was written."""
+        start = timestamp - timestamp % width
+        rolled = False
+        key = (tier, field)
+        current = self._open.get(key)
+        if current is None or current[0] != start:
+            if current is not None:
+                if start < current[0]:
+                    # Clock stepped back: fold into the stored bucket directly
+                    self._merge_stored(tier, field, start, value)
+                    return False
+                self._write(tier, field, *current)
+                self._prune(tier, start - retention)
+                rolled = True
+            current = self._open[key] = [start, self._load(tier, field, start)]
+        bucket = current[1]
+        if bucket is None:
+            current[1] = [1, value, value, value, value]
+            return rolled
+        bucket[0] += 1
+        bucket[1] += value
+        bucket[2] = min(bucket[2], value)
+        bucket[3] = max(bucket[3], value)
+        bucket[4] = value
+        return rolled
+
+    def _checkpoint(self, tiers, field, timestamp):
+        """Write the open buckets of ``tiers`` that ``timestamp`` still falls in."""
+        for name, width, _ in tiers:
+            current = self._open.get((name, field))
+            # A bucket that is about to close is written by _fold anyway
+            if current is not None and current[0] == timestamp - timestamp % width:
+                self._write(name, field, *current)
+
+    def _load(self, tier, field, start):
+        """Resume a bucket written before a restart."""
+        row = self._db.execute(
+            "SELECT count, sum, min, max, last FROM rollup WHERE tier = ? AND start = ? AND field = ?",
+            (tier, start, field)).fetchone()
+        return list(row) if row else None
+
+    def _merge_stored(self, tier, field, start, value):
+        bucket = self._load(tier, field, start)
+        if bucket is None:
+            bucket = [1, value, value, value, value]
+        else:
+            bucket = [bucket[0] + 1, bucket[1] + value, min(bucket[2], value), max(bucket[3], value), value]
+        self._write(tier, field, start, bucket)
+
+    def _write(self, tier, field, start, bucket):
+        if bucket is None:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO rollup (tier, start, field, count, sum, min, max, last) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (tier, start, field, *bucket))
+        self.written += 1
+
+    def _prune(self, tier, cutoff):
+        # Once per new bucket start, not once per field
+        if self._pruned.get(tier, cutoff - 1) >= cutoff:
+            return
+        self._db.execute("DELETE FROM rollup WHERE tier = ? AND start < ?", (tier, cutoff))
+        self._pruned[tier] = cutoff
+
+    def _covers(self, tier, start):
+        """Whether ``tier`` still holds the bucket containing ``start``."""
+        _, width, retention = tier
+        if self._latest is None:
+            return True
+        return start - start % width >= self._latest - self._latest % width - retention
+
+    def tier_for(self, resolution, start=None):
+        """Coarsest tier with buckets no wider than ``resolution`` seconds (else the finest).
+
+        With ``start``, tiers whose retention no longer reaches back to it
+        are skipped for the next coarser one (the coarsest if none does).
+        """
+        fitting = [tier for tier in self.tiers if tier[1] <= resolution]
+        tier = fitting[-1] if fitting else self.tiers[0]
+        if start is None:
+            return tier
+        covering = [t for t in self.tiers[self.tiers.index(tier):] if self._covers(t, start)]
+        return covering[0] if covering else self.tiers[-1]
+
+    def query(self, field, start, end, resolution=None, max_points=1000):
+        """Buckets of ``field`` overlapping ``start <= t < end``.
+
+        Without ``resolution`` the finest tier that covers the range in at
+        most ``max_points`` buckets is used. Tiers whose retention does not
+        reach back to ``start`` are never used. Returns ``(tier_name, rows)``;
+        rows are dicts with ``start``, ``count``, ``mean``, ``min``, ``max``
+        and ``last``, oldest first, including the still-open bucket.
+        """
+        with self._lock:
+            if resolution is None:
+                fitting = [tier for tier in self.tiers
+                           if (end - start) / tier[1] <= max_points and self._covers(tier, start)]
+                name, width, _ = fitting[0] if fitting else self.tiers[-1]
+            else:
+                name, width, _ = self.tier_for(resolution, start)
+            rows = {
+                row[0]: list(row[1:]) for row in self._db.execute(
+                    "SELECT start, count, sum, min, max, last FROM rollup "
+                    "WHERE tier = ? AND start >= ? AND start < ? AND field = ? ORDER BY start",
+                    (name, start - start % width, end, field))
+            }
+            current = self._open.get((name, field))
+            if current is not None and current[1] is not None and current[0] < end:
+                rows[current[0]] = list(current[1])
+        return name, [_row(s, rows[s]) for s in sorted(rows) if s + width > start]
+
+    def flush(self):
+        """Write the open buckets, e.g. before a query from another process."""
+        with self._lock:
+            for (tier, field), (start, bucket) in self._open.items():
+                self._write(tier, field, start, bucket)
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._db.execute("SELECT tier, COUNT(*) FROM rollup GROUP BY tier"))
+        return {'folded': self.folded, 'written': self.written,
+                'rows': {name: counts.get(name, 0) for name, _, _ in self.tiers}}
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._db.close()
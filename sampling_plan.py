@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Declarative per-sensor sampling plan.
+
+Each sensor gets its own sample ``period``, an averaging ``window`` and an
+``output`` cadence (all in seconds):
+
+    plan = SamplingPlan()
+    plan.add('sht30', read_sht30, period=5, window=60, output=60, bus='i2c-1')
+    plan.add('qmp6988', read_qmp6988, period=10, window=60, output=60, bus='i2c-1')
+    plan.add('dht22', read_dht22, period=60, min_interval=2.5)
+    engine = StationEngine(plan.sensors(), upload, rates=plan.rates(),
+                           max_age=plan.max_ages())
+
+The engine samples every sensor on its own schedule. A sample is kept for
+``window`` seconds; on every wall-clock ``output`` boundary (:00 of every
+minute for 60 s) the sensor publishes the mean of its window (element-wise
+for ``(temperature, humidity)`` tuples, None values left out), and that
+published value is what each upload cycle sees. Fast sensors thus give smoother, higher-fidelity values without
+raising the upload rate.
+
+Sensors on the same ``bus`` share one lock, so their I2C transactions
+never overlap, and their schedules are staggered by ``stagger`` seconds so
+they rarely even wait for each other. ``min_interval`` guards sensors
+like the DHT22 that must rest between reads: a sample due sooner is
+skipped and counted. ``filter``, if given, is applied to every new sample
+before it enters the window, e.g. a spike filter that must see single
+samples rather than their mean.
+
+A published mean is stamped with the acquisition time of its newest
+sample (``acquisition.Reading``), so the engine can tell its age. A reader
+that answers from its own cache returns the original ``Reading``; that
+sample is not counted into the window a second time.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+
+from acquisition import acquire, stamp
+
+
+def average(values):
+    """Mean of readings that are numbers or equal-length tuples; None values are left out."""
+    values = [v for v in values if v is not None]
+    if not values:
+        return None
+    if isinstance(values[0], tuple):
+        columns = zip(*values)
+        return tuple(average(list(column)) for column in columns)
+    return sum(values) / len(values)
+
+
+class PlannedSensor:
+    """Runtime state of one sensor in a plan: samples, window and published output."""
+
+    def __init__(self, name, read, period, window, output, bus, min_interval, offset, lock, clock,
+                 wall_clock, filter=None):
+        self.name = name
+        self.read = read
+        self.period = period
+        self.window = window
+        self.output = output
+        self.bus = bus
+        self.min_interval = min_interval
+        self.offset = offset
+        self.filter = filter
+        self._lock = lock
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self._samples = deque()
+        self._last_read = None
+        self._output_slot = None
+        self.published = None
+        self.published_reading = None
+
+        self.samples = 0
+        self.repeats = 0
+        self.too_soon = 0
+        self.outputs = 0
+        self.max_bus_wait = 0.0
+
+    def _read(self):
+        if self._lock is None:
+            return acquire(self.read)
+        waited = self._clock()
+        with self._lock:
+            self.max_bus_wait = max(self.max_bus_wait, self._clock() - waited)
+            return acquire(self.read)
+
+    def sample(self):
+        """Take one sample (called by the engine on this sensor's schedule); returns the published value."""
+        now = self._clock()
+        if self._last_read is not None and now - self._last_read < self.min_interval:
+            self.too_soon += 1
+            return self.published
+        self._last_read = now
+        reading = self._read()
+        self.samples += 1
+
+        if self._samples and self._samples[-1][1].monotonic_ns == reading.monotonic_ns:
+            # The reader answered from its cache: same acquisition as last time
+            self.repeats += 1
+        else:
+            if self.filter is not None and reading.value is not None:
+                reading = reading._replace(value=self.filter(reading.value))
+            self._samples.append((now, reading))
+        # Half a period of slack: with timer jitter the sample one window back
+        # can land a hair inside the window and would be averaged in once more
+        cutoff = now - self.window + self.period / 2
+        while self._samples and self._samples[0][0] <= cutoff:
+            self._samples.popleft()
+        # Publish on the first sample of each output slot; the slack lets a
+        # sample that fires a hair before its boundary count for that slot
+        slot = math.floor((self._wall_clock() - self.offset + min(self.period / 2, 0.5)) / self.output)
+        if slot != self._output_slot:
+            self._output_slot = slot
+            self.published = average([r.value for _, r in self._samples])
+            acquired = [r for _, r in self._samples if r.value is not None]
+            newest = acquired[-1] if acquired else reading
+            self.published_reading = newest._replace(value=self.published)
+            self.outputs += 1
+        return self.published
+
+    def acquire(self):
+        """``sample()``, returned as the published ``Reading``."""
+        self.sample()
+        return self.published_reading if self.published_reading is not None else stamp(None)
+
+    def stats(self):
+        return {
+            'period': self.period,
+            'window': self.window,
+            'output': self.output,
+            'samples': self.samples,
+            'repeats': self.repeats,
+            'in_window': len(self._samples),
+            'outputs': self.outputs,
+            'too_soon': self.too_soon,
+            'max_bus_wait': self.max_bus_wait,
+        }
+
+
+class SamplingPlan:
+    """Per-sensor periods, averaging windows, output cadences and bus locks."""
+
+    def __init__(self, stagger=0.25, clock=time.monotonic, wall_clock=time.time):
+        self.stagger = stagger
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self._locks = {}
+        self._bus_members = {}
+        self.planned = {}
+
+    def add(self, name, read, period, window=None, output=None, bus=None, min_interval=0.0, filter=None):
+        """Declare a sensor; ``window`` and ``output`` default to ``period`` (no averaging)."""
+        if name in self.planned:
+            raise ValueError(f"Sensor {name!r} is already in the plan")
+        output = period if output is None else output
+        window = output if window is None else window
+        if period <= 0 or output < period or window < period:
+            raise ValueError(f"{name}: need 0 < period <= output and period <= window "
+                             f"(period={period}, window={window}, output={output})")
+        if period < min_interval:
+            raise ValueError(f"{name}: period {period}s is shorter than its minimum interval {min_interval}s")
+        lock = offset = None
+        if bus is not None:
+            lock = self._locks.setdefault(bus, threading.Lock())
+            members = self._bus_members.setdefault(bus, [])
+            # Stagger sensors on one bus so their transactions do not coincide
+            offset = len(members) * self.stagger
+            members.append(name)
+        sensor = PlannedSensor(name, read, period, window, output, bus, min_interval,
+                               offset or 0.0, lock, self._clock, self._wall_clock, filter)
+        self.planned[name] = sensor
+        return sensor
+
+    def sensors(self):
+        """``{name: acquire}`` callables for ``StationEngine``."""
+        return {name: sensor.acquire for name, sensor in self.planned.items()}
+
+    def rates(self):
+        """``{name: (period, offset)}`` for ``StationEngine(rates=...)``."""
+        return {name: (sensor.period, sensor.offset) for name, sensor in self.planned.items()}
+
+    def max_ages(self):
+        """``{name: seconds}`` for ``StationEngine(max_age=...)``: one output cadence plus one missed sample."""
+        return {name: sensor.output + sensor.period for name, sensor in self.planned.items()}
+
+    def stats(self):
+        return {name: sensor.stats() for name, sensor in self.planned.items()}
+
+    def describe(self):
+        """One line per sensor for the startup log."""
+        lines = []
+        for s in self.planned.values():
+            line = f"{s.name}: every {s.period:g}s, mean of {s.window:g}s, output every {s.output:g}s"
+            if s.bus:
+                line += f", bus {s.bus} (+{s.offset:g}s)"
+            if s.min_interval:
+                line += f", >= {s.min_interval:g}s apart"
+            lines.append(line)
+        return lines
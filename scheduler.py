@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Wall-clock aligned, drift-free tick schedules.
+
+A ``Schedule`` fires every ``period`` seconds on wall-clock boundaries
+(``period=60`` fires at :00 of every minute, ``offset`` shifts that). The
+boundaries are turned into absolute ``time.monotonic()`` deadlines once,
+so the period never stretches by the work done in a tick and sleeping
+never drifts. If the wall clock is stepped (NTP) by more than ``resync``
+seconds the deadlines are re-anchored. Slots only ever move forward: after
+a backward step the schedule waits for the first slot past the last one
+it handed out rather than repeating a wall-clock time.
+
+A tick that starts late is reported, never silently absorbed:
+
+- ``late``: the previous tick's work ran past this deadline, but by no
+  more than ``grace`` seconds, so the tick fires right away
+- ``skipped``: deadlines passed by more than ``grace`` are dropped and
+  counted, and the schedule resumes at the next boundary instead of
+  firing a burst of catch-up ticks
+
+Each ``Tick`` carries the wall-clock time of its slot, e.g. 12:34:00
+exactly, to use as the reading's timestamp.
+"""
+
+import asyncio
+import math
+import time
+from collections import namedtuple
+
+# index: slot number since the epoch (gaps mean skipped slots); deadline:
+# monotonic deadline; wall_time: wall-clock time of the slot; lateness:
+# seconds between deadline and firing; skipped: slots dropped just before
+Tick = namedtuple('Tick', 'index deadline wall_time lateness skipped')
+
+
+class Schedule:
+    """Absolute, aligned deadlines every ``period`` seconds."""
+
+    def __init__(self, period, offset=0.0, align=True, grace=None, resync=1.0,
+                 clock=time.monotonic, wall_clock=time.time):
+        if period <= 0:
+            raise ValueError(f"Schedule period must be positive, got {period}")
+        self.period = period
+        self.offset = offset % period
+        self.align = align
+        self.grace = period / 10 if grace is None else grace
+        self.resync = resync
+        self._clock = clock
+        self._wall_clock = wall_clock
+
+        self._anchor = None  # wall - monotonic at the last anchoring
+        self._index = None
+        self._issued = None  # index of the last tick handed out
+        self._skipped_run = 0
+
+        self.ticks = 0
+        self.late = 0
+        self.skipped = 0
+        self.resyncs = 0
+        self.last_lateness = None
+        self.max_lateness = 0.0
+
+    def _wall_offset(self):
+        return self._wall_clock() - self._clock()
+
+    def _anchor_now(self):
+        now, wall = self._clock(), self._wall_clock()
+        self._anchor = wall - now
+        if self.align or self._issued is not None:
+            self._index = math.ceil((wall - self.offset) / self.period - 1e-9)
+        else:
+            # Unaligned: the first tick is now, later ones every period after it
+            self.offset = wall % self.period
+            self._index = round((wall - self.offset) / self.period)
+        if self._issued is not None:
+            # Never reissue a slot after the clock stepped back
+            self._index = max(self._index, self._issued + 1)
+
+    def _deadline(self, index):
+        """Monotonic deadline of slot ``index``."""
+        return index * self.period + self.offset - self._anchor
+
+    def next_deadline(self):
+        """Monotonic time the next tick is due."""
+        if self._anchor is None:
+            self._anchor_now()
+        elif abs(self._wall_offset() - self._anchor) > self.resync:
+            self.resyncs += 1
+            self._anchor_now()
+        return self._deadline(self._index)
+
+    def due(self):
+        """Seconds until the next tick (<= 0 when due)."""
+        return self.next_deadline() - self._clock()
+
+    def _poll(self, overran):
+        """Fire the tick if it is due: ``(tick, 0)``, else ``(None, seconds to wait)``.
+
+        ``overran`` is True when the caller arrived after the deadline,
+        i.e. the previous tick's work ran into this slot; lateness after a
+        sleep is only timer jitter and is not counted as late.
+        """
+        while True:
+            delay = self.due()
+            if delay > 0:
+                return None, delay
+            deadline = self._deadline(self._index)
+            lateness = self._clock() - deadline
+            if lateness > self.grace:
+                # Drop the slots we are too late for; a later one still within
+                # grace fires right away, else we wait for the next one
+                missed = math.ceil((lateness - self.grace) / self.period)
+                self._index += missed
+                self.skipped += missed
+                self._skipped_run += missed
+                continue
+            tick = Tick(self._index, deadline, self._index * self.period + self.offset,
+                        lateness, self._skipped_run)
+            if overran and self.ticks:
+                self.late += 1
+            self._issued = self._index
+            self._index += 1
+            self._skipped_run = 0
+            self.ticks += 1
+            self.last_lateness = lateness
+            self.max_lateness = max(self.max_lateness, lateness)
+            return tick, 0
+
+    async def wait(self):
+        """Sleep until the next tick and return it."""
+        tick, delay = self._poll(overran=True)
+        while tick is None:
+            await asyncio.sleep(delay)
+            tick, delay = self._poll(overran=False)
+        return tick
+
+    def wait_blocking(self, sleep=time.sleep):
+        """``wait()`` for plain loops: blocks the calling thread."""
+        tick, delay = self._poll(overran=True)
+        while tick is None:
+            sleep(delay)
+            tick, delay = self._poll(overran=False)
+        return tick
+
+    def stats(self):
+        return {
+            'period': self.period,
+            'ticks': self.ticks,
+            'late': self.late,
+            'skipped': self.skipped,
+            'resyncs': self.resyncs,
+            'last_lateness': self.last_lateness,
+            'max_lateness': self.max_lateness,
+        }
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+SHT30 temperature/humidity driver (M5Stack ENV III, I2C address 0x44).
+
+Supports the single-shot measurement used so far and the chip's periodic
+acquisition mode. In periodic mode the SHT30 measures on its own at
+0.5/1/2/4/10 measurements per second; a read is then just the Fetch Data
+command and one 6-byte transfer, with no conversion wait.
+"""
+
+import time
+
+from crc import crc8
+
+SHT30_ADDR = 0x44
+
+# Single shot with clock stretching, by repeatability
+SINGLE_SHOT = {'high': 0x2C06, 'medium': 0x2C0D, 'low': 0x2C10}
+SINGLE_SHOT_DELAY = 0.02  # seconds; max conversion time at high repeatability is 15 ms
+
+# Periodic acquisition start commands: {mps: {repeatability: command}}
+PERIODIC = {
+    0.5: {'high': 0x2032, 'medium': 0x2024, 'low': 0x202F},
+    1: {'high': 0x2130, 'medium': 0x2126, 'low': 0x212D},
+    2: {'high': 0x2236, 'medium': 0x2220, 'low': 0x222B},
+    4: {'high': 0x2334, 'medium': 0x2322, 'low': 0x2329},
+    10: {'high': 0x2737, 'medium': 0x2721, 'low': 0x272A},
+}
+FETCH_DATA = 0xE000
+BREAK = 0x3093
+SOFT_RESET = 0x30A2
+
+
+def decode(data):
+    """Convert a 6-byte SHT30 frame into ``(temperature, humidity)``.
+
+    Raises ``ValueError`` if either CRC does not match.
+    """
+    if crc8(data[0:2]) != data[2]:
+        raise ValueError("CRC error in temperature data")
+    if crc8(data[3:5]) != data[5]:
+        raise ValueError("CRC error in humidity data")
+
+    temp_raw = (data[0] << 8) | data[1]
+    hum_raw = (data[3] << 8) | data[4]
+    temperature = -45 + (175 * temp_raw / 65535.0)
+    humidity = 100 * hum_raw / 65535.0
+    return temperature, humidity
+
+
+class SHT30:
+    """SHT30 on an smbus2 bus, in single-shot or periodic acquisition mode."""
+
+    def __init__(self, bus, address=SHT30_ADDR, repeatability='high',
+                 i2c_msg=None, clock=time.monotonic, sleep=time.sleep):
+        if i2c_msg is None:
+            from smbus2 import i2c_msg
+        self.bus = bus
+        self.address = address
+        self.repeatability = repeatability
+        self._msg = i2c_msg
+        self._clock = clock
+        self._sleep = sleep
+
+        self.mps = None
+        self._started_at = None
+        self._last = None
+        self._last_at = None
+
+    @property
+    def periodic(self):
+        return self.mps is not None
+
+    def _command(self, command):
+        self.bus.i2c_rdwr(self._msg.write(self.address, [command >> 8, command & 0xFF]))
+
+    def _read_frame(self):
+        msg = self._msg.read(self.address, 6)
+        self.bus.i2c_rdwr(msg)
+        return list(msg)
+
+    def read_single_shot(self):
+        """Trigger one measurement, wait for it and return ``(temperature, humidity)``."""
+        self._command(SINGLE_SHOT[self.repeatability])
+        self._sleep(SINGLE_SHOT_DELAY)
+        return decode(self._read_frame())
+
+    def start_periodic(self, mps=1):
+        """Start periodic acquisition at ``mps`` measurements per second."""
+        if mps not in PERIODIC:
+            raise ValueError(f"Unsupported rate {mps} mps, expected one of {sorted(PERIODIC)}")
+        if self.periodic:
+            self.stop_periodic()
+        self._command(PERIODIC[mps][self.repeatability])
+        self.mps = mps
+        self._started_at = self._clock()
+        self._last = None
+
+    def stop_periodic(self):
+        """Return the sensor to single-shot mode (Break command)."""
+        if self.periodic:
+            self.mps = None
+            try:
+                self._command(BREAK)
+            finally:
+                self._sleep(0.001)
+
+    def fetch(self):
+        """Fetch the latest periodic measurement.
+
+        The SHT30 NACKs the read (``OSError``) when no new measurement has
+        completed since the last fetch.
+        """
+        self._command(FETCH_DATA)
+        reading = decode(self._read_frame())
+        self._last = reading
+        self._last_at = self._clock()
+        return reading
+
+    def read(self):
+        """Return ``(temperature, humidity)`` using the configured mode.
+
+        In periodic mode a NACK shortly after the last sample (or the start
+        command) means the next sample is not ready yet, so the previous one
+        is returned; a NACK after two measurement periods is an error.
+        """
+        if not self.periodic:
+            return self.read_single_shot()
+        try:
+            return self.fetch()
+        except OSError:
+            period = 1.0 / self.mps
+            if self._last is not None and self._clock() - self._last_at < period * 2:
+                return self._last
+            if self._last is None and self._clock() - self._started_at < period * 2:
+                return None, None
+            raise
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Output sinks and fan-out for station readings.
+
+A sink delivers one payload with ``send(payload) -> bool``. ``FanOut``
+gives every sink its own ``UploadWorker`` (queue + thread), so a slow or
+dead sink only backs up its own queue: the other sinks and the sampling
+loop carry on. ``FanOut.stats()`` reports depth, lag and throughput per
+sink.
+
+Sinks here:
+
+- ``CallableSink``: wraps an existing delivery function, e.g. the
+  weather-tracker HTTP upload through the outbox
+- ``NDJSONFileSink``: appends each payload as a JSON line to a local file
+- ``StatsDSink``: sends numeric fields as StatsD gauges over UDP
+"""
+
+import json
+import socket
+
+from upload_worker import UploadWorker
+
+
+class CallableSink:
+    """Sink backed by a plain ``fn(payload) -> bool``."""
+
+    def __init__(self, name, fn):
+        self.name = name
+        self._fn = fn
+
+    def send(self, payload):
+        return self._fn(payload)
+
+    def close(self):
+        pass
+
+
+class NDJSONFileSink:
+    """Append payloads to a newline-delimited JSON file."""
+
+    def __init__(self, path, name='file'):
+        self.name = name
+        self.path = path
+        self._file = None
+
+    def send(self, payload):
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(payload, separators=(',', ':')) + '\n')
+        self._file.flush()
+        return True
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class StatsDSink:
+    """Send numeric payload fields as StatsD gauges (``prefix.field:value|g``).
+
+    The gauges of one payload are packed into newline-separated datagrams
+    of up to ``max_packet`` bytes, the multi-metric format StatsD and
+    Telegraf accept.
+    UDP is fire-and-forget: only local socket errors count as failures.
+    """
+
+    def __init__(self, host='127.0.0.1', port=8125, prefix='weather', name='statsd', max_packet=1432):
+        self.name = name
+        self.address = (host, port)
+        self.prefix = prefix
+        self.max_packet = max_packet
+        self._sock = None
+
+    def format(self, payload):
+        lines = []
+        for key, value in sorted(payload.items()):
+            if key == 'timestamp' or isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            lines.append(f"{self.prefix}.{key}:{value}|g")
+        return lines
+
+    def packets(self, payload):
+        """Split the gauges of one payload into datagrams of at most ``max_packet`` bytes."""
+        packet = b''
+        for line in self.format(payload):
+            line = line.encode('ascii')
+            if packet and len(packet) + 1 + len(line) > self.max_packet:
+                yield packet
+                packet = b''
+            packet = packet + b'\n' + line if packet else line
+        if packet:
+            yield packet
+
+    def send(self, payload):
+        if self._sock is None:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            for packet in self.packets(payload):
+                self._sock.sendto(packet, self.address)
+        except OSError:
+            return False
+        return True
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+class FanOut:
+    """Deliver every published payload to all sinks through per-sink workers."""
+
+    def __init__(self, log=print):
+        self.log = log
+        self.sinks = {}
+        self.workers = {}
+
+    def add(self, sink, **worker_kwargs):
+        """Register ``sink``; ``worker_kwargs`` configure its ``UploadWorker``. Returns the worker."""
+        if sink.name in self.sinks:
+            raise ValueError(f"Duplicate sink name {sink.name!r}")
+        worker_kwargs.setdefault('log', lambda msg, name=sink.name: self.log(f"[{name}] {msg}"))
+        worker_kwargs.setdefault('name', f"sink-{sink.name}")
+        worker = UploadWorker(sink.send, **worker_kwargs)
+        self.sinks[sink.name] = sink
+        self.workers[sink.name] = worker
+        return worker
+
+    def start(self):
+        for worker in self.workers.values():
+            worker.start()
+        return self
+
+    def publish(self, payload):
+        """Queue ``payload`` on every sink; returns immediately."""
+        for worker in self.workers.values():
+            worker.submit(payload)
+
+    def stats(self):
+        """Per-sink worker figures: ``{name: stats}``."""
+        return {name: worker.stats() for name, worker in self.workers.items()}
+
+    def stop(self, timeout=5.0):
+        for name, worker in self.workers.items():
+            worker.stop(timeout)
+            try:
+                self.sinks[name].close()
+            except Exception as e:
+                self.log(f"[{name}] close failed: {e}")
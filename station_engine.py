@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Asyncio sampling engine for the weather station.
+
+Every sensor is read on its own task through a thread-pool executor, so a
+slow DHT22 read or a hung I2C transaction cannot delay the other sensors.
+Uploads run on a separate task and never block sampling. Cycles are started
+by a ``scheduler.Schedule``: absolute monotonic deadlines aligned to
+wall-clock boundaries (:00 of every minute for a 60 s interval), so the
+sample period stays at the configured interval instead of drifting by
+read + upload time. Late and skipped cycles are logged and counted.
+
+Sensors listed in ``rates`` are sampled on their own schedules instead of
+once per cycle; each cycle then reports their latest reading. Cycles then
+start ``settle`` seconds after the latest sensor offset, so the samples
+due in the same slot have been started, and wait for reads still running,
+so a cycle reports this slot's samples rather than the previous slot's.
+
+Every reading carries its acquisition time (``acquisition.Reading``,
+monotonic and wall clock in nanoseconds), taken on the sensor thread the
+moment the read returns. The snapshot keeps those per sensor and marks a
+reading ``cached`` when an earlier snapshot already reported that same
+acquisition, and ``stale`` when it is older than the sensor's ``max_age``.
+"""
+
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from acquisition import acquire, age, stamp
+from scheduler import Schedule
+
+
+class Snapshot(dict):
+    """``{name: reading}`` for one cycle; ``tick`` is the cycle's ``scheduler.Tick``.
+
+    ``readings`` maps each sensor with a value to its ``Reading``,
+    ``taken_ns`` is the monotonic time the snapshot was assembled, and
+    ``cached`` and ``stale`` list the sensors marked as such.
+    """
+
+    tick = None
+    taken_ns = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.readings = {}
+        self.cached = []
+        self.stale = []
+
+    def age(self, name):
+        """Seconds between the acquisition of ``name`` and the snapshot, None without a reading."""
+        reading = self.readings.get(name)
+        return age(reading, self.taken_ns) if reading is not None else None
+
+
+class StationEngine:
+    """Run sensor reads and uploads concurrently at a fixed interval.
+
+    ``sensors`` maps a sensor name to a blocking callable that returns its
+    reading (or ``None``). ``upload`` is a blocking callable that receives
+    the per-cycle snapshot ``{name: reading}``. ``prepare``, if given, runs
+    on the upload thread at the start of every cycle while the sensors are
+    being read (e.g. to open the server connection ahead of the upload).
+
+    ``rates`` maps sensor names to their own sample period in seconds, or
+    to ``(period, offset)``; ``align`` and ``grace`` are passed on to every
+    ``Schedule``. A sensor may return an ``acquisition.Reading`` to report
+    its own acquisition time (e.g. a cached value). ``max_age`` maps sensor
+    names to the age in seconds beyond which a reading is stale; it
+    defaults to two of the sensor's periods.
+    """
+
+    def __init__(self, sensors, upload, interval=60.0, read_timeout=None,
+                 queue_size=10, stats_every=60, prepare=None, rates=None,
+                 align=True, grace=None, max_age=None, settle=0.1, log=print):
+        self.sensors = dict(sensors)
+        self.upload = upload
+        self.prepare = prepare
+        self.interval = interval
+        self.rates = dict(rates or {})
+        unknown = set(self.rates) - set(self.sensors)
+        if unknown:
+            raise ValueError(f"Rates given for unknown sensors: {', '.join(sorted(unknown))}")
+        self.sensor_schedules = {}
+        for name, rate in self.rates.items():
+            period, offset = rate if isinstance(rate, tuple) else (rate, 0.0)
+            self.sensor_schedules[name] = Schedule(period, offset=offset, align=align, grace=grace)
+        # Cycles fire after the sensor ticks of the same slot
+        offset = max((s.offset for s in self.sensor_schedules.values()), default=0.0)
+        self.schedule = Schedule(interval, offset=offset + settle if self.rates else 0.0,
+                                 align=align, grace=grace)
+        # A sensor that has not answered by then is reported as missing for
+        # this cycle; its read keeps running and is not restarted until done.
+        self.read_timeout = read_timeout if read_timeout is not None else interval / 2
+        self.queue_size = queue_size
+        self.stats_every = stats_every
+        self.log = log
+
+        self.max_age = {name: 2 * self.sensor_schedules[name].period if name in self.sensor_schedules
+                        else 2 * interval for name in self.sensors}
+        unknown = set(max_age or {}) - set(self.sensors)
+        if unknown:
+            raise ValueError(f"Maximum ages given for unknown sensors: {', '.join(sorted(unknown))}")
+        self.max_age.update(max_age or {})
+
+        self.latest = {name: None for name in self.sensors}
+        self.readings = {name: None for name in self.sensors}
+        self._reported = {}
+        self.cached = {name: 0 for name in self.sensors}
+        self.stale = {name: 0 for name in self.sensors}
+        self.cycle_times = deque(maxlen=100)
+        self.cycles = 0
+        self.dropped_uploads = 0
+        self.busy_skips = {name: 0 for name in self.rates}
+
+        self._pending = {}
+        self._queue = None
+        self._sensor_executor = ThreadPoolExecutor(
+            max_workers=max(1, len(self.sensors)), thread_name_prefix='sensor')
+        self._upload_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='upload')
+
+    async def _read(self, name, read):
+        loop = asyncio.get_running_loop()
+        try:
+            # Stamped on the sensor thread, not when the event loop gets to it
+            reading = await loop.run_in_executor(self._sensor_executor, acquire, read)
+        except Exception as e:
+            self.log(f"{name} read error: {e}")
+            reading = stamp(None)
+        self.readings[name] = reading
+        self.latest[name] = reading.value
+        return reading.value
+
+    def _prepare(self):
+        try:
+            self.prepare()
+        except Exception as e:
+            self.log(f"Prepare error: {e}")
+
+    @property
+    def overruns(self):
+        """Cycles started late plus cycles skipped because the previous one overran."""
+        return self.schedule.late + self.schedule.skipped
+
+    def _start_read(self, name):
+        """Start a read unless the previous one is still running; returns the task."""
+        task = self._pending.get(name)
+        if task is None or task.done():
+            task = self._pending[name] = asyncio.ensure_future(self._read(name, self.sensors[name]))
+        return task
+
+    async def _sample_loop(self, name, schedule):
+        """Read one sensor on its own schedule."""
+        while True:
+            tick = await schedule.wait()
+            if tick.skipped:
+                self.log(f"{name}: skipped {tick.skipped} sample(s)")
+            task = self._pending.get(name)
+            if task is not None and not task.done():
+                # Previous read still hanging: do not pile up threads on it
+                self.busy_skips[name] += 1
+                continue
+            self._start_read(name)
+
+    async def run_cycle(self, tick=None):
+        """Read the per-cycle sensors concurrently and return ``(snapshot, wall_time)``."""
+        started = time.monotonic()
+
+        if self.prepare is not None:
+            # Queued ahead of this cycle's upload on the single upload thread
+            asyncio.get_running_loop().run_in_executor(self._upload_executor, self._prepare)
+
+        cycle_sensors = [name for name in self.sensors if name not in self.rates]
+        for name in cycle_sensors:
+            self._start_read(name)
+
+        # Includes reads the sensor schedules started for this slot
+        waiting = [task for task in self._pending.values() if not task.done()]
+        if waiting:
+            await asyncio.wait(waiting, timeout=self.read_timeout)
+
+        snapshot = Snapshot()
+        snapshot.tick = tick
+        snapshot.taken_ns = time.monotonic_ns()
+        stalled = []
+        for name in self.sensors:
+            task = self._pending.get(name)
+            if name in self.rates:
+                # Sampled on its own schedule: report the latest reading
+                snapshot[name] = self.latest[name]
+            elif task.done():
+                snapshot[name] = self.latest[name]
+            else:
+                snapshot[name] = None
+                stalled.append(name)
+            reading = self.readings[name]
+            if snapshot[name] is not None and reading is not None:
+                self._mark(snapshot, name, reading)
+
+        wall_time = time.monotonic() - started
+        self.cycles += 1
+        self.cycle_times.append(wall_time)
+        if stalled:
+            self.log(f"Cycle {self.cycles}: {wall_time:.2f}s, stalled: {', '.join(stalled)}")
+        if self.stats_every and self.cycles % self.stats_every == 0:
+            s = self.stats()
+            self.log(f"Cycle time - last: {s['last_cycle']:.2f}s | mean: {s['mean_cycle']:.2f}s | "
+                     f"max: {s['max_cycle']:.2f}s | late: {s['late']} | skipped: {s['skipped']}")
+        return snapshot, wall_time
+
+    def _mark(self, snapshot, name, reading):
+        snapshot.readings[name] = reading
+        if self._reported.get(name) == reading.monotonic_ns:
+            snapshot.cached.append(name)
+            self.cached[name] += 1
+        if snapshot.age(name) > self.max_age[name]:
+            snapshot.stale.append(name)
+            self.stale[name] += 1
+        self._reported[name] = reading.monotonic_ns
+
+    def _enqueue(self, snapshot):
+        if self._queue.full():
+            # Keep the newest readings; an old cycle is worth less than a fresh one
+            self._queue.get_nowait()
+            self._queue.task_done()
+            self.dropped_uploads += 1
+        self._queue.put_nowait(snapshot)
+
+    async def _upload_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            snapshot = await self._queue.get()
+            try:
+                await loop.run_in_executor(self._upload_executor, self.upload, snapshot)
+            except Exception as e:
+                self.log(f"Upload error: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def run(self, cycles=None):
+        """Sample every ``interval`` seconds; run forever unless ``cycles`` is given."""
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        uploader = asyncio.ensure_future(self._upload_loop())
+        samplers = [asyncio.ensure_future(self._sample_loop(name, schedule))
+                    for name, schedule in self.sensor_schedules.items()]
+        done = 0
+        try:
+            while cycles is None or done < cycles:
+                tick = await self.schedule.wait()
+                if tick.skipped:
+                    self.log(f"Cycle overran: skipped {tick.skipped} tick(s)")
+                elif tick.lateness > self.schedule.grace / 2:
+                    self.log(f"Cycle started {tick.lateness:.2f}s late")
+                snapshot, _ = await self.run_cycle(tick)
+                self._enqueue(snapshot)
+                done += 1
+
+            # Let the uploader finish what is queued before returning
+            await self._queue.join()
+        finally:
+            uploader.cancel()
+            for sampler in samplers:
+                sampler.cancel()
+
+    def stats(self):
+        """Return cycle timing figures for logging."""
+        times = list(self.cycle_times)
+        return {
+            'cycles': self.cycles,
+            'last_cycle': times[-1] if times else None,
+            'mean_cycle': sum(times) / len(times) if times else None,
+            'max_cycle': max(times) if times else None,
+            'overruns': self.overruns,
+            'late': self.schedule.late,
+            'skipped': self.schedule.skipped,
+            'dropped_uploads': self.dropped_uploads,
+            'cached': dict(self.cached),
+            'stale': dict(self.stale),
+            'rates': {name: dict(schedule.stats(), busy_skips=self.busy_skips[name])
+                      for name, schedule in self.sensor_schedules.items()},
+        }
+
+    def close(self):
+        self._sensor_executor.shutdown(wait=False, cancel_futures=True)
+        self._upload_executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,104 @@
+"""
+Local stand-in MQTT broker for the publisher tests.
+
+Understands just what ``mqtt_publisher`` sends: CONNECT (answered with
+CONNACK), PUBLISH at QoS 0/1/2 (with PUBACK or PUBREC/PUBREL/PUBCOMP),
+PINGREQ and DISCONNECT. Accepted messages are recorded in
+``broker.messages`` as ``(topic, payload, qos, retain)``; the newest
+retained payload per topic is in ``broker.retained``.
+
+``broker.drop_connections()`` closes every client socket to simulate a
+broker restart; ``broker.refuse`` makes CONNACK return "server unavailable".
+"""
+
+import socket
+import struct
+import threading
+
+from mqtt_publisher import (CONNACK, CONNECT, DISCONNECT, PINGREQ, PINGRESP, PUBACK, PUBCOMP,
+                            PUBLISH, PUBREC, PUBREL, MQTTError, _packet, read_packet)
+
+
+class StandInBroker:
+    def __init__(self, port=0):
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(('127.0.0.1', port))
+        self._server.listen(5)
+        self.port = self._server.getsockname()[1]
+        self.messages = []
+        self.retained = {}
+        self.client_ids = []
+        self.pings = 0
+        self.refuse = False
+        self._clients = []
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._accept, daemon=True)
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            with self._lock:
+                self._clients.append(conn)
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        try:
+            while True:
+                kind, flags, body = read_packet(conn)
+                if kind == CONNECT:
+                    # protocol name (2+4), level, flags, keepalive, then client id
+                    (id_len,) = struct.unpack('>H', body[10:12])
+                    self.client_ids.append(body[12:12 + id_len].decode())
+                    conn.sendall(_packet(CONNACK << 4, bytes([0, 3 if self.refuse else 0])))
+                elif kind == PUBLISH:
+                    qos, retain = (flags >> 1) & 0x03, bool(flags & 0x01)
+                    (topic_len,) = struct.unpack('>H', body[:2])
+                    topic = body[2:2 + topic_len].decode()
+                    rest = body[2 + topic_len:]
+                    packet_id = rest[:2] if qos else b''
+                    payload = rest[2:] if qos else rest
+                    with self._lock:
+                        self.messages.append((topic, payload, qos, retain))
+                        if retain:
+                            self.retained[topic] = payload
+                    if qos == 1:
+                        conn.sendall(_packet(PUBACK << 4, packet_id))
+                    elif qos == 2:
+                        conn.sendall(_packet(PUBREC << 4, packet_id))
+                elif kind == PUBREL:
+                    conn.sendall(_packet(PUBCOMP << 4, body[:2]))
+                elif kind == PINGREQ:
+                    self.pings += 1
+                    conn.sendall(_packet(PINGRESP << 4))
+                elif kind == DISCONNECT:
+                    break
+        except (OSError, MQTTError):
+            pass
+        finally:
+            conn.close()
+
+    def drop_connections(self):
+        with self._lock:
+            clients, self._clients = self._clients, []
+        for conn in clients:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+
+    def topics(self):
+        with self._lock:
+            return [m[0] for m in self.messages]
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.close()
+        self.drop_connections()
@@ -0,0 +1,101 @@
+"""
+Local stand-in for the weather-tracker server used by the upload tests.
+
+Accepts the existing single JSON object payload, a JSON array of payloads,
+NDJSON and packed ``payload_codec`` records, each optionally
+gzip-compressed. Every accepted payload is recorded in ``server.received``.
+Set ``server.accept_post`` to advertise media types on HEAD.
+
+Faults are injected with ``server.inject(status, headers, delay)``: each
+queued fault answers one POST (after ``delay`` seconds) instead of
+accepting it; once the queue is empty the server accepts again.
+"""
+
+import gzip
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from payload_codec import MEDIA_TYPE, decode_records
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=b'{"ok":true}', headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.server.requests.append({'path': self.path, 'headers': dict(self.headers), 'size': 0})
+        self.send_response(200)
+        if self.server.accept_post:
+            self.send_header('Accept-Post', self.server.accept_post)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        server.requests.append({'path': self.path, 'headers': dict(self.headers), 'size': len(body)})
+
+        if server.faults:
+            status, headers, delay = server.faults.popleft()
+            if delay:
+                time.sleep(delay)
+            if status != 200:
+                self._reply(status, b'{"error":"injected"}', headers)
+                return
+
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        content_type = self.headers.get('Content-Type', '').split(';')[0]
+        if content_type == MEDIA_TYPE:
+            payloads = decode_records(body)
+        elif content_type == 'application/x-ndjson':
+            payloads = [json.loads(line) for line in body.decode('utf-8').splitlines() if line]
+        else:
+            decoded = json.loads(body.decode('utf-8'))
+            payloads = decoded if isinstance(decoded, list) else [decoded]
+        server.received.extend(payloads)
+        self._reply(200)
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.received = []
+        self.requests = []
+        self.accept_post = None
+        self.faults = deque()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def inject(self, status, headers=None, delay=0.0, times=1):
+        """Answer the next ``times`` POSTs with ``status`` after ``delay`` seconds."""
+        for _ in range(times):
+            self.faults.append((status, headers, delay))
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return f"http://{host}:{port}/weather-tracker"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,26 @@
+"""
+Tests for reading acquisition timestamps.
+"""
+
+import time
+
+from acquisition import Reading, acquire, age, stamp, unwrap
+
+
+class TestAcquisition:
+    def test_plain_values_stamped_on_return(self):
+        before = time.monotonic_ns()
+        reading = acquire(lambda: (21.5, 40.0))
+        assert reading.value == (21.5, 40.0)
+        assert before <= reading.monotonic_ns <= time.monotonic_ns()
+        assert abs(reading.wall_ns / 1e9 - time.time()) < 1.0
+
+    def test_cached_reading_keeps_its_stamp(self):
+        old = Reading(5.0, time.monotonic_ns() - 20 * 10**9, time.time_ns() - 20 * 10**9)
+        assert acquire(lambda: old) is old
+        assert 20.0 <= age(old) < 21.0
+        assert age(old, old.monotonic_ns + 1500 * 10**6) == 1.5
+
+    def test_unwrap(self):
+        assert unwrap(stamp((1.0, 2.0))) == (1.0, 2.0)
+        assert unwrap(3.0) == 3.0 and unwrap(None) is None
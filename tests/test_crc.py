@@ -0,0 +1,61 @@
+"""
+Tests for the shared table-driven CRC-8 module and its NumPy bulk API.
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from crc import CRC8_TABLE, crc8, crc8_bitwise, decode_frames, validate_frames
+
+
+def _frame(temp_raw, hum_raw):
+    t = [temp_raw >> 8, temp_raw & 0xFF]
+    h = [hum_raw >> 8, hum_raw & 0xFF]
+    return t + [crc8_bitwise(t)] + h + [crc8_bitwise(h)]
+
+
+class TestCrc8Table:
+    def test_table_size(self):
+        assert len(CRC8_TABLE) == 256
+
+    def test_matches_bitwise_for_all_words(self):
+        for word in range(0, 0x10000, 7):
+            data = [word >> 8, word & 0xFF]
+            assert crc8(data) == crc8_bitwise(data)
+
+    def test_accepts_bytes(self):
+        assert crc8(b"\xBE\xEF") == 0x92
+
+
+class TestValidateFrames:
+    def test_mask_flags_corrupt_frames(self):
+        rng = random.Random(1)
+        frames = [_frame(rng.randrange(0x10000), rng.randrange(0x10000)) for _ in range(100)]
+        frames[3][2] ^= 0x01   # bad temperature CRC
+        frames[50][4] ^= 0x80  # bad humidity data
+        buf = bytes(b for frame in frames for b in frame)
+        mask = validate_frames(buf)
+        assert mask.dtype == bool
+        assert mask.shape == (100,)
+        assert not mask[3] and not mask[50]
+        assert mask.sum() == 98
+
+    def test_accepts_uint8_array(self):
+        arr = np.array(_frame(0x6666, 0x8000) * 2, dtype=np.uint8)
+        assert validate_frames(arr).tolist() == [True, True]
+
+    def test_rejects_partial_frame(self):
+        with pytest.raises(ValueError):
+            validate_frames(b"\x00" * 7)
+
+    def test_decode_frames(self):
+        bad = _frame(0x6666, 0x8000)
+        bad[5] ^= 0xFF
+        buf = bytes(_frame(0x6666, 0x8000) + bad)
+        temperature, humidity, valid = decode_frames(buf)
+        assert valid.tolist() == [True, False]
+        assert abs(temperature[0] - 25.0) < 0.01
+        assert abs(humidity[0] - 50.0) < 0.01
+        assert np.isnan(temperature[1])
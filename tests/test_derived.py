@@ -0,0 +1,82 @@
+"""
+Tests for the vectorized derived metrics.
+"""
+
+import numpy as np
+import pytest
+
+from derived import absolute_humidity, degrees_to_compass, dew_point, heat_index, wind_chill
+from payload import build_payload
+
+
+class TestScalarAndArray:
+    def test_scalar_in_plain_float_out(self):
+        assert type(dew_point(22, 50)) is float
+        assert type(degrees_to_compass(90)) is str
+
+    def test_array_matches_scalar(self):
+        temps = np.array([-10.0, 0.0, 22.0, 35.0])
+        hums = np.array([80.0, 60.0, 50.0, 70.0])
+        for fn in (dew_point, absolute_humidity, heat_index):
+            bulk = fn(temps, hums)
+            assert bulk.shape == temps.shape
+            assert bulk.tolist() == pytest.approx([fn(t, h) for t, h in zip(temps, hums)])
+
+    def test_broadcast(self):
+        assert dew_point(np.array([10.0, 20.0]), 100.0).tolist() == pytest.approx([10.0, 20.0])
+        assert degrees_to_compass(np.array([0, 90, 180, 270])).tolist() == ['N', 'E', 'S', 'W']
+
+
+class TestValues:
+    def test_dew_point_out_of_domain_is_nan(self):
+        assert np.isnan(dew_point(20, 0))
+        assert np.isnan(dew_point(np.array([20.0, 20.0]), np.array([50.0, -1.0])))[1]
+
+    def test_absolute_humidity(self):
+        # 20 °C / 50 % RH holds about 8.6 g/m³
+        assert absolute_humidity(20, 50) == pytest.approx(8.63, abs=0.05)
+
+    def test_dew_point_magnus_constants(self):
+        # Magnus with a = 17.62, b = 243.12 °C; the earlier 17.27 / 237.7 pair
+        # gave values up to about 0.01 °C lower in the station's range
+        assert dew_point(20, 50) == pytest.approx(9.255, abs=0.001)
+        assert dew_point(25, 60) == pytest.approx(16.693, abs=0.001)
+        assert dew_point(0, 80) == pytest.approx(-3.040, abs=0.001)
+        assert dew_point(-10, 90) == pytest.approx(-11.329, abs=0.001)
+
+    def test_heat_index_close_to_air_when_mild(self):
+        assert heat_index(20, 50) == pytest.approx(20, abs=1)
+
+    def test_heat_index_nws_values(self):
+        # Rothfusz regression where it applies (NWS table: 86 °F / 70 % -> 95 °F)
+        assert heat_index(30, 70) == pytest.approx(35.04, abs=0.01)
+        assert heat_index(35, 40) == pytest.approx(37.22, abs=0.01)
+        # Low- and high-humidity adjustments
+        assert heat_index(40, 10) == pytest.approx(36.71, abs=0.01)
+        assert heat_index(29, 90) == pytest.approx(37.23, abs=0.01)
+        # Steadman's simple formula in mild weather, where the bare regression
+        # (used before) gave 25.2 °C at 20 °C and 37.7 °C at 10 °C
+        assert heat_index(20, 50) == pytest.approx(19.68, abs=0.01)
+        assert heat_index(10, 60) == pytest.approx(9.31, abs=0.01)
+
+    def test_wind_chill_only_in_range(self):
+        assert wind_chill(20, 30) == 20
+        assert wind_chill(0, 2) == 0
+        assert wind_chill(0, 50) < -7
+
+
+class TestPayload:
+    def test_derived_fields_shipped(self):
+        data = build_payload(22.0, 50.0, None, 5.0, 80.0, timestamp=0)
+        assert data['dew_point_indoor'] == round(dew_point(22.0, 50.0), 1)
+        assert data['absolute_humidity_indoor'] == round(absolute_humidity(22.0, 50.0), 1)
+        assert data['dew_point_outdoor'] == round(dew_point(5.0, 80.0), 1)
+        assert 'heat_index_outdoor' in data and 'heat_index_indoor' not in data
+
+    def test_missing_sensor_no_derived(self):
+        data = build_payload(None, None, 1013.0, None, None, timestamp=0)
+        assert not any(k.startswith(('dew_point', 'absolute_humidity')) for k in data)
+
+    def test_derived_off(self):
+        data = build_payload(22.0, 50.0, None, None, None, timestamp=0, derived=False)
+        assert 'dew_point_indoor' not in data
@@ -0,0 +1,165 @@
+"""
+Tests for the persistent DHT22 backend, driven by a fake driver and clock
+and a fake sysfs tree.
+"""
+
+import pytest
+
+from dht22_backend import DHT22Backend, DHT22SysfsBackend, find_sysfs_node, open_dht22_backend
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class FakeDHT:
+    def __init__(self, readings):
+        self._readings = list(readings)
+        self._current = None
+        self.exited = False
+
+    @property
+    def temperature(self):
+        self._current = self._readings.pop(0)
+        if isinstance(self._current, Exception):
+            raise self._current
+        return self._current[0]
+
+    @property
+    def humidity(self):
+        return self._current[1]
+
+    def exit(self):
+        self.exited = True
+
+
+def _backend(readings, **kw):
+    clock = FakeClock()
+    created = []
+
+    def factory():
+        dht = FakeDHT(readings)
+        created.append(dht)
+        return dht
+
+    backend = DHT22Backend(factory=factory, clock=clock, sleep=clock.sleep, **kw)
+    return backend, clock, created
+
+
+class TestDHT22Backend:
+    def test_handle_reused_between_reads(self):
+        backend, clock, created = _backend([(20.0, 50.0), (20.5, 51.0)])
+        assert backend.read() == (20.0, 50.0)
+        clock.now += 60
+        assert backend.read() == (20.5, 51.0)
+        assert len(created) == 1
+
+    def test_first_read_does_not_sleep(self):
+        backend, clock, _ = _backend([(20.0, 50.0)])
+        backend.read()
+        assert clock.slept == []
+
+    def test_enforces_min_interval(self):
+        backend, clock, _ = _backend([(20.0, 50.0), (21.0, 52.0)])
+        backend.read()
+        clock.now += 0.5
+        backend.read()
+        assert clock.slept == [1.5]
+
+    def test_retries_transient_errors(self):
+        backend, clock, _ = _backend([RuntimeError("Checksum did not validate"), (19.0, 60.0)])
+        assert backend.read() == (19.0, 60.0)
+        assert backend.consecutive_failures == 0
+        assert clock.slept == [2.0]
+
+    def test_reopens_after_consecutive_failures(self):
+        failure = RuntimeError("A full buffer was not returned")
+        backend, clock, created = _backend([failure] * 4 + [(18.0, 70.0)],
+                                           attempts=2, max_failures=2)
+        assert backend.read() == (None, None)
+        assert backend.consecutive_failures == 1
+        assert backend.read() == (None, None)
+        assert backend.reopens == 1
+        assert created[0].exited
+        assert len(created) == 2
+        assert isinstance(backend.last_error, RuntimeError)
+
+    def test_close_releases_handle(self):
+        backend, clock, created = _backend([(20.0, 50.0)])
+        with backend:
+            backend.read()
+        assert created[0].exited
+        assert not backend.is_open
+
+
+def _fake_sysfs(root, kind='iio', name='dht11', temp='21500', hum='48200'):
+    if kind == 'iio':
+        device = root / 'sys/bus/iio/devices/iio:device0'
+        files = {'in_temp_input': temp, 'in_humidityrelative_input': hum}
+    else:
+        device = root / 'sys/class/hwmon/hwmon2'
+        files = {'temp1_input': temp, 'humidity1_input': hum}
+    device.mkdir(parents=True)
+    (device / 'name').write_text(name + '\n')
+    for attr, value in files.items():
+        (device / attr).write_text(value + '\n')
+    return device
+
+
+class TestDHT22SysfsBackend:
+    def test_discovers_iio_node(self, tmp_path):
+        device = _fake_sysfs(tmp_path, 'iio')
+        assert find_sysfs_node(str(tmp_path)) == (
+            str(device / 'in_temp_input'), str(device / 'in_humidityrelative_input'))
+
+    def test_discovers_hwmon_node(self, tmp_path):
+        _fake_sysfs(tmp_path, 'hwmon')
+        assert find_sysfs_node(str(tmp_path))[0].endswith('temp1_input')
+
+    def test_ignores_other_devices(self, tmp_path):
+        _fake_sysfs(tmp_path, 'hwmon', name='cpu_thermal')
+        assert find_sysfs_node(str(tmp_path)) is None
+
+    def test_reads_milli_units(self, tmp_path):
+        _fake_sysfs(tmp_path, 'iio', temp='-3200', hum='91000')
+        with DHT22SysfsBackend(root=str(tmp_path)) as backend:
+            assert backend.read() == (-3.2, 91.0)
+
+    def test_fds_stay_open_and_see_new_values(self, tmp_path):
+        device = _fake_sysfs(tmp_path, 'iio')
+        backend = DHT22SysfsBackend(root=str(tmp_path))
+        assert backend.read() == (21.5, 48.2)
+        fds = backend._fds
+        (device / 'in_temp_input').write_text('22000\n')
+        assert backend.read() == (22.0, 48.2)
+        assert backend._fds is fds
+        backend.close()
+        assert not backend.is_open
+
+    def test_bad_value_counts_as_failure(self, tmp_path):
+        _fake_sysfs(tmp_path, 'iio', temp='')
+        backend = DHT22SysfsBackend(root=str(tmp_path), max_failures=2)
+        assert backend.read() == (None, None)
+        assert backend.consecutive_failures == 1
+        assert backend.read() == (None, None)
+        assert backend.reopens == 1
+        backend.close()
+
+    def test_missing_node_raises(self, tmp_path):
+        backend = DHT22SysfsBackend(root=str(tmp_path))
+        with pytest.raises(FileNotFoundError):
+            backend.read()
+
+    def test_open_backend_prefers_kernel_driver(self, tmp_path):
+        assert isinstance(open_dht22_backend(sysfs_root=str(tmp_path)), DHT22Backend)
+        _fake_sysfs(tmp_path, 'hwmon')
+        assert isinstance(open_dht22_backend(sysfs_root=str(tmp_path)), DHT22SysfsBackend)
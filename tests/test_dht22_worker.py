@@ -0,0 +1,118 @@
+"""
+Tests for the DHT22 worker protocol and the parent-side client. The client
+tests spawn real worker processes that serve a fake backend.
+"""
+
+import io
+import os
+import sys
+
+import pytest
+
+from dht22_worker import DHT22WorkerClient, WorkerError, encode_frame, read_frame, serve
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeBackend:
+    def __init__(self, readings):
+        self.readings = list(readings)
+        self.closed = False
+        self.last_error = None
+
+    def read(self):
+        reading = self.readings.pop(0)
+        if isinstance(reading, Exception):
+            raise reading
+        return reading
+
+    def close(self):
+        self.closed = True
+
+
+def _worker_argv(tmp_path, read_body):
+    """Command line for a worker process whose backend runs ``read_body`` per read."""
+    script = tmp_path / 'worker.py'
+    lines = [
+        "import os, sys, time",
+        f"sys.path.insert(0, {REPO!r})",
+        "from dht22_worker import serve",
+        f"MARK = {str(tmp_path / 'hung')!r}",
+        "class Backend:",
+        "    calls = 0",
+        "    def close(self):",
+        "        pass",
+        "    def read(self):",
+        "        Backend.calls += 1",
+    ]
+    lines += ["        " + line for line in read_body]
+    lines.append("serve(Backend(), sys.stdin.buffer, sys.stdout.buffer)")
+    script.write_text("\n".join(lines) + "\n")
+    return [sys.executable, str(script)]
+
+
+class TestProtocol:
+    def test_frame_roundtrip(self):
+        buf = io.BytesIO(encode_frame({'cmd': 'read'}) + encode_frame({'cmd': 'exit'}))
+        assert read_frame(buf) == {'cmd': 'read'}
+        assert read_frame(buf) == {'cmd': 'exit'}
+        assert read_frame(buf) is None
+
+    def test_truncated_frame(self):
+        with pytest.raises(WorkerError):
+            read_frame(io.BytesIO(encode_frame({'cmd': 'read'})[:-2]))
+
+    def test_serve_answers_until_exit(self):
+        backend = FakeBackend([(21.0, 40.0), RuntimeError("not found")])
+        requests = b''.join(encode_frame(m) for m in (
+            {'cmd': 'read'}, {'cmd': 'read'}, {'cmd': 'exit'}, {'cmd': 'read'}))
+        out = io.BytesIO()
+        serve(backend, io.BytesIO(requests), out)
+        out.seek(0)
+        assert read_frame(out) == {'ok': True, 'temperature': 21.0, 'humidity': 40.0}
+        assert read_frame(out) == {'ok': False, 'error': 'not found'}
+        assert read_frame(out) is None
+        assert backend.closed
+
+
+class TestClient:
+    def test_worker_stays_warm(self, tmp_path):
+        client = DHT22WorkerClient(_worker_argv(tmp_path, ["return 20.0 + Backend.calls, 50.0"]),
+                                   log=lambda msg: None)
+        with client:
+            pid = client.pid
+            assert client.read() == (21.0, 50.0)
+            assert client.read() == (22.0, 50.0)
+            assert client.pid == pid
+        assert client.restarts == 0
+
+    def test_hung_worker_is_restarted(self, tmp_path):
+        # The first worker hangs on its first read; its replacement answers
+        argv = _worker_argv(tmp_path, [
+            "if not os.path.exists(MARK):",
+            "    open(MARK, 'w').close()",
+            "    time.sleep(60)",
+            "return 19.5, 60.0",
+        ])
+        client = DHT22WorkerClient(argv, deadline=1.0, log=lambda msg: None)
+        with client:
+            assert client.read() == (None, None)
+            assert client.timeouts == 1
+            assert client.read() == (19.5, 60.0)
+            assert client.restarts == 1
+
+    def test_crashed_worker_is_restarted(self, tmp_path):
+        client = DHT22WorkerClient(_worker_argv(tmp_path, ["os._exit(3)"]), log=lambda msg: None)
+        with client:
+            assert client.read() == (None, None)
+            assert "exited" in client.last_error
+            assert client.read() == (None, None)
+            assert client.restarts == 1
+
+    def test_error_reply(self, tmp_path):
+        argv = _worker_argv(tmp_path, ["raise RuntimeError('Checksum did not validate')"])
+        client = DHT22WorkerClient(argv, log=lambda msg: None)
+        with client:
+            assert client.read() == (None, None)
+            assert client.last_error == 'Checksum did not validate'
+            assert client.restarts == 0
@@ -0,0 +1,80 @@
+"""
+Tests for the streaming Hampel outlier filter.
+"""
+
+import random
+import statistics
+
+import pytest
+
+from hampel import HampelFilter, HampelStage
+
+
+class TestHampelFilter:
+    @pytest.mark.parametrize('window', [3, 4, 7, 8, 15])
+    def test_median_and_mad_match_rescan(self, window):
+        rng = random.Random(window)
+        hampel = HampelFilter(window=window)
+        recent = []
+        for _ in range(300):
+            x = round(rng.gauss(20, 2), rng.choice([0, 1, 3]))
+            hampel.push(x)
+            recent = (recent + [x])[-window:]
+            med = statistics.median(recent)
+            assert hampel.median() == pytest.approx(med)
+            assert hampel.mad() == pytest.approx(statistics.median(abs(v - med) for v in recent))
+
+    def test_single_spike_flagged(self):
+        hampel = HampelFilter(window=7, floor=0.2)
+        for x in [20.1, 20.2, 20.1, 20.3, 20.2, 20.2]:
+            assert not hampel.update(x)[1]
+        median, outlier = hampel.update(35.7)
+        assert outlier and median == pytest.approx(20.2)
+        assert not hampel.update(20.2)[1]
+        assert hampel.stats()['outliers'] == 1
+
+    def test_floor_allows_small_steps_on_flat_data(self):
+        hampel = HampelFilter(window=7, floor=0.2)
+        for _ in range(7):
+            hampel.update(21.0)
+        assert hampel.mad() == 0
+        assert not hampel.update(21.1)[1]
+        assert HampelFilter(window=7).is_outlier(21.1) is False  # too few samples to judge
+
+    def test_step_change_accepted(self):
+        hampel = HampelFilter(window=7, floor=0.2)
+        for _ in range(7):
+            hampel.update(50.0)
+        flags = [hampel.update(70.0)[1] for _ in range(7)]
+        assert flags[0] and not flags[-1]
+
+    def test_window_too_small(self):
+        with pytest.raises(ValueError):
+            HampelFilter(window=2)
+
+
+class TestHampelStage:
+    def _warm(self, stage):
+        for t in [20.0, 20.1, 20.0, 20.2, 20.1]:
+            stage.apply({'temperature_outdoor': t, 'humidity_outdoor': 60.0})
+
+    def test_replace_mode(self):
+        stage = HampelStage()
+        self._warm(stage)
+        values, outliers = stage.apply({'temperature_outdoor': -3.2, 'humidity_outdoor': 60.5,
+                                        'pressure': None})
+        assert outliers == ['temperature_outdoor']
+        assert values == {'temperature_outdoor': 20.1, 'humidity_outdoor': 60.5, 'pressure': None}
+        assert stage.stats()['replaced'] == 1
+        assert stage.stats()['fields']['temperature_outdoor']['outliers'] == 1
+
+    def test_flag_mode(self):
+        stage = HampelStage(mode='flag')
+        self._warm(stage)
+        values, outliers = stage.apply({'temperature_outdoor': -3.2})
+        assert outliers == ['temperature_outdoor'] and values['temperature_outdoor'] == -3.2
+        assert stage.stats()['flagged'] == 1
+
+    def test_unknown_mode(self):
+        with pytest.raises(ValueError):
+            HampelStage(mode='drop')
@@ -0,0 +1,90 @@
+"""
+Tests for the memory-mapped ring-buffer history store.
+"""
+
+import numpy as np
+import pytest
+
+from history_store import HistoryStore
+from payload import build_payload
+
+T0 = 1760000000
+
+
+def _store(path, **kw):
+    kw.setdefault('chunk_size', 4)
+    kw.setdefault('chunks', 3)
+    return HistoryStore(str(path), **kw)
+
+
+class TestHistoryStore:
+    def test_append_and_read(self, tmp_path):
+        store = _store(tmp_path)
+        store.append(T0, {'temperature_indoor': 21.37, 'pressure': 1013.2})
+        store.append(T0 + 60, {'temperature_indoor': 21.5})
+        ts, temp = store.read('temperature_indoor')
+        assert ts.tolist() == [T0 * 1000, (T0 + 60) * 1000]
+        assert temp == pytest.approx([21.37, 21.5])
+        _, pressure = store.read('pressure')
+        assert pressure[0] == pytest.approx(1013.2) and np.isnan(pressure[1])
+
+    def test_ring_overwrites_oldest_chunk(self, tmp_path):
+        store = _store(tmp_path)
+        for i in range(14):
+            store.append(T0 + i, {'humidity_indoor': float(i)})
+        # 3 chunks of 4: the fourth chunk's rows reuse the first chunk
+        assert len(store) == 10
+        ts, hum = store.read('humidity_indoor')
+        assert ts.tolist() == [(T0 + i) * 1000 for i in range(4, 14)]
+        assert hum.tolist() == [float(i) for i in range(4, 14)]
+
+    def test_chunks_are_zero_copy_views(self, tmp_path):
+        store = _store(tmp_path)
+        for i in range(6):
+            store.append(T0 + i, {'pressure': 1000.0 + i})
+        chunks = list(store.chunks())
+        assert [len(c['timestamp']) for c in chunks] == [4, 2]
+        assert all(isinstance(c['pressure'], np.memmap) for c in chunks)
+        assert chunks[0]['pressure'].dtype == np.int16 and chunks[0]['pressure'][1] == 10010
+
+    def test_query_range(self, tmp_path):
+        store = _store(tmp_path)
+        for i in range(10):
+            store.append(T0 + i, {'temperature_outdoor': float(i)})
+        rows = list(store.query(T0 + 3, T0 + 7))
+        values = np.concatenate([store.values('temperature_outdoor', r['temperature_outdoor']) for r in rows])
+        assert values.tolist() == [3.0, 4.0, 5.0, 6.0]
+        assert list(store.query(T0 + 20)) == []
+
+    def test_reopen_resumes(self, tmp_path):
+        store = _store(tmp_path)
+        for i in range(9):
+            store.append(T0 + i, {'humidity_outdoor': float(i)})
+        store.close()
+        store = _store(tmp_path)
+        assert len(store) == 9
+        for i in range(9, 14):
+            store.append(T0 + i, {'humidity_outdoor': float(i)})
+        assert store.read('humidity_outdoor')[1].tolist() == [float(i) for i in range(4, 14)]
+
+    def test_float32_fields(self, tmp_path):
+        store = _store(tmp_path, fields={'lux': ('float32', None)})
+        store.append(T0, {'lux': 123.25})
+        store.append(T0 + 1, {})
+        values = store.read('lux')[1]
+        assert values[0] == 123.25 and np.isnan(values[1])
+
+    def test_rejects_bad_input(self, tmp_path):
+        store = _store(tmp_path)
+        store.append(T0 + 10, {})
+        with pytest.raises(ValueError):
+            store.append(T0, {})
+        with pytest.raises(ValueError):
+            store.append(T0 + 11, {'pressure': 5000.0})
+        with pytest.raises(ValueError):
+            _store(tmp_path, chunk_size=8)
+
+    def test_append_payload(self, tmp_path):
+        store = _store(tmp_path)
+        store.append_payload(build_payload(21.0, 45.0, 1013.0, None, None, timestamp=T0))
+        assert store.read('humidity_indoor')[1].tolist() == [45.0]
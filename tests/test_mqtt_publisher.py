@@ -0,0 +1,143 @@
+"""
+Tests for the MQTT publisher against the local stand-in broker.
+"""
+
+import socket
+import time
+
+import pytest
+
+from mqtt_publisher import (MQTTPublisher, MQTTSink, encode_length, format_value, read_packet,
+                            publish_packet)
+from tests.mqtt_stand_in_broker import StandInBroker
+
+
+def _publisher(port, **kw):
+    kw.setdefault('log', lambda msg: None)
+    kw.setdefault('reconnect_delay', 0.05)
+    kw.setdefault('timeout', 2)
+    return MQTTPublisher('127.0.0.1', port, topic_prefix='ws/test', **kw)
+
+
+def _wait_for(predicate, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > end:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def _free_port():
+    s = socket.socket()
+    s.bind(('127.0.0.1', 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+class TestPackets:
+    @pytest.mark.parametrize('length, encoded', [
+        (0, b'\x00'), (127, b'\x7f'), (128, b'\x80\x01'), (16383, b'\xff\x7f'), (16384, b'\x80\x80\x01'),
+    ])
+    def test_remaining_length(self, length, encoded):
+        assert encode_length(length) == encoded
+
+    def test_publish_packet_round_trip(self):
+        a, b = socket.socketpair()
+        a.sendall(publish_packet('t/x', b'21.5', qos=1, retain=True, packet_id=7))
+        kind, flags, body = read_packet(b)
+        a.close()
+        b.close()
+        assert kind == 3 and flags == 0b0011
+        assert body == b'\x00\x03t/x\x00\x0721.5'
+
+    def test_format_value(self):
+        assert format_value(21.456) == b'21.5'
+        assert format_value(5) == b'5'
+        assert format_value({'a': 1}) == b'{"a":1}'
+
+
+class TestPublisher:
+    @pytest.mark.parametrize('qos', [0, 1, 2])
+    def test_retained_field_topics(self, qos):
+        with StandInBroker() as broker:
+            pub = _publisher(broker.port, qos=qos).start()
+            pub.publish_field('temperature_indoor', 21.43)
+            pub.publish_field('humidity_indoor', 45.0)
+            pub.publish_field('pressure', None)
+            assert pub.flush()
+            pub.stop()
+            assert _wait_for(lambda: len(broker.messages) == 2)
+        assert broker.messages == [
+            ('ws/test/temperature_indoor', b'21.4', qos, True),
+            ('ws/test/humidity_indoor', b'45.0', qos, True),
+        ]
+        assert broker.client_ids == ['weather-station']
+
+    def test_publish_does_not_block_without_broker(self):
+        pub = _publisher(_free_port(), buffer_size=3).start()
+        started = time.monotonic()
+        for i in range(5):
+            pub.publish_field('n', i)
+        assert time.monotonic() - started < 0.05
+        assert pub.buffered() == 3 and pub.dropped == 2
+        pub.stop()
+
+    def test_offline_buffer_flushed_on_reconnect(self):
+        port = _free_port()
+        pub = _publisher(port).start()
+        for i in range(3):
+            pub.publish_field('n', i)
+        assert _wait_for(lambda: pub.connect_failures >= 1)
+        assert pub.buffered() == 3
+        # Broker comes up on the port the publisher keeps retrying
+        with StandInBroker(port) as broker:
+            assert pub.flush()
+            assert _wait_for(lambda: len(broker.messages) == 3)
+            assert [m[1] for m in broker.messages] == [b'0', b'1', b'2']
+        pub.stop()
+
+    def test_resends_after_broker_drops_connection(self):
+        with StandInBroker() as broker:
+            pub = _publisher(broker.port).start()
+            pub.publish_field('a', 1)
+            assert pub.flush()
+            broker.drop_connections()
+            pub.publish_field('b', 2)
+            assert pub.flush()
+            pub.stop()
+        assert 'ws/test/b' in broker.topics()
+        assert pub.connects == 2
+
+    def test_refused_connection_retried(self):
+        with StandInBroker() as broker:
+            broker.refuse = True
+            pub = _publisher(broker.port).start()
+            pub.publish_field('a', 1)
+            assert _wait_for(lambda: pub.connect_failures >= 2)
+            broker.refuse = False
+            assert pub.flush()
+            pub.stop()
+        assert broker.retained['ws/test/a'] == b'1'
+
+    def test_keepalive_ping(self):
+        with StandInBroker() as broker:
+            pub = _publisher(broker.port, keepalive=0.1).start()
+            assert _wait_for(lambda: broker.pings >= 2)
+            pub.stop()
+
+    def test_invalid_qos(self):
+        with pytest.raises(ValueError):
+            MQTTPublisher('127.0.0.1', qos=3)
+
+
+class TestMQTTSink:
+    def test_payload_as_json(self):
+        with StandInBroker() as broker:
+            pub = _publisher(broker.port).start()
+            sink = MQTTSink(pub)
+            assert sink.send({'temperature': 21.5})
+            assert pub.flush()
+            pub.stop()
+        assert broker.retained['ws/test/state'] == b'{"temperature":21.5}'
@@ -0,0 +1,157 @@
+"""
+Tests for the SQLite store-and-forward outbox.
+"""
+
+import sqlite3
+
+from outbox import Outbox
+from retry import REJECTED
+
+
+def _outbox(tmp_path, **kw):
+    return Outbox(str(tmp_path / 'outbox.db'), **kw)
+
+
+class TestOutbox:
+    def test_append_returns_increasing_sequence(self, tmp_path):
+        box = _outbox(tmp_path)
+        seqs = [box.append({'n': i}) for i in range(3)]
+        assert seqs == sorted(seqs) and len(set(seqs)) == 3
+        assert len(box) == 3
+        box.close()
+
+    def test_wal_mode(self, tmp_path):
+        box = _outbox(tmp_path)
+        box.close()
+        db = sqlite3.connect(str(tmp_path / 'outbox.db'))
+        assert db.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        db.close()
+
+    def test_drain_in_order(self, tmp_path):
+        box = _outbox(tmp_path)
+        for i in range(5):
+            box.append({'n': i})
+        sent = []
+        assert box.drain(lambda p: sent.append(p['n']) or True, batch=2) == 5
+        assert sent == [0, 1, 2, 3, 4]
+        assert len(box) == 0
+        box.close()
+
+    def test_drain_stops_at_first_failure(self, tmp_path):
+        box = _outbox(tmp_path)
+        for i in range(4):
+            box.append({'n': i})
+        sent = []
+
+        def flaky(payload):
+            if payload['n'] == 2:
+                return False
+            sent.append(payload['n'])
+            return True
+
+        assert box.drain(flaky) == 2
+        assert [p['n'] for _, p in box.peek()] == [2, 3]
+        box.close()
+
+    def test_rejected_payload_dead_lettered(self, tmp_path):
+        box = _outbox(tmp_path)
+        for i in range(4):
+            box.append({'n': i})
+        sent = []
+
+        def refuse_one(payload):
+            if payload['n'] == 1:
+                return REJECTED
+            sent.append(payload['n'])
+            return True
+
+        assert box.drain(refuse_one) == 3
+        assert sent == [0, 2, 3] and len(box) == 0
+        assert box.rejected == 1 and [p['n'] for _, p in box.dead_letters()] == [1]
+        box.close()
+
+    def test_drain_stops_after_consecutive_rejections(self, tmp_path):
+        box = _outbox(tmp_path)
+        for i in range(20):
+            box.append({'n': i})
+        assert box.drain(lambda payload: REJECTED, max_rejections=3) == 0
+        assert box.rejected == 3 and len(box) == 17
+        assert box.drain_batches(lambda batch: REJECTED, 5, max_rejections=2) == 0
+        assert box.rejected == 5 and len(box) == 15
+        box.close()
+
+    def test_backlog_survives_restart(self, tmp_path):
+        box = _outbox(tmp_path)
+        box.append({'temperature': 21.5, 'timestamp': 1717000000})
+        box.drain(lambda p: False)
+        box.close()
+
+        box = _outbox(tmp_path)
+        assert [p for _, p in box.peek()] == [{'temperature': 21.5, 'timestamp': 1717000000}]
+        box.close()
+
+    def test_sequence_not_reused_after_delivery(self, tmp_path):
+        box = _outbox(tmp_path)
+        first = box.append({'n': 0})
+        box.drain(lambda p: True)
+        assert box.append({'n': 1}) > first
+        box.close()
+
+    def test_group_sync(self, tmp_path):
+        box = _outbox(tmp_path, sync_every=3, sync_interval=1e9)
+        for i in range(7):
+            box.append({'n': i})
+        assert box.syncs == 2
+        box.close()
+
+    def test_sync_interval(self, tmp_path):
+        now = [0.0]
+        box = _outbox(tmp_path, sync_every=1000, sync_interval=10, clock=lambda: now[0])
+        box.append({'n': 0})
+        assert box.syncs == 0
+        now[0] = 11
+        box.append({'n': 1})
+        assert box.syncs == 1
+        box.close()
+
+    def test_oldest_age(self, tmp_path):
+        box = _outbox(tmp_path)
+        assert box.oldest_age() is None
+        box.append({'n': 0})
+        assert 0 <= box.oldest_age() < 5
+        box.close()
+
+    def test_drain_batches_acks_whole_batch(self, tmp_path):
+        box = _outbox(tmp_path)
+        for i in range(5):
+            box.append({'n': i})
+        batches = []
+        sizes = iter([2, 3])
+        assert box.drain_batches(lambda b: batches.append([p['n'] for p in b]) or True,
+                                 lambda: next(sizes, 10)) == 5
+        assert batches == [[0, 1], [2, 3, 4]]
+        assert len(box) == 0
+        box.close()
+
+    def test_drain_batches_isolates_rejected_payload(self, tmp_path):
+        box = _outbox(tmp_path)
+        for i in range(5):
+            box.append({'n': i})
+        batches = []
+
+        def send_batch(batch):
+            batches.append([p['n'] for p in batch])
+            return REJECTED if any(p['n'] == 1 for p in batch) else True
+
+        assert box.drain_batches(send_batch, 3) == 4
+        assert batches == [[0, 1, 2], [0], [1], [2, 3, 4]]
+        assert [p['n'] for _, p in box.dead_letters()] == [1] and len(box) == 0
+        box.close()
+
+    def test_drain_batches_stops_at_rejected_batch(self, tmp_path):
+        box = _outbox(tmp_path)
+        for i in range(4):
+            box.append({'n': i})
+        assert box.drain_batches(lambda b: b[0]['n'] == 0, 2) == 2
+        assert [p['n'] for _, p in box.peek()] == [2, 3]
+        box.close()
@@ -0,0 +1,41 @@
+"""
+Tests for the shared upload payload builder.
+"""
+
+from acquisition import Reading
+from payload import add_acquisition, build_payload, describe
+
+
+class TestBuildPayload:
+    def test_timestamp(self):
+        assert build_payload(None, None, None, None, None, timestamp=1717000000.7) == {
+            'timestamp': 1717000000}
+
+    def test_both_sensors(self):
+        data = build_payload(22.14, 55.3, 1013.25, 18.4, 70.0, timestamp=0)
+        assert data['temperature'] == data['temperature_indoor'] == 22.1
+        assert data['temperature_outdoor'] == 18.4
+        assert data['pressure'] == data['pressure_indoor'] == 1013.2
+        assert data['sensor_indoor'] == 'ENV3'
+        assert data['sensor_outdoor'] == 'DHT22'
+
+    def test_outdoor_becomes_primary(self):
+        data = build_payload(None, None, None, 15.5, 80.0, timestamp=0)
+        assert data['temperature'] == 15.5
+        assert 'temperature_indoor' not in data
+
+    def test_describe(self):
+        data = build_payload(22.1, 55.3, 1013.2, 18.4, 70.0, timestamp=0)
+        assert describe(data) == (
+            "Indoor(ENV3): 22.1°C, 55.3% | Pressure: 1013.2hPa | Outdoor(DHT22): 18.4°C, 70.0%")
+
+
+class TestAcquisition:
+    def test_acquired_age_and_marks(self):
+        readings = {'sht30': Reading((22.1, 55.3), 10 * 10**9, 1717000000123456789),
+                    'dht22': Reading((18.4, 70.0), 4 * 10**9, 1717000000000000000)}
+        data = add_acquisition(build_payload(22.1, 55.3, None, 18.4, 70.0, timestamp=0), readings,
+                               now_ns=10_250 * 10**6, cached=['dht22'], stale=[])
+        assert data['acquired'] == {'sht30': 1717000000123, 'dht22': 1717000000000}
+        assert data['age'] == {'sht30': 0.25, 'dht22': 6.25}
+        assert data['cached'] == ['dht22'] and 'stale' not in data
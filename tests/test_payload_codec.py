@@ -0,0 +1,81 @@
+"""
+Tests for the compact binary payload encoding.
+"""
+
+import json
+
+import pytest
+
+from payload import build_payload
+from payload_codec import (MEDIA_TYPE, RECORD, SCHEMA_VERSION, accepts_binary, decode_record,
+                           decode_records, encode_record, encode_records)
+
+
+class TestRecord:
+    @pytest.mark.parametrize('args', [
+        (22.34, 45.67, 1013.25, 5.5, 80.1),
+        (22.3, 45.6, None, None, None),
+        (None, None, None, -12.3, 99.9),
+        (None, None, 987.6, 3.0, 60.0),
+        (None, None, None, None, None),
+    ])
+    def test_round_trip_matches_build_payload(self, args):
+        data = build_payload(*args, timestamp=1760000000)
+        record = encode_record(data)
+        assert len(record) == RECORD.size == 16
+        assert record[0] == SCHEMA_VERSION
+        assert decode_record(record) == data
+
+    def test_much_smaller_than_json(self):
+        data = build_payload(22.3, 45.6, 1013.2, 5.5, 80.1, timestamp=1760000000)
+        assert len(encode_record(data)) * 10 < len(json.dumps(data))
+
+    def test_foreign_field_rejected(self):
+        data = build_payload(22.3, 45.6, None, None, None, timestamp=1)
+        data['dew_point'] = 9.8
+        with pytest.raises(ValueError):
+            encode_record(data)
+
+    def test_acquisition_details_left_out(self):
+        data = build_payload(22.3, 45.6, 1013.2, None, None, timestamp=1760000000)
+        plain = dict(data)
+        data.update({'acquired': {'sht30': 1759999999950}, 'age': {'sht30': 0.05}})
+        assert decode_record(encode_record(data)) == plain
+
+    @pytest.mark.parametrize('mark', ['cached', 'stale'])
+    def test_cached_or_stale_does_not_fit(self, mark):
+        data = build_payload(22.3, 45.6, 1013.2, 5.5, 80.1, timestamp=1760000000)
+        data.update({'acquired': {'dht22': 1759999900000}, 'age': {'dht22': 100.0}, mark: ['dht22']})
+        with pytest.raises(ValueError):
+            encode_record(data)
+
+    def test_out_of_range_rejected(self):
+        data = build_payload(22.3, 45.6, 7000.0, None, None, timestamp=1)
+        with pytest.raises(ValueError):
+            encode_record(data)
+
+    def test_unknown_version_rejected(self):
+        record = bytearray(encode_record(build_payload(22.3, 45.6, None, None, None, timestamp=1)))
+        record[0] = 99
+        with pytest.raises(ValueError):
+            decode_record(bytes(record))
+
+
+class TestBatch:
+    def test_records_round_trip(self):
+        payloads = [build_payload(20 + i, 50, 1000 + i, None, None, timestamp=i) for i in range(3)]
+        body = encode_records(payloads)
+        assert len(body) == 3 * RECORD.size
+        assert decode_records(body) == payloads
+
+    def test_truncated_batch_rejected(self):
+        body = encode_records([build_payload(20, 50, None, None, None, timestamp=1)])
+        with pytest.raises(ValueError):
+            decode_records(body[:-1])
+
+
+class TestNegotiation:
+    def test_accept_post(self):
+        assert accepts_binary(f"application/json, {MEDIA_TYPE}; q=0.9")
+        assert not accepts_binary("application/json")
+        assert not accepts_binary(None)
@@ -0,0 +1,202 @@
+"""
+Tests for the QMP6988 driver: OTP parsing, fixed-point compensation against
+the datasheet's floating-point formula, and calibration loading.
+"""
+
+import random
+
+import pytest
+
+from qmp6988 import (
+    MEASUREMENT_PROFILES, QMP6988, Profile,
+    REG_CTRL_MEAS, REG_DATA, REG_IIR, REG_IO_SETUP, REG_OTP, REG_STATUS, STANDBY_TIME,
+    compensate, compensate_pressure, compensate_temperature, conversion_time,
+    parse_calibration,
+)
+
+# Floating-point conversion factors (A, S) from the datasheet: k = A + S * OTP / 32767
+FLOAT_FACTORS = {
+    'a1': (-6.30E-03, 4.30E-04, 20), 'a2': (-1.90E-11, 1.20E-10, 22),
+    'bt1': (1.00E-01, 9.10E-02, 2), 'bt2': (1.20E-08, 1.20E-06, 4),
+    'bp1': (3.30E-02, 1.90E-02, 6), 'b11': (2.10E-07, 1.40E-07, 8),
+    'bp2': (-6.30E-10, 3.50E-10, 10), 'b12': (2.90E-13, 7.60E-13, 12),
+    'b21': (2.10E-15, 1.20E-14, 14), 'bp3': (1.30E-16, 7.90E-17, 16),
+}
+
+
+def _s16(otp, i):
+    value = (otp[i] << 8) | otp[i + 1]
+    return value - 0x10000 if value & 0x8000 else value
+
+
+def _float_reference(otp, dt, dp):
+    k = {name: a + s * _s16(otp, i) / 32767 for name, (a, s, i) in FLOAT_FACTORS.items()}
+    cal = parse_calibration(otp)
+    tr = cal['a0'] / 16 + k['a1'] * dt + k['a2'] * dt * dt
+    tx = compensate_temperature(cal, dt)
+    pr = (cal['b00'] / 16 + k['bt1'] * tx + k['bp1'] * dp + k['b11'] * tx * dp
+          + k['bt2'] * tx * tx + k['bp2'] * dp * dp + k['b12'] * dp * tx * tx
+          + k['b21'] * dp * dp * tx + k['bp3'] * dp ** 3)
+    return tr, pr
+
+
+class FakeBus:
+    def __init__(self, otp, data=(0x80, 0, 0, 0x80, 0, 0), chip_id=0x5C, busy_polls=0):
+        self.otp = list(otp)
+        self.data = list(data)
+        self.chip_id = chip_id
+        self.busy_polls = busy_polls
+        self.writes = []
+        self.otp_reads = 0
+        self.data_reads = 0
+
+    def read_byte_data(self, addr, reg):
+        if reg == REG_STATUS:
+            if self.busy_polls:
+                self.busy_polls -= 1
+                return 0x08
+            return 0x00
+        return self.chip_id
+
+    def read_i2c_block_data(self, addr, reg, length):
+        if reg == REG_OTP:
+            self.otp_reads += 1
+            return self.otp[:length]
+        assert reg == REG_DATA and length == 6
+        self.data_reads += 1
+        return self.data
+
+    def write_byte_data(self, addr, reg, value):
+        self.writes.append((reg, value))
+
+
+def _otp(seed=7):
+    rng = random.Random(seed)
+    return [rng.randrange(256) for _ in range(25)]
+
+
+class TestCalibration:
+    def test_sign_extension(self):
+        otp = [0] * 25
+        otp[0], otp[1], otp[24] = 0xFF, 0xFF, 0xF0  # b00 = -1 (20-bit)
+        otp[18], otp[19] = 0x7F, 0xFF                # a0 large positive
+        cal = parse_calibration(otp)
+        assert cal['b00'] == -1
+        assert cal['a0'] == 0x7FFF0
+
+    def test_wrong_length(self):
+        with pytest.raises(ValueError):
+            parse_calibration([0] * 24)
+
+    def test_fixed_point_matches_float_formula(self):
+        rng = random.Random(11)
+        for seed in range(50):
+            otp = _otp(seed)
+            cal = parse_calibration(otp)
+            dt = rng.randrange(-3_000_000, 3_000_000)
+            dp = rng.randrange(-4_000_000, 4_000_000)
+            tr, pr = _float_reference(otp, dt, dp)
+            assert abs(compensate_temperature(cal, dt) - tr) <= 2
+            tx = compensate_temperature(cal, dt)
+            assert abs(compensate_pressure(cal, dp, tx) / 16 - pr) <= 10 + 1e-4 * abs(pr)
+
+    def test_compensate_units(self):
+        cal = parse_calibration(_otp())
+        pressure, temperature = compensate(cal, [0x80, 0, 0, 0x80, 0, 0])
+        assert pressure == compensate_pressure(cal, 0, compensate_temperature(cal, 0)) / 1600
+        assert temperature == compensate_temperature(cal, 0) / 256
+
+
+class TestQMP6988:
+    def test_otp_read_once(self):
+        bus = FakeBus(_otp())
+        sensor = QMP6988(bus)
+        sensor.read()
+        sensor.read()
+        assert bus.otp_reads == 1
+        assert sensor.calibration == parse_calibration(_otp())
+
+    def test_start_enters_normal_mode(self):
+        bus = FakeBus(_otp())
+        QMP6988(bus).start(Profile(osrs_t=1, osrs_p=4, iir=0, mode=0x03))
+        assert (REG_CTRL_MEAS, (1 << 5) | (3 << 2) | 0x03) in bus.writes
+
+    def test_refresh_rereads_otp(self):
+        bus = FakeBus(_otp(1))
+        sensor = QMP6988(bus)
+        sensor.read()
+        bus.otp = _otp(2)  # unit swapped under the same bus and address
+        sensor.load_calibration(refresh=True)
+        assert bus.otp_reads == 2
+        assert sensor.calibration == parse_calibration(_otp(2))
+
+    def test_wrong_chip_id(self):
+        with pytest.raises(OSError):
+            QMP6988(FakeBus(_otp(), chip_id=0x58)).read()
+
+
+class TestProfiles:
+    def _sensor(self, profile, **kw):
+        slept = []
+        bus = FakeBus(_otp(), **kw)
+        sensor = QMP6988(bus, profile=profile, sleep=slept.append)
+        return sensor, bus, slept
+
+    def test_all_profiles_valid(self):
+        for name in MEASUREMENT_PROFILES:
+            sensor, bus, _ = self._sensor(name)
+            sensor.read()
+            assert sensor.started
+
+    def test_fast_profile_is_sub_10ms(self):
+        p = MEASUREMENT_PROFILES['fast']
+        assert conversion_time(p.osrs_t, p.osrs_p) < 0.010
+
+    def test_profiles_ordered_by_conversion_time(self):
+        times = {name: conversion_time(p.osrs_t, p.osrs_p)
+                 for name, p in MEASUREMENT_PROFILES.items()}
+        assert times['fast'] < times['balanced'] < times['storm-watch']
+
+    def test_balanced_registers(self):
+        sensor, bus, slept = self._sensor('balanced')
+        sensor.start()
+        assert (REG_IIR, 2) in bus.writes
+        assert (REG_CTRL_MEAS, (1 << 5) | (4 << 2) | 0x03) in bus.writes
+        assert (REG_IO_SETUP, 0) in bus.writes
+        assert slept == [sensor.conversion_time + STANDBY_TIME]
+
+    def test_normal_mode_start_does_not_poll_status(self):
+        # Converting back to back: the measuring bit is (almost) always set
+        sensor, bus, slept = self._sensor('balanced', busy_polls=100)
+        sensor.start()
+        assert sensor.started and bus.busy_polls == 100
+
+    def test_normal_mode_read_does_not_wait(self):
+        sensor, bus, slept = self._sensor('fast')
+        sensor.start()
+        slept.clear()
+        sensor.read()
+        sensor.read()
+        assert slept == []
+
+    def test_forced_mode_triggers_each_read(self):
+        sensor, bus, slept = self._sensor('low-power')
+        sensor.read()
+        sensor.read()
+        forced = (1 << 5) | (3 << 2) | 0x01
+        assert bus.writes.count((REG_CTRL_MEAS, forced)) == 2
+        assert slept == [sensor.conversion_time] * 2
+
+    def test_polls_status_until_ready(self):
+        sensor, bus, slept = self._sensor('low-power', busy_polls=2)
+        sensor.read()
+        assert slept == [sensor.conversion_time, 0.001, 0.001]
+
+    def test_stuck_conversion_raises(self):
+        sensor, bus, slept = self._sensor('low-power', busy_polls=100)
+        with pytest.raises(OSError):
+            sensor.read()
+
+    def test_unknown_profile(self):
+        with pytest.raises(ValueError):
+            QMP6988(FakeBus(_otp()), profile='turbo')
@@ -0,0 +1,108 @@
+"""
+Tests for dead-band reporting and the local full-resolution reading log.
+"""
+
+import json
+
+from payload import build_payload
+from reporting import DeadbandPolicy, ReadingLog, flatten
+
+
+def _payload(t_in=21.0, h_in=45.0, pressure=1013.0, t_out=None, h_out=None):
+    return build_payload(t_in, h_in, pressure, t_out, h_out, timestamp=0)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDeadbandPolicy:
+    def test_first_reading_reported(self):
+        assert DeadbandPolicy().should_report(_payload())
+
+    def test_small_changes_suppressed(self):
+        policy = DeadbandPolicy(clock=FakeClock())
+        assert policy.should_report(_payload())
+        assert not policy.should_report(_payload(h_in=45.4, pressure=1013.1))
+        assert policy.stats()['suppressed'] == 1
+
+    def test_change_at_deadband_reported(self):
+        policy = DeadbandPolicy(clock=FakeClock())
+        policy.should_report(_payload(t_in=21.0))
+        # 21.1 - 21.0 is 0.10000000000000142 or 0.0999... in floats; both count
+        assert policy.should_report(_payload(t_in=21.1))
+        assert policy.changed(_payload(t_in=21.1, pressure=1013.2)) == ['pressure']
+
+    def test_drift_measured_from_last_report(self):
+        policy = DeadbandPolicy(clock=FakeClock())
+        policy.should_report(_payload(pressure=1013.0))
+        assert not policy.should_report(_payload(pressure=1013.1))
+        # 0.1 + 0.1 of creep since the last upload crosses the 0.2 hPa band
+        assert policy.should_report(_payload(pressure=1013.2))
+
+    def test_heartbeat(self):
+        clock = FakeClock()
+        policy = DeadbandPolicy(heartbeat=600, clock=clock)
+        policy.should_report(_payload())
+        clock.now = 599
+        assert not policy.should_report(_payload())
+        clock.now = 600
+        assert policy.should_report(_payload())
+        assert policy.heartbeats == 1
+        clock.now = 601
+        assert not policy.should_report(_payload())
+
+    def test_heartbeat_due(self):
+        clock = FakeClock()
+        policy = DeadbandPolicy(heartbeat=600, clock=clock)
+        assert policy.heartbeat_due()
+        policy.should_report(_payload())
+        clock.now = 530
+        assert not policy.heartbeat_due() and not policy.heartbeat_due(within=60)
+        clock.now = 540
+        assert policy.heartbeat_due(within=60) and not policy.heartbeat_due()
+
+    def test_sensor_appearing_or_dropping_out_reported(self):
+        policy = DeadbandPolicy(clock=FakeClock())
+        policy.should_report(_payload())
+        assert policy.should_report(_payload(t_out=10.0, h_out=80.0))
+        assert policy.should_report(_payload())
+
+    def test_nested_payload_with_dotted_keys(self):
+        policy = DeadbandPolicy({'indoor.temperature': 0.1}, clock=FakeClock())
+        assert policy.should_report({'timestamp': 1, 'indoor': {'temperature': 20.0}})
+        assert not policy.should_report({'timestamp': 2, 'indoor': {'temperature': 20.04}})
+        assert policy.should_report({'timestamp': 3, 'indoor': {'temperature': 20.2}})
+
+    def test_steady_indoor_cuts_volume(self):
+        clock = FakeClock()
+        policy = DeadbandPolicy(heartbeat=600, clock=clock)
+        # An hour of near-constant indoor readings at one per minute
+        for minute in range(60):
+            clock.now = minute * 60
+            policy.should_report(_payload(t_in=21.01 + (minute % 2) * 0.03, pressure=1013.0))
+        assert policy.stats()['reduction'] >= 5
+
+
+class TestFlatten:
+    def test_flatten(self):
+        assert flatten({'a': 1, 'b': {'c': 2, 'd': {'e': 3}}}) == {'a': 1, 'b.c': 2, 'b.d.e': 3}
+
+
+class TestReadingLog:
+    def test_one_file_per_day(self, tmp_path):
+        log = ReadingLog(str(tmp_path / 'readings'))
+        day = 1760000000
+        log.append({'timestamp': day, 'temperature_indoor': 21.234567})
+        log.append({'timestamp': day + 60, 'temperature_indoor': 21.25})
+        log.append({'timestamp': day + 86400, 'temperature_indoor': 20.0})
+        log.close()
+        files = sorted((tmp_path / 'readings').iterdir())
+        assert len(files) == 2
+        first = [json.loads(line) for line in files[0].read_text().splitlines()]
+        assert first[0]['temperature_indoor'] == 21.234567
+        assert log.written == 3
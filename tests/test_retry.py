@@ -0,0 +1,205 @@
+"""
+Tests for upload retry, backoff and the circuit breaker, partly against the
+local stand-in server with injected 429/5xx/latency.
+"""
+
+import email.utils
+
+import pytest
+import requests
+
+from outbox import Outbox
+from retry import (CLOSED, HALF_OPEN, OPEN, REJECTED, CircuitBreaker, UploadRetry, full_jitter,
+                   parse_retry_after)
+from tests.stand_in_server import StandInServer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def _retry(clock, **kw):
+    kw.setdefault('rng', lambda: 1.0)
+    kw.setdefault('log', lambda msg: None)
+    return UploadRetry(sleep=clock.sleep, clock=clock, **kw)
+
+
+class TestBackoff:
+    def test_full_jitter_bounds(self):
+        assert full_jitter(0, 1.0, 60.0, rng=lambda: 1.0) == 1.0
+        assert full_jitter(3, 1.0, 60.0, rng=lambda: 1.0) == 8.0
+        assert full_jitter(10, 1.0, 60.0, rng=lambda: 1.0) == 60.0
+        assert full_jitter(3, 1.0, 60.0, rng=lambda: 0.25) == 2.0
+
+    def test_parse_retry_after(self):
+        assert parse_retry_after('7') == 7.0
+        assert parse_retry_after(None) is None
+        assert parse_retry_after('soon') is None
+        date = email.utils.formatdate(1000.0 + 30, usegmt=True)
+        assert parse_retry_after(date, now=1000.0) == 30.0
+
+
+class TestCircuitBreaker:
+    def test_opens_after_threshold_and_probes(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60, jitter=0, clock=clock)
+        for _ in range(3):
+            assert breaker.allow()
+            breaker.record_failure()
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+        clock.now = 60
+        assert breaker.allow()
+        assert breaker.state == HALF_OPEN
+        # Only one probe at a time
+        assert not breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CLOSED
+        assert breaker.stats()['opened'] == 1 and breaker.stats()['rejected'] == 2
+
+    def test_failed_probe_reopens(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, jitter=0.5,
+                                 clock=clock, rng=lambda: 1.0)
+        breaker.record_failure()
+        assert breaker.open_until == 15
+        clock.now = 15
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == OPEN and breaker.opened == 2
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = ''
+
+
+class TestUploadRetry:
+    def test_retries_5xx_with_backoff(self):
+        clock = FakeClock()
+        answers = iter([FakeResponse(500), FakeResponse(502), FakeResponse(200)])
+        retry = _retry(clock, attempts=3, base_delay=1.0)
+        assert retry.send(lambda: next(answers))
+        # rng=1.0: 1 s then 2 s
+        assert clock.now == 3.0
+        assert retry.retries == 2 and retry.successes == 1
+
+    def test_honours_retry_after(self):
+        clock = FakeClock()
+        answers = iter([FakeResponse(429, {'Retry-After': '20'}), FakeResponse(200)])
+        retry = _retry(clock, attempts=3)
+        assert retry.send(lambda: next(answers))
+        assert clock.now == 20.0
+        assert retry.retry_after_waits == 1
+
+    def test_long_retry_after_holds_breaker(self):
+        clock = FakeClock()
+        retry = _retry(clock, attempts=3, max_retry_after=60)
+        assert not retry.send(lambda: FakeResponse(503, {'Retry-After': '600'}))
+        assert retry.breaker.state == OPEN
+        assert retry.breaker.open_until == 600
+        calls = []
+        assert not retry.send(lambda: calls.append(1))
+        assert calls == [] and retry.short_circuits == 1
+
+    def test_client_error_not_retried(self):
+        clock = FakeClock()
+        calls = []
+        retry = _retry(clock)
+        assert not retry.send(lambda: calls.append(1) or FakeResponse(400))
+        assert len(calls) == 1
+        assert retry.breaker.consecutive_failures == 0
+
+    def test_client_error_reported_as_rejected(self):
+        retry = _retry(FakeClock())
+        assert retry.send(lambda: FakeResponse(422)) is REJECTED
+        assert retry.send(lambda: FakeResponse(500)) is False
+        assert retry.stats()['rejections'] == 1
+
+    @pytest.mark.parametrize('status', [401, 403, 404, 408, 409, 425])
+    def test_server_side_client_error_is_a_failure(self, status):
+        retry = _retry(FakeClock(), attempts=2)
+        assert retry.send(lambda: FakeResponse(status)) is False
+        assert retry.retries == 1 and retry.rejections == 0
+        assert retry.breaker.consecutive_failures == 2
+
+    def test_forbidden_keeps_backlog(self, tmp_path):
+        clock = FakeClock()
+        box = Outbox(str(tmp_path / 'outbox.db'))
+        for i in range(500):
+            box.append({'n': i})
+        retry = _retry(clock, breaker=CircuitBreaker(failure_threshold=5, jitter=0, clock=clock))
+        for _ in range(3):  # one drain per upload cycle
+            assert box.drain(lambda payload: retry.send(lambda: FakeResponse(403))) == 0
+        assert len(box) == 500 and box.rejected == 0
+        assert retry.breaker.state == OPEN and retry.short_circuits == 2
+        box.close()
+
+    def test_breaker_stops_hammering(self):
+        clock = FakeClock()
+        calls = []
+
+        def down():
+            calls.append(clock.now)
+            raise requests.ConnectionError("refused")
+
+        retry = _retry(clock, attempts=3, breaker=CircuitBreaker(failure_threshold=5, reset_timeout=300,
+                                                                 jitter=0, clock=clock))
+        for _ in range(10):
+            retry.send(down)
+        # 3 + 2 attempts open the breaker; everything after is short-circuited
+        assert len(calls) == 5
+        assert retry.stats()['breaker_state'] == OPEN
+        clock.now += 300
+        retry.send(down)
+        assert len(calls) == 6
+
+
+class TestAgainstStandInServer:
+    def _post(self, server, timeout=5):
+        return lambda: requests.post(server.url, json={'n': 1}, timeout=timeout)
+
+    def test_recovers_from_injected_5xx(self):
+        with StandInServer() as server:
+            server.inject(503, times=2)
+            retry = UploadRetry(attempts=3, base_delay=0.01, log=lambda m: None)
+            assert retry.send(self._post(server))
+            assert server.received == [{'n': 1}]
+            assert len(server.requests) == 3
+
+    def test_injected_429_retry_after(self):
+        slept = []
+        with StandInServer() as server:
+            server.inject(429, headers={'Retry-After': '1'})
+            retry = UploadRetry(attempts=2, base_delay=0.01, sleep=slept.append, log=lambda m: None)
+            assert retry.send(self._post(server))
+        assert slept == [1.0]
+
+    def test_injected_latency_times_out(self):
+        with StandInServer() as server:
+            server.inject(200, delay=0.5)
+            retry = UploadRetry(attempts=2, base_delay=0.01, log=lambda m: None)
+            assert retry.send(self._post(server, timeout=0.2))
+            # First attempt timed out, second went through
+            assert retry.retries == 1
+            assert retry.last_rtt < 0.2
+
+    @pytest.mark.parametrize('status', [500, 502, 504])
+    def test_breaker_opens_on_persistent_5xx(self, status):
+        with StandInServer() as server:
+            server.inject(status, times=10)
+            breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+            retry = UploadRetry(breaker=breaker, attempts=1, log=lambda m: None)
+            results = [retry.send(self._post(server)) for _ in range(4)]
+            assert results == [False] * 4
+            assert len(server.requests) == 2
+            assert breaker.state == OPEN
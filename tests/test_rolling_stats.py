@@ -0,0 +1,96 @@
+"""
+Tests for the streaming rolling-window statistics.
+"""
+
+import random
+import statistics
+
+import pytest
+
+from rolling_stats import RollingStats, RollingWindow
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRollingWindow:
+    def test_matches_rescan(self):
+        rng = random.Random(3)
+        window = RollingWindow(span=60)
+        samples = []
+        for i in range(2000):
+            t, x = i * 7.0, rng.gauss(20, 3)
+            window.add(t, x)
+            samples.append((t, x))
+            current = [v for s, v in samples if s > t - 60]
+            assert len(window) == len(current)
+            assert window.mean == pytest.approx(statistics.fmean(current))
+            assert window.min == min(current) and window.max == max(current)
+            if len(current) > 1:
+                assert window.variance == pytest.approx(statistics.variance(current), rel=1e-6, abs=1e-9)
+
+    def test_empty_and_single(self):
+        window = RollingWindow(span=10)
+        assert window.summary() == {'count': 0, 'mean': None, 'std': None, 'min': None, 'max': None}
+        window.add(0, 5.0)
+        assert window.summary() == {'count': 1, 'mean': 5.0, 'std': None, 'min': 5.0, 'max': 5.0}
+
+    def test_expire_without_new_samples(self):
+        window = RollingWindow(span=10)
+        window.add(0, 1.0)
+        window.add(5, 3.0)
+        window.expire(12)
+        assert window.summary()['count'] == 1 and window.mean == 3.0 and window.min == 3.0
+        window.expire(20)
+        assert len(window) == 0 and window.mean is None and window.max is None
+
+    def test_min_max_deques_stay_small(self):
+        window = RollingWindow(span=1000)
+        for i in range(500):
+            window.add(i, float(i))  # increasing: max deque keeps one entry
+        assert len(window._max) == 1 and len(window._min) == 500
+
+
+class TestRollingStats:
+    def test_windows_per_field(self):
+        clock = FakeClock()
+        stats = RollingStats(clock=clock)
+        for minute in range(120):
+            clock.now = minute * 60.0
+            stats.update({'timestamp': 1, 'temperature_indoor': float(minute), 'sensor_indoor': 'ENV3',
+                          'pressure': None})
+        summary = stats.stats('temperature_indoor')
+        assert summary['1m']['count'] == 1 and summary['1m']['mean'] == 119.0
+        assert summary['10m']['count'] == 10 and summary['10m']['min'] == 110.0
+        assert summary['1h']['count'] == 60 and summary['1h']['mean'] == pytest.approx(89.5)
+        assert summary['24h']['count'] == 120
+        assert set(stats.stats()) == {'temperature_indoor'}
+
+    def test_query_expires_idle_fields(self):
+        clock = FakeClock()
+        stats = RollingStats(windows={'1m': 60}, clock=clock)
+        stats.update({'humidity_outdoor': 80.0})
+        clock.now = 61
+        assert stats.stats('humidity_outdoor')['1m']['count'] == 0
+        assert stats.payload_fields(windows=('1m',)) == {}
+
+    def test_nested_and_field_filter(self):
+        stats = RollingStats(fields=['indoor.temperature'], clock=FakeClock())
+        stats.update({'indoor': {'temperature': 21.0, 'humidity': 40.0}})
+        assert list(stats.stats()) == ['indoor.temperature']
+
+    def test_payload_fields(self):
+        clock = FakeClock()
+        stats = RollingStats(clock=clock)
+        for i, value in enumerate([1.0, 2.0, 4.0]):
+            clock.now = i
+            stats.update({'pressure': value})
+        assert stats.payload_fields() == {
+            'pressure_1h_mean': 2.33, 'pressure_1h_min': 1.0, 'pressure_1h_max': 4.0}
+        assert stats.payload_fields(windows=('1m', '24h'), keys=('std',), digits=1) == {
+            'pressure_1m_std': 1.5, 'pressure_24h_std': 1.5}
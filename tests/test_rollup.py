@@ -0,0 +1,103 @@
+"""
+Tests for the multi-resolution rollups.
+"""
+
+import pytest
+
+from rollup import Rollup
+
+DAY = 86400
+T0 = 1760000000 - 1760000000 % DAY  # midnight UTC
+
+
+def _rollup(tmp_path, **kw):
+    return Rollup(str(tmp_path / 'rollup.db'), **kw)
+
+
+class TestRollup:
+    def test_tiers_aggregate(self, tmp_path):
+        rollup = _rollup(tmp_path)
+        for second in range(0, 7200, 10):
+            rollup.add(T0 + second, {'pressure': 1000.0 + second // 60, 'sensor_indoor': 'ENV3'})
+        tier, rows = rollup.query('pressure', T0, T0 + 7200, resolution=60)
+        assert tier == '1m' and len(rows) == 120
+        assert rows[0] == {'start': T0, 'count': 6, 'mean': 1000.0, 'min': 1000.0, 'max': 1000.0, 'last': 1000.0}
+        tier, rows = rollup.query('pressure', T0, T0 + 7200, resolution=3600)
+        assert tier == '1h' and [r['count'] for r in rows] == [360, 360]
+        assert rows[0]['min'] == 1000.0 and rows[0]['max'] == 1059.0
+        assert rows[0]['mean'] == pytest.approx(1029.5) and rows[1]['last'] == 1119.0
+
+    def test_coarsest_tier_for_long_ranges(self, tmp_path):
+        rollup = _rollup(tmp_path)
+        for minute in range(0, 3 * 24 * 60, 30):
+            rollup.add(T0 + minute * 60, {'temperature_indoor': 20.0})
+        tier, rows = rollup.query('temperature_indoor', T0, T0 + DAY // 2)
+        assert tier == '1m' and len(rows) == 24
+        tier, rows = rollup.query('temperature_indoor', T0, T0 + 30 * DAY)
+        assert tier == '1h' and len(rows) == 72
+        tier, rows = rollup.query('temperature_indoor', T0, T0 + 3 * 365 * DAY)
+        assert tier == '1d' and [r['count'] for r in rows] == [48, 48, 48]
+        assert rollup.tier_for(1)[0] == '1m'
+
+    def test_tiers_agree_after_restart_without_close(self, tmp_path):
+        rollup = _rollup(tmp_path)
+        for minute in range(50):
+            rollup.add(T0 + minute * 60, {'pressure': 1000.0})
+        rollup = _rollup(tmp_path)  # crashed: no close(), open buckets lost
+        for minute in range(50, 60):
+            rollup.add(T0 + minute * 60, {'pressure': 1000.0})
+        _, minutes = rollup.query('pressure', T0, T0 + 3600, resolution=60)
+        _, hours = rollup.query('pressure', T0, T0 + 3600, resolution=3600)
+        _, days = rollup.query('pressure', T0, T0 + DAY, resolution=DAY)
+        # Only the open minute 49 was lost, in every tier alike
+        assert len(minutes) == 59 and sum(r['count'] for r in minutes) == 59
+        assert [r['count'] for r in hours] == [59] and [r['count'] for r in days] == [59]
+
+    def test_retention_per_tier(self, tmp_path):
+        tiers = (('1m', 60, 600), ('1h', 3600, 10 * DAY))
+        rollup = _rollup(tmp_path, tiers=tiers)
+        for minute in range(120):
+            rollup.add(T0 + minute * 60, {'humidity_indoor': 50.0})
+        rollup.flush()
+        rows = rollup.stats()['rows']
+        assert rows['1m'] <= 11 and rows['1h'] == 2
+        tier, rows = rollup.query('humidity_indoor', T0 + 7200 - 600, T0 + 7200, resolution=60)
+        assert tier == '1m' and rows[0]['start'] >= T0 + 7200 - 660
+        # The minute tier no longer reaches back to T0: fall back to hours
+        tier, rows = rollup.query('humidity_indoor', T0, T0 + 7200, resolution=60)
+        assert tier == '1h' and [r['count'] for r in rows] == [60, 60]
+
+    def test_long_query_skips_tiers_past_retention(self, tmp_path):
+        rollup = _rollup(tmp_path)
+        for hour in range(21 * 24):
+            rollup.add(T0 + hour * 3600, {'pressure': 1000.0})
+        end = T0 + 21 * DAY
+        assert rollup.query('pressure', end - DAY, end, resolution=60)[0] == '1m'
+        tier, rows = rollup.query('pressure', end - 20 * DAY, end, resolution=60)
+        assert tier == '1h' and len(rows) == 20 * 24
+        assert rollup.query('pressure', end - 20 * DAY, end, max_points=50000)[0] == '1h'
+        rollup.close()
+        assert _rollup(tmp_path).tier_for(60, end - 20 * DAY)[0] == '1h'
+
+    def test_resumes_open_bucket_after_restart(self, tmp_path):
+        rollup = _rollup(tmp_path)
+        rollup.add(T0, {'pressure': 1000.0})
+        rollup.close()
+        rollup = _rollup(tmp_path)
+        rollup.add(T0 + 30, {'pressure': 1002.0})
+        _, rows = rollup.query('pressure', T0, T0 + 60, resolution=60)
+        assert rows == [{'start': T0, 'count': 2, 'mean': 1001.0, 'min': 1000.0, 'max': 1002.0, 'last': 1002.0}]
+
+    def test_late_reading_folded_into_stored_bucket(self, tmp_path):
+        rollup = _rollup(tmp_path)
+        rollup.add(T0, {'pressure': 1000.0})
+        rollup.add(T0 + 120, {'pressure': 1001.0})
+        rollup.add(T0 + 10, {'pressure': 998.0})
+        _, rows = rollup.query('pressure', T0, T0 + 60, resolution=60)
+        assert rows[0]['count'] == 2 and rows[0]['min'] == 998.0
+
+    def test_field_filter_and_nested(self, tmp_path):
+        rollup = _rollup(tmp_path, fields=['indoor.temperature'])
+        rollup.add(T0, {'indoor': {'temperature': 21.0, 'humidity': 40.0}})
+        assert rollup.query('indoor.temperature', T0, T0 + 60)[1][0]['last'] == 21.0
+        assert rollup.query('indoor.humidity', T0, T0 + 60)[1] == []
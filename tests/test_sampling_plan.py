@@ -0,0 +1,148 @@
+"""
+Tests for the multi-rate sampling plan.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from acquisition import Reading
+from hampel import HampelStage
+from sampling_plan import SamplingPlan, average
+from station_engine import StationEngine
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestAverage:
+    def test_numbers_and_tuples(self):
+        assert average([1.0, None, 3.0]) == 2.0
+        assert average([(20.0, 40.0), (None, None), (22.0, None)]) == (21.0, 40.0)
+        assert average([None, None]) is None
+        assert average([]) is None
+
+
+class TestPlannedSensor:
+    def test_window_mean_published_at_output_cadence(self):
+        clock = FakeClock()
+        values = iter(range(100))
+        plan = SamplingPlan(clock=clock, wall_clock=clock)
+        sensor = plan.add('p', lambda: float(next(values)), period=10, window=60, output=60)
+        published = []
+        for step in range(13):
+            clock.now = step * 10.0
+            published.append(sensor.sample())
+        # First sample publishes at once, then once a minute: mean of samples in (t-60, t]
+        assert published[:6] == [0.0] * 6
+        assert published[6] == pytest.approx(sum(range(1, 7)) / 6)
+        assert published[12] == pytest.approx(sum(range(7, 13)) / 6)
+        assert sensor.stats()['outputs'] == 3 and sensor.stats()['in_window'] == 6
+
+    def test_window_of_one_period_does_not_average_under_jitter(self):
+        clock = FakeClock()
+        values = iter([10.0, 20.0, 30.0])
+        plan = SamplingPlan(clock=clock, wall_clock=clock)
+        sensor = plan.add('dht22', lambda: next(values), period=60)
+        published = []
+        for now in (0.002, 60.001, 120.003):
+            clock.now = now
+            published.append(sensor.sample())
+        assert published == [10.0, 20.0, 30.0]
+
+    def test_filter_sees_raw_samples_before_averaging(self):
+        clock = FakeClock()
+        values = iter([20.0, 20.1, 20.0, 20.1, 35.0, 20.0, 20.1])
+        stage = HampelStage({'t': 0.2}, window=5)
+        plan = SamplingPlan(clock=clock, wall_clock=clock)
+        sensor = plan.add('p', lambda: next(values), period=10, window=60, output=60,
+                          filter=lambda v: stage.apply({'t': v})[0]['t'])
+        for step in range(7):
+            clock.now = step * 10.0
+            published = sensor.sample()
+        # The 35.0 spike was replaced by its median before it reached the mean
+        assert published == pytest.approx((20.1 + 20.0 + 20.1 + 20.05 + 20.0 + 20.1) / 6)
+        assert stage.replaced == 1
+
+    def test_min_interval_enforced(self):
+        clock = FakeClock()
+        reads = []
+        plan = SamplingPlan(clock=clock, wall_clock=clock)
+        sensor = plan.add('dht22', lambda: reads.append(clock.now) or (5.0, 80.0), period=2.5, min_interval=2.5)
+        sensor.sample()
+        clock.now = 1.0
+        assert sensor.sample() == (5.0, 80.0)
+        assert reads == [0.0] and sensor.stats()['too_soon'] == 1
+
+    def test_published_reading_stamped_by_newest_sample(self):
+        clock = FakeClock()
+        cache = [Reading(2.0, 100, 1000)]
+        plan = SamplingPlan(clock=clock, wall_clock=clock)
+        sensor = plan.add('p', lambda: cache[-1], period=10, window=60, output=20)
+        for step in range(3):
+            clock.now = step * 10.0
+            if step == 2:
+                cache.append(Reading(4.0, 300, 3000))
+            reading = sensor.acquire()
+        # The repeated cached sample is averaged once, not twice
+        assert reading == Reading(3.0, 300, 3000)
+        assert sensor.stats()['repeats'] == 1
+        assert plan.max_ages() == {'p': 30}
+
+    def test_invalid_plans(self):
+        plan = SamplingPlan()
+        with pytest.raises(ValueError):
+            plan.add('dht22', lambda: None, period=1, min_interval=2)
+        with pytest.raises(ValueError):
+            plan.add('a', lambda: None, period=10, output=5)
+        plan.add('b', lambda: None, period=1)
+        with pytest.raises(ValueError):
+            plan.add('b', lambda: None, period=1)
+
+
+class TestBusSharing:
+    def test_shared_bus_staggered_and_serialized(self):
+        active = []
+        overlaps = []
+        lock = threading.Lock()
+
+        def i2c_read():
+            with lock:
+                active.append(1)
+                if len(active) > 1:
+                    overlaps.append(1)
+            time.sleep(0.02)
+            with lock:
+                active.pop()
+            return 1.0
+
+        plan = SamplingPlan(stagger=0.01)
+        plan.add('sht30', i2c_read, period=0.1, bus='i2c-1')
+        plan.add('qmp6988', i2c_read, period=0.1, bus='i2c-1')
+        plan.add('dht22', lambda: (5.0, 80.0), period=0.2)
+        assert plan.rates() == {'sht30': (0.1, 0.0), 'qmp6988': (0.1, 0.01), 'dht22': (0.2, 0.0)}
+
+        uploads = []
+        engine = StationEngine(plan.sensors(), uploads.append, interval=0.2, rates=plan.rates(),
+                               log=lambda msg: None)
+        asyncio.run(engine.run(cycles=4))
+        engine.close()
+        assert overlaps == []
+        assert plan.stats()['sht30']['samples'] >= 5
+        assert uploads[-1] == {'sht30': 1.0, 'qmp6988': 1.0, 'dht22': (5.0, 80.0)}
+
+    def test_describe(self):
+        plan = SamplingPlan()
+        plan.add('sht30', lambda: None, period=5, window=60, output=60, bus='i2c-1')
+        plan.add('dht22', lambda: None, period=60, min_interval=2.5)
+        assert plan.describe() == [
+            "sht30: every 5s, mean of 60s, output every 60s, bus i2c-1 (+0s)",
+            "dht22: every 60s, mean of 60s, output every 60s, >= 2.5s apart",
+        ]
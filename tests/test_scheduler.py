@@ -0,0 +1,133 @@
+"""
+Tests for the wall-clock aligned schedules, on fake clocks.
+"""
+
+import asyncio
+
+import pytest
+
+from scheduler import Schedule
+
+WALL0 = 1760000040.0 + 17.25  # 17.25 s past a minute boundary
+
+
+class FakeClocks:
+    """Monotonic and wall clock advanced together by sleep()."""
+
+    def __init__(self, wall=WALL0, mono=1000.0):
+        self.mono = mono
+        self.offset = wall - mono
+        self.sleeps = []
+
+    def clock(self):
+        return self.mono
+
+    def wall(self):
+        return self.mono + self.offset
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.mono += seconds
+
+    def schedule(self, period, **kw):
+        return Schedule(period, clock=self.clock, wall_clock=self.wall, **kw)
+
+
+class TestSchedule:
+    def test_aligned_to_wall_clock(self):
+        clocks = FakeClocks()
+        schedule = clocks.schedule(60)
+        tick = schedule.wait_blocking(clocks.sleep)
+        assert clocks.sleeps == [pytest.approx(42.75)]
+        assert tick.wall_time % 60 == 0 and tick.skipped == 0
+        assert clocks.wall() == pytest.approx(tick.wall_time)
+
+    def test_offset(self):
+        clocks = FakeClocks()
+        tick = clocks.schedule(60, offset=5).wait_blocking(clocks.sleep)
+        assert tick.wall_time % 60 == 5
+
+    def test_work_does_not_stretch_period(self):
+        clocks = FakeClocks()
+        schedule = clocks.schedule(60)
+        times = []
+        for _ in range(5):
+            tick = schedule.wait_blocking(clocks.sleep)
+            times.append(tick.wall_time)
+            clocks.mono += 7.3  # read + upload time
+        assert [b - a for a, b in zip(times, times[1:])] == [60] * 4
+        assert schedule.stats()['late'] == 0
+
+    def test_overrun_within_grace_fires_late(self):
+        clocks = FakeClocks()
+        schedule = clocks.schedule(60, grace=10)
+        first = schedule.wait_blocking(clocks.sleep)
+        clocks.mono += 64  # ran 4 s into the next slot
+        tick = schedule.wait_blocking(clocks.sleep)
+        assert tick.index == first.index + 1 and tick.lateness == pytest.approx(4)
+        assert schedule.stats()['late'] == 1 and schedule.stats()['skipped'] == 0
+
+    def test_skipped_ticks_reported(self):
+        clocks = FakeClocks()
+        schedule = clocks.schedule(60, grace=1)
+        first = schedule.wait_blocking(clocks.sleep)
+        clocks.mono += 150  # slots +1 and +2 passed
+        tick = schedule.wait_blocking(clocks.sleep)
+        assert tick.index == first.index + 3 and tick.skipped == 2
+        assert tick.wall_time == first.wall_time + 180
+        assert schedule.stats()['skipped'] == 2
+
+    def test_slot_within_grace_after_skip_fires_late(self):
+        clocks = FakeClocks()
+        schedule = clocks.schedule(5, grace=0.5)
+        first = schedule.wait_blocking(clocks.sleep)
+        clocks.mono += 15.2  # 10.2 s past slot +1, 0.2 s past slot +3
+        sleeps = len(clocks.sleeps)
+        tick = schedule.wait_blocking(clocks.sleep)
+        assert tick.index == first.index + 3 and tick.skipped == 2
+        assert tick.lateness == pytest.approx(0.2) and len(clocks.sleeps) == sleeps
+        assert schedule.stats()['late'] == 1 and schedule.stats()['skipped'] == 2
+
+    def test_wall_clock_step_reanchors(self):
+        clocks = FakeClocks()
+        schedule = clocks.schedule(60)
+        schedule.wait_blocking(clocks.sleep)
+        clocks.offset += 3600 + 12.5  # NTP step
+        tick = schedule.wait_blocking(clocks.sleep)
+        assert tick.wall_time % 60 == 0 and clocks.wall() == pytest.approx(tick.wall_time)
+        assert schedule.stats()['resyncs'] == 1
+
+    @pytest.mark.parametrize('align', [True, False])
+    def test_backward_step_never_repeats_a_slot(self, align):
+        clocks = FakeClocks()
+        schedule = clocks.schedule(60, align=align)
+        ticks = [schedule.wait_blocking(clocks.sleep) for _ in range(3)]
+        clocks.offset -= 150.0  # NTP steps back two and a half slots
+        ticks += [schedule.wait_blocking(clocks.sleep) for _ in range(2)]
+        assert schedule.stats()['resyncs'] == 1
+        assert [t.index for t in ticks] == list(range(ticks[0].index, ticks[0].index + 5))
+        walls = [t.wall_time for t in ticks]
+        assert all(b - a == pytest.approx(60) for a, b in zip(walls, walls[1:]))
+        assert clocks.wall() == pytest.approx(walls[-1])
+
+    def test_unaligned_starts_now(self):
+        clocks = FakeClocks()
+        schedule = clocks.schedule(60, align=False)
+        tick = schedule.wait_blocking(clocks.sleep)
+        assert clocks.sleeps == [] and tick.wall_time == pytest.approx(WALL0)
+        schedule.wait_blocking(clocks.sleep)
+        assert clocks.sleeps == [pytest.approx(60)]
+
+    def test_async_wait_real_clock(self):
+        schedule = Schedule(0.05)
+
+        async def ticks():
+            return [await schedule.wait() for _ in range(3)]
+
+        result = asyncio.run(ticks())
+        assert [b.index - a.index for a, b in zip(result, result[1:])] == [1, 1]
+        assert all(abs(t.wall_time / 0.05 - round(t.wall_time / 0.05)) < 1e-6 for t in result)
+
+    def test_invalid_period(self):
+        with pytest.raises(ValueError):
+            Schedule(0)
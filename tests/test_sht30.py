@@ -0,0 +1,135 @@
+"""
+Tests for the SHT30 driver against a fake I2C bus.
+"""
+
+import pytest
+
+from sht30 import SHT30, FETCH_DATA, BREAK, crc8, decode
+
+
+def _frame(temp_raw, hum_raw):
+    t = [temp_raw >> 8, temp_raw & 0xFF]
+    h = [hum_raw >> 8, hum_raw & 0xFF]
+    return t + [crc8(t)] + h + [crc8(h)]
+
+
+class FakeMsg:
+    class _Read(list):
+        def __init__(self, addr, length):
+            super().__init__()
+            self.addr = addr
+            self.length = length
+
+    @staticmethod
+    def write(addr, data):
+        return ('write', addr, (data[0] << 8) | data[1])
+
+    @staticmethod
+    def read(addr, length):
+        return FakeMsg._Read(addr, length)
+
+
+class FakeBus:
+    """Records commands; answers reads from a queue (``None`` = NACK)."""
+
+    def __init__(self, frames=()):
+        self.frames = list(frames)
+        self.commands = []
+        self.reads = 0
+
+    def i2c_rdwr(self, msg):
+        if isinstance(msg, tuple):
+            self.commands.append(msg[2])
+            return
+        self.reads += 1
+        frame = self.frames.pop(0)
+        if frame is None:
+            raise OSError(121, "Remote I/O error")
+        msg.extend(frame)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+
+
+def _sensor(frames):
+    bus = FakeBus(frames)
+    clock = FakeClock()
+    return SHT30(bus, i2c_msg=FakeMsg, clock=clock, sleep=clock.sleep), bus, clock
+
+
+class TestDecode:
+    def test_decodes_frame(self):
+        t, h = decode(_frame(0x6666, 0x8000))
+        assert abs(t - 25.0) < 0.01
+        assert abs(h - 50.0) < 0.01
+
+    def test_crc_mismatch_raises(self):
+        frame = _frame(0x6666, 0x8000)
+        frame[2] ^= 0xFF
+        with pytest.raises(ValueError):
+            decode(frame)
+
+
+class TestSHT30:
+    def test_single_shot_waits_for_conversion(self):
+        sensor, bus, clock = _sensor([_frame(0x6666, 0x8000)])
+        t, h = sensor.read()
+        assert bus.commands == [0x2C06]
+        assert clock.slept == [0.02]
+        assert abs(t - 25.0) < 0.01
+
+    def test_periodic_start_uses_rate_command(self):
+        sensor, bus, _ = _sensor([])
+        sensor.start_periodic(10)
+        assert bus.commands == [0x2737]
+        assert sensor.periodic
+
+    def test_periodic_read_is_fetch_without_sleep(self):
+        sensor, bus, clock = _sensor([_frame(0x6666, 0x8000), _frame(0x6700, 0x8100)])
+        sensor.start_periodic(2)
+        sensor.read()
+        clock.now += 0.5
+        sensor.read()
+        assert bus.commands[1:] == [FETCH_DATA, FETCH_DATA]
+        assert clock.slept == []
+
+    def test_nack_before_next_sample_returns_previous(self):
+        sensor, bus, clock = _sensor([_frame(0x6666, 0x8000), None])
+        sensor.start_periodic(1)
+        first = sensor.read()
+        clock.now += 0.3
+        assert sensor.read() == first
+
+    def test_nack_right_after_start_returns_none(self):
+        sensor, bus, clock = _sensor([None])
+        sensor.start_periodic(1)
+        assert sensor.read() == (None, None)
+
+    def test_persistent_nack_raises(self):
+        sensor, bus, clock = _sensor([_frame(0x6666, 0x8000), None])
+        sensor.start_periodic(1)
+        sensor.read()
+        clock.now += 5
+        with pytest.raises(OSError):
+            sensor.read()
+
+    def test_stop_sends_break(self):
+        sensor, bus, _ = _sensor([])
+        sensor.start_periodic(1)
+        sensor.stop_periodic()
+        assert bus.commands[-1] == BREAK
+        assert not sensor.periodic
+
+    def test_unsupported_rate(self):
+        sensor, _, _ = _sensor([])
+        with pytest.raises(ValueError):
+            sensor.start_periodic(3)
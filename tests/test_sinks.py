@@ -0,0 +1,83 @@
+"""
+Tests for the output sinks and the per-sink fan-out.
+"""
+
+import json
+import socket
+import threading
+
+import pytest
+
+from sinks import CallableSink, FanOut, NDJSONFileSink, StatsDSink
+
+
+def _quiet():
+    return FanOut(log=lambda msg: None)
+
+
+class TestFanOut:
+    def test_every_sink_gets_every_payload(self, tmp_path):
+        got = []
+        fan = _quiet()
+        fan.add(CallableSink('mem', lambda p: got.append(p) or True))
+        fan.add(NDJSONFileSink(str(tmp_path / 'out.ndjson')))
+        fan.start()
+        for i in range(3):
+            fan.publish({'n': i})
+        assert all(worker.join(timeout=5) for worker in fan.workers.values())
+        fan.stop()
+        assert got == [{'n': i} for i in range(3)]
+        lines = (tmp_path / 'out.ndjson').read_text().splitlines()
+        assert [json.loads(line) for line in lines] == got
+
+    def test_slow_sink_does_not_stall_others(self):
+        release = threading.Event()
+        fast = []
+        fan = _quiet()
+        fan.add(CallableSink('slow', lambda p: release.wait(5)))
+        fan.add(CallableSink('fast', lambda p: fast.append(p) or True))
+        fan.start()
+        for i in range(5):
+            fan.publish({'n': i})
+        assert fan.workers['fast'].join(timeout=2)
+        assert len(fast) == 5
+        stats = fan.stats()
+        assert stats['slow']['depth'] == 5
+        assert stats['fast']['depth'] == 0 and stats['fast']['sent'] == 5
+        assert stats['fast']['last_lag'] is not None and stats['fast']['throughput'] > 0
+        release.set()
+        fan.stop()
+
+    def test_duplicate_names_rejected(self):
+        fan = _quiet()
+        fan.add(CallableSink('a', lambda p: True))
+        with pytest.raises(ValueError):
+            fan.add(CallableSink('a', lambda p: True))
+
+    def test_per_sink_worker_options(self):
+        fan = _quiet()
+        worker = fan.add(CallableSink('a', lambda p: True), maxsize=2, policy='coalesce')
+        assert worker.maxsize == 2 and worker.policy == 'coalesce'
+        assert worker.name == 'sink-a'
+
+
+class TestStatsDSink:
+    def test_gauges_over_udp(self):
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        receiver.bind(('127.0.0.1', 0))
+        receiver.settimeout(2)
+        sink = StatsDSink(*receiver.getsockname(), prefix='ws')
+        try:
+            assert sink.send({'timestamp': 1, 'temperature': 21.5, 'pressure': 1013.2,
+                              'sensor_indoor': 'ENV3'})
+            packet = receiver.recv(2048)
+        finally:
+            sink.close()
+            receiver.close()
+        assert packet == b'ws.pressure:1013.2|g\nws.temperature:21.5|g'
+
+    def test_packets_split_at_max_size(self):
+        sink = StatsDSink(prefix='w', max_packet=20)
+        packets = list(sink.packets({'aaaa': 1.0, 'bbbb': 2.0, 'cccc': 3.0}))
+        assert packets == [b'w.aaaa:1.0|g', b'w.bbbb:2.0|g', b'w.cccc:3.0|g']
+        assert all(len(p) <= 20 for p in packets)
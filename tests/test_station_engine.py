@@ -0,0 +1,197 @@
+"""
+Tests for the asyncio sampling engine, using plain callables as fake sensors.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from acquisition import Reading
+from station_engine import StationEngine
+
+
+def _engine(sensors, uploads, **kw):
+    kw.setdefault('log', lambda msg: None)
+    return StationEngine(sensors, uploads.append, **kw)
+
+
+class TestStationEngine:
+    def test_snapshot_contains_every_sensor(self):
+        uploads = []
+        engine = _engine({'a': lambda: 1.0, 'b': lambda: (2.0, 3.0)}, uploads, interval=0.01)
+        asyncio.run(engine.run(cycles=3))
+        engine.close()
+        assert len(uploads) == 3
+        assert uploads[0] == {'a': 1.0, 'b': (2.0, 3.0)}
+
+    def test_sensors_read_concurrently(self):
+        def slow():
+            time.sleep(0.1)
+            return 1
+
+        uploads = []
+        engine = _engine({'a': slow, 'b': slow, 'c': slow}, uploads, interval=1.0)
+        snapshot, wall = asyncio.run(engine.run_cycle())
+        engine.close()
+        assert snapshot == {'a': 1, 'b': 1, 'c': 1}
+        assert wall < 0.25
+
+    def test_stalled_sensor_does_not_delay_others(self):
+        release = threading.Event()
+        uploads = []
+        engine = _engine({'fast': lambda: 5, 'stuck': release.wait}, uploads,
+                         interval=0.05, read_timeout=0.02)
+        asyncio.run(engine.run(cycles=2))
+        release.set()
+        engine.close()
+        assert [u['fast'] for u in uploads] == [5, 5]
+        assert all(u['stuck'] is None for u in uploads)
+        assert max(engine.cycle_times) < 0.05
+
+    def test_sensor_exception_reported_as_none(self):
+        def broken():
+            raise OSError("I2C timeout")
+
+        uploads = []
+        engine = _engine({'broken': broken}, uploads, interval=0.01)
+        asyncio.run(engine.run(cycles=1))
+        engine.close()
+        assert uploads == [{'broken': None}]
+
+    def test_slow_upload_does_not_stretch_period(self):
+        def slow_upload(snapshot):
+            time.sleep(0.25)
+
+        # Periods long enough that a GC pause in a full test run is no overrun
+        engine = StationEngine({'a': lambda: 1}, slow_upload, interval=0.1,
+                               queue_size=100, log=lambda msg: None)
+        started = time.monotonic()
+        asyncio.run(engine.run(cycles=4))
+        engine.close()
+        # 4 uploads of 250 ms run serially on the upload task; sampling itself
+        # only needs 3 periods, so cycles are never held up by the network
+        assert engine.cycles == 4
+        assert engine.overruns == 0
+        assert time.monotonic() - started >= 1.0
+
+    def test_stats(self):
+        engine = _engine({'a': lambda: 1}, [], interval=0.01)
+        asyncio.run(engine.run(cycles=2))
+        engine.close()
+        stats = engine.stats()
+        assert stats['cycles'] == 2
+        assert stats['max_cycle'] >= stats['mean_cycle'] >= 0
+
+    def test_prepare_runs_before_each_upload(self):
+        events = []
+        engine = StationEngine({'a': lambda: 1}, lambda snap: events.append('upload'),
+                               interval=0.01, prepare=lambda: events.append('prepare'),
+                               log=lambda msg: None)
+        asyncio.run(engine.run(cycles=3))
+        engine.close()
+        assert events == ['prepare', 'upload'] * 3
+
+    def test_cycles_aligned_to_wall_clock(self):
+        uploads = []
+        engine = _engine({'a': lambda: 1}, uploads, interval=0.1)
+        asyncio.run(engine.run(cycles=3))
+        engine.close()
+        ticks = [u.tick for u in uploads]
+        assert [b.index - a.index for a, b in zip(ticks, ticks[1:])] == [1, 1]
+        assert all(abs(t.wall_time * 10 - round(t.wall_time * 10)) < 1e-6 for t in ticks)
+
+    def test_overrun_reported_as_skipped(self):
+        def slow():
+            time.sleep(0.25)
+            return 1
+
+        logs = []
+        engine = StationEngine({'a': slow}, lambda snap: None, interval=0.1, read_timeout=1.0,
+                               log=logs.append, stats_every=0)
+        asyncio.run(engine.run(cycles=2))
+        engine.close()
+        assert engine.stats()['skipped'] >= 1 and engine.overruns >= 1
+        assert any('skipped' in msg for msg in logs)
+
+    def test_per_sensor_rates(self):
+        counts = {'fast': 0, 'slow': 0}
+
+        def reader(name):
+            def read():
+                counts[name] += 1
+                return counts[name]
+            return read
+
+        uploads = []
+        engine = _engine({'fast': reader('fast'), 'slow': reader('slow')}, uploads,
+                         interval=0.1, rates={'slow': 0.3})
+        asyncio.run(engine.run(cycles=7))
+        engine.close()
+        assert counts['fast'] == 7
+        assert 2 <= counts['slow'] <= 3
+        # The slow sensor's latest reading rides along in every later cycle
+        assert uploads[-1]['slow'] == counts['slow']
+        assert engine.stats()['rates']['slow']['ticks'] == counts['slow']
+
+    def test_readings_stamped_at_acquisition(self):
+        def slow():
+            time.sleep(0.05)
+            return 1.0
+
+        uploads = []
+        engine = _engine({'a': slow}, uploads, interval=0.1, read_timeout=1.0)
+        asyncio.run(engine.run(cycles=1))
+        engine.close()
+        snapshot = uploads[0]
+        reading = snapshot.readings['a']
+        assert reading.value == 1.0
+        # Stamped when the read returned, before the snapshot was taken
+        assert 0 <= snapshot.age('a') < 0.5
+        assert reading.monotonic_ns <= snapshot.taken_ns
+        assert snapshot.cached == [] and snapshot.stale == []
+
+    def test_cached_and_stale_marked(self):
+        old = Reading((5.0, 80.0), time.monotonic_ns() - 30 * 10**9, time.time_ns() - 30 * 10**9)
+        uploads = []
+        engine = _engine({'fresh': lambda: 1.0, 'dht22': lambda: old}, uploads, interval=0.1,
+                         max_age={'dht22': 60})
+        asyncio.run(engine.run(cycles=2))
+        engine.close()
+        first, second = uploads
+        assert first['dht22'] == (5.0, 80.0) and first.age('dht22') >= 30
+        # Same acquisition handed out again: cached from the second cycle on
+        assert first.cached == [] and second.cached == ['dht22']
+        assert first.stale == second.stale == []
+        assert engine.stats()['cached'] == {'fresh': 0, 'dht22': 1}
+
+        uploads = []
+        engine = _engine({'dht22': lambda: old}, uploads, interval=0.1)
+        asyncio.run(engine.run(cycles=1))
+        engine.close()
+        # Default maximum age is two periods
+        assert uploads[0].stale == ['dht22'] and engine.stats()['stale'] == {'dht22': 1}
+
+    def test_cycle_reports_samples_of_its_own_slot(self):
+        count = [0]
+
+        def sample():
+            count[0] += 1
+            time.sleep(0.05)
+            return count[0]
+
+        uploads = []
+        engine = _engine({'s': sample}, uploads, interval=0.2, read_timeout=1.0,
+                         rates={'s': (0.2, 0.02)}, settle=0.03)
+        asyncio.run(engine.run(cycles=3))
+        engine.close()
+        # The cycle starts after the sample tick and waits for its read (the
+        # first cycle may come before the first sample, depending on the start)
+        values = [u['s'] for u in uploads if u['s'] is not None]
+        assert len(values) >= 2 and values == list(range(count[0] - len(values) + 1, count[0] + 1))
+        assert engine.schedule.offset == pytest.approx(0.05)
+
+    def test_rates_for_unknown_sensor_rejected(self):
+        with pytest.raises(ValueError):
+            _engine({'a': lambda: 1}, [], rates={'b': 5})
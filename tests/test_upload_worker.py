@@ -0,0 +1,173 @@
+"""
+Tests for the background upload worker and its overflow policies.
+"""
+
+import threading
+import time
+
+import pytest
+
+from outbox import Outbox
+from upload_worker import UploadWorker, coalesce_payloads
+
+
+def _quiet(**kw):
+    kw.setdefault('log', lambda msg: None)
+    return kw
+
+
+class Gate:
+    """send() that blocks until released, recording what it was given."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.sent = []
+
+    def __call__(self, payload):
+        self.started.set()
+        self.release.wait(5)
+        self.sent.append(payload)
+        return True
+
+
+class TestUploadWorker:
+    def test_sends_in_order(self):
+        sent = []
+        worker = UploadWorker(lambda p: sent.append(p) or True, **_quiet()).start()
+        for i in range(5):
+            worker.submit({'n': i})
+        assert worker.join(timeout=5)
+        worker.stop()
+        assert sent == [{'n': i} for i in range(5)]
+        assert worker.stats()['sent'] == 5
+
+    def test_submit_does_not_wait_for_send(self):
+        gate = Gate()
+        worker = UploadWorker(gate, **_quiet()).start()
+        worker.submit({'n': 0})
+        assert gate.started.wait(5)
+        started = time.monotonic()
+        for i in range(1, 10):
+            worker.submit({'n': i})
+        assert time.monotonic() - started < 0.5
+        assert worker.depth() == 10
+        gate.release.set()
+        assert worker.join(timeout=5)
+        worker.stop()
+
+    def test_failed_send_is_retried(self):
+        answers = iter([False, False, True])
+        sent = []
+
+        def send(payload):
+            ok = next(answers, True)
+            if ok:
+                sent.append(payload)
+            return ok
+
+        worker = UploadWorker(send, retry_delay=0.01, **_quiet()).start()
+        worker.submit({'n': 0})
+        assert worker.join(timeout=5)
+        worker.stop()
+        assert sent == [{'n': 0}]
+        assert worker.failures == 2
+
+    def test_send_exception_counts_as_failure(self):
+        calls = []
+
+        def send(payload):
+            calls.append(payload)
+            if len(calls) == 1:
+                raise OSError("boom")
+            return True
+
+        worker = UploadWorker(send, retry_delay=0.01, **_quiet()).start()
+        worker.submit({'n': 0})
+        assert worker.join(timeout=5)
+        worker.stop()
+        assert worker.failures == 1 and worker.sent == 1
+
+    def test_drop_oldest_keeps_in_flight_head(self):
+        gate = Gate()
+        worker = UploadWorker(gate, maxsize=3, **_quiet()).start()
+        worker.submit({'n': 0})
+        assert gate.started.wait(5)
+        for i in range(1, 6):
+            worker.submit({'n': i})
+        assert worker.dropped == 3
+        gate.release.set()
+        assert worker.join(timeout=5)
+        worker.stop()
+        assert [p['n'] for p in gate.sent] == [0, 4, 5]
+
+    def test_coalesce_merges_oldest_waiting(self):
+        gate = Gate()
+        worker = UploadWorker(gate, maxsize=3, policy='coalesce', **_quiet()).start()
+        worker.submit({'timestamp': 0, 'temperature': 0.0})
+        assert gate.started.wait(5)
+        for i in range(1, 5):
+            worker.submit({'timestamp': i, 'temperature': float(i)})
+        assert worker.coalesced == 2
+        gate.release.set()
+        assert worker.join(timeout=5)
+        worker.stop()
+        # Readings 1, 2, 3 were folded into one entry carrying the latest timestamp
+        assert gate.sent == [
+            {'timestamp': 0, 'temperature': 0.0},
+            {'timestamp': 3, 'temperature': 2.0},
+            {'timestamp': 4, 'temperature': 4.0},
+        ]
+
+    def test_spill_to_outbox(self, tmp_path):
+        box = Outbox(str(tmp_path / 'outbox.db'))
+        gate = Gate()
+        worker = UploadWorker(gate, maxsize=2, policy='spill', spill=box, **_quiet()).start()
+        worker.submit({'n': 0})
+        assert gate.started.wait(5)
+        for i in range(1, 5):
+            worker.submit({'n': i})
+        assert worker.spilled == 3
+        assert [p['n'] for _, p in box.peek()] == [1, 2, 3]
+        gate.release.set()
+        assert worker.join(timeout=5)
+        worker.stop()
+        box.close()
+
+    def test_stop_spills_remaining(self, tmp_path):
+        box = Outbox(str(tmp_path / 'outbox.db'))
+        worker = UploadWorker(lambda p: True, policy='spill', spill=box, **_quiet())
+        worker.submit({'n': 0})
+        worker.submit({'n': 1})
+        worker.stop()
+        assert len(box) == 2
+        box.close()
+
+    def test_depth_and_age(self):
+        now = [100.0]
+        worker = UploadWorker(lambda p: True, clock=lambda: now[0], **_quiet())
+        assert worker.oldest_age() is None
+        worker.submit({'n': 0})
+        now[0] = 112.0
+        worker.submit({'n': 1})
+        stats = worker.stats()
+        assert stats['depth'] == 2 and stats['max_depth'] == 2
+        assert stats['oldest_age'] == 12.0
+
+    def test_policy_validation(self):
+        with pytest.raises(ValueError):
+            UploadWorker(lambda p: True, policy='block')
+        with pytest.raises(ValueError):
+            UploadWorker(lambda p: True, policy='spill')
+
+
+class TestCoalescePayloads:
+    def test_weighted_average_and_newest_metadata(self):
+        merged = coalesce_payloads({'timestamp': 1, 'temperature': 20.0, 'sensor_indoor': 'ENV3'},
+                                   {'timestamp': 2, 'temperature': 23.0, 'sensor_indoor': 'ENV3'},
+                                   older_weight=2)
+        assert merged == {'timestamp': 2, 'temperature': 21.0, 'sensor_indoor': 'ENV3'}
+
+    def test_fields_missing_on_one_side_kept(self):
+        merged = coalesce_payloads({'pressure': 1000.0}, {'temperature': 20.0})
+        assert merged == {'pressure': 1000.0, 'temperature': 20.0}
@@ -0,0 +1,270 @@
+"""
+Tests for the HTTP upload transports.
+"""
+
+import gzip
+import json
+import socket
+
+import requests
+
+from outbox import Outbox
+from payload import build_payload
+from payload_codec import MEDIA_TYPE
+from retry import UploadRetry
+from tests.stand_in_server import StandInServer
+from uploader import BatchTransport, DNSCache, UploadSession, encode_batch
+
+
+class FakeClock:
+    def __init__(self, step=0.0):
+        self.now = 0.0
+        self.step = step
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
+
+
+class TestEncodeBatch:
+    def test_json_array_gzip(self):
+        body, headers = encode_batch([{'n': 1}, {'n': 2}])
+        assert headers == {'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}
+        assert json.loads(gzip.decompress(body)) == [{'n': 1}, {'n': 2}]
+
+    def test_ndjson_uncompressed(self):
+        body, headers = encode_batch([{'n': 1}, {'n': 2}], fmt='ndjson', compress=False)
+        assert headers == {'Content-Type': 'application/x-ndjson'}
+        assert body == b'{"n":1}\n{"n":2}\n'
+
+    def test_unknown_format(self):
+        try:
+            encode_batch([], fmt='xml')
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("expected ValueError")
+
+
+class TestBatchTransport:
+    def test_grows_on_fast_round_trips(self):
+        t = BatchTransport('http://x', initial_batch=4, max_batch=10, target_rtt=2.0,
+                           clock=FakeClock(step=0.1), log=lambda m: None)
+        t._adapt(0.1, True)
+        assert t.batch_size == 8
+        t._adapt(0.1, True)
+        assert t.batch_size == 10
+
+    def test_shrinks_on_slow_or_failed_round_trips(self):
+        t = BatchTransport('http://x', initial_batch=8, min_batch=2, log=lambda m: None)
+        t._adapt(5.0, True)
+        assert t.batch_size == 4
+        t._adapt(0.1, False)
+        assert t.batch_size == 2
+        t._adapt(0.1, False)
+        assert t.batch_size == 2
+
+    def test_keeps_size_inside_target_band(self):
+        t = BatchTransport('http://x', initial_batch=8, target_rtt=2.0, log=lambda m: None)
+        t._adapt(1.5, True)
+        assert t.batch_size == 8
+
+    def test_network_error_returns_false(self, tmp_path):
+        logged = []
+        t = BatchTransport('http://127.0.0.1:9/nothing', timeout=1, log=logged.append)
+        assert t.send_batch([{'n': 1}]) is False
+        assert logged and 'Network error' in logged[0]
+
+    def test_due_on_size_or_age(self, tmp_path):
+        box = Outbox(str(tmp_path / 'outbox.db'))
+        t = BatchTransport('http://x', initial_batch=3, max_delay=3600, log=lambda m: None)
+        assert not t.due(box)
+        box.append({'n': 0})
+        assert not t.due(box)
+        t.max_delay = 0
+        assert t.due(box)
+        t.max_delay = 3600
+        box.append({'n': 1})
+        box.append({'n': 2})
+        assert t.due(box)
+        box.close()
+
+
+class TestAgainstStandInServer:
+    def test_single_object_still_accepted(self):
+        with StandInServer() as server:
+            response = requests.post(server.url, json={'temperature': 21.5}, timeout=5)
+            assert response.status_code == 200
+            assert server.received == [{'temperature': 21.5}]
+
+    def test_json_batch_gzip(self, tmp_path):
+        box = Outbox(str(tmp_path / 'outbox.db'))
+        for i in range(25):
+            box.append({'temperature': 20.0 + i / 10, 'timestamp': 1000 + i})
+        with StandInServer() as server:
+            t = BatchTransport(server.url, initial_batch=10, log=lambda m: None)
+            assert t.flush(box) == 25
+            assert [p['timestamp'] for p in server.received] == list(range(1000, 1025))
+            assert all(r['headers']['Content-Encoding'] == 'gzip' for r in server.requests)
+            # Fast local round trips grow the batch: 10, then 15 remaining in one request
+            assert len(server.requests) == 2
+        assert len(box) == 0
+        assert t.payloads_sent == 25 and t.batches_sent == 2
+        box.close()
+
+    def test_ndjson_batch(self, tmp_path):
+        box = Outbox(str(tmp_path / 'outbox.db'))
+        for i in range(5):
+            box.append({'n': i})
+        with StandInServer() as server:
+            t = BatchTransport(server.url, fmt='ndjson', initial_batch=5, log=lambda m: None)
+            assert t.flush(box) == 5
+            assert server.received == [{'n': i} for i in range(5)]
+            assert server.requests[0]['headers']['Content-Type'] == 'application/x-ndjson'
+        box.close()
+
+    def test_failed_batch_stays_in_outbox(self, tmp_path):
+        box = Outbox(str(tmp_path / 'outbox.db'))
+        for i in range(4):
+            box.append({'n': i})
+        t = BatchTransport('http://127.0.0.1:9/nothing', timeout=1, initial_batch=4, log=lambda m: None)
+        assert t.flush(box) == 0
+        assert len(box) == 4
+        assert t.batch_size == 2
+        box.close()
+
+
+class TestUploadSession:
+    def test_connection_is_reused(self):
+        with StandInServer() as server:
+            session = UploadSession(server.url, timeout=5)
+            for i in range(5):
+                assert session.post(json={'n': i}).status_code == 200
+            stats = session.stats()
+            session.close()
+        assert server.received == [{'n': i} for i in range(5)]
+        assert stats['requests'] == 5
+        assert stats['handshakes'] == 1
+        assert stats['reuse_ratio'] == 0.8
+        assert stats['max_latency'] >= stats['p50_latency'] > 0
+
+    def test_warm_opens_connection_for_next_post(self):
+        with StandInServer() as server:
+            session = UploadSession(server.url, timeout=5)
+            assert session.warm()
+            session.post(json={'n': 1})
+            stats = session.stats()
+            session.close()
+        assert stats['handshakes'] == 1 and stats['warmups'] == 1
+        assert stats['requests'] == 2 and stats['heads'] == 1
+        assert session.reused == 1
+
+    def test_dns_cached_between_connections(self):
+        calls = []
+
+        def resolve(host, port, *args):
+            calls.append(host)
+            return socket.getaddrinfo('127.0.0.1', port, *args)
+
+        with StandInServer() as server:
+            url = server.url.replace('127.0.0.1', 'station.test')
+            session = UploadSession(url, timeout=5, resolve=resolve)
+            session.post(json={'n': 1})
+            session.session.close()  # drop the pooled connection
+            session.post(json={'n': 2})
+            session.close()
+        assert calls == ['station.test']
+        assert session.handshakes == 2
+        assert session.dns.hits == 1
+
+    def test_dns_entry_expires(self):
+        now = [0.0]
+        calls = []
+
+        def resolve(host, port, *args):
+            calls.append(host)
+            return [(None, None, None, '', ('10.0.0.%d' % len(calls), port))]
+
+        cache = DNSCache(ttl=10, clock=lambda: now[0], resolve=resolve)
+        assert cache.lookup('h', 80) == '10.0.0.1'
+        assert cache.lookup('h', 80) == '10.0.0.1'
+        now[0] = 11
+        assert cache.lookup('h', 80) == '10.0.0.2'
+
+    def test_batch_transport_over_session(self, tmp_path):
+        box = Outbox(str(tmp_path / 'outbox.db'))
+        for i in range(6):
+            box.append({'n': i})
+        with StandInServer() as server:
+            session = UploadSession(server.url, timeout=5)
+            t = BatchTransport(server.url, session=session, initial_batch=2, max_batch=2,
+                               log=lambda m: None)
+            assert t.flush(box) == 6
+            session.close()
+        assert session.handshakes == 1 and session.requests == 3
+        box.close()
+
+    def test_binary_negotiated_from_accept_post(self):
+        with StandInServer() as server:
+            session = UploadSession(server.url, timeout=5)
+            session.warm()
+            assert not session.accepts_binary()
+            server.accept_post = f"application/json, {MEDIA_TYPE}"
+            session.warm()
+            assert session.accepts_binary()
+            session.close()
+
+
+class TestBinaryBatch:
+    def test_binary_batch_round_trip(self, tmp_path):
+        box = Outbox(str(tmp_path / 'outbox.db'))
+        payloads = [build_payload(21.0 + i / 10, 45.0, 1013.2, None, None, timestamp=1000 + i)
+                    for i in range(4)]
+        for p in payloads:
+            box.append(p)
+        with StandInServer() as server:
+            t = BatchTransport(server.url, fmt='binary', initial_batch=4, log=lambda m: None)
+            assert t.flush(box) == 4
+            assert server.received == payloads
+            assert server.requests[0]['headers']['Content-Type'] == MEDIA_TYPE
+        box.close()
+
+    def test_unencodable_batch_sent_as_json(self, tmp_path):
+        box = Outbox(str(tmp_path / 'outbox.db'))
+        payloads = [{'n': i} for i in range(2)]
+        for p in payloads:
+            box.append(p)
+        logged = []
+        with StandInServer() as server:
+            t = BatchTransport(server.url, fmt='binary', initial_batch=2, log=logged.append)
+            assert t.flush(box) == 2
+            assert server.received == payloads
+            assert server.requests[0]['headers']['Content-Type'] == 'application/json'
+        assert t.fallbacks == 1 and 'sending JSON' in logged[0]
+        assert len(box) == 0
+        box.close()
+
+    def test_stale_mark_survives_binary_format(self, tmp_path):
+        box = Outbox(str(tmp_path / 'outbox.db'))
+        payload = build_payload(21.0, 45.0, 1013.2, 5.5, 80.1, timestamp=1000)
+        payload.update({'acquired': {'dht22': 900000}, 'age': {'dht22': 100.0}, 'stale': ['dht22']})
+        box.append(payload)
+        with StandInServer() as server:
+            t = BatchTransport(server.url, fmt='binary', initial_batch=1, log=lambda m: None)
+            assert t.flush(box) == 1
+            assert server.received == [payload]
+        assert t.fallbacks == 1
+        box.close()
+
+    def test_batch_retried_through_upload_retry(self, tmp_path):
+        box = Outbox(str(tmp_path / 'outbox.db'))
+        for i in range(3):
+            box.append({'n': i})
+        with StandInServer() as server:
+            server.inject(503)
+            retry = UploadRetry(attempts=2, base_delay=0.01, log=lambda m: None)
+            t = BatchTransport(server.url, retry=retry, initial_batch=3, log=lambda m: None)
+            assert t.flush(box) == 3
+            assert server.received == [{'n': i} for i in range(3)]
+        assert retry.retries == 1 and t.batches_sent == 1
+        box.close()
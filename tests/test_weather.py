@@ -8,7 +8,6 @@ sensors, no network required.
 
 import sys
 import types
-import math
 
 # ---------------------------------------------------------------------------
 # Stub out hardware / network modules before any project code is imported
@@ -19,6 +18,13 @@ def _make_stub(name):
     sys.modules[name] = mod
     return mod
 
+# The real requests package is used when installed (the uploader tests talk
+# to a local stand-in server); it is only stubbed when missing.
+try:
+    import requests  # noqa: F401
+except ImportError:
+    pass
+
 for _mod_name in (
     "smbus2", "board", "adafruit_dht",
     "RPi", "RPi.GPIO", "requests",
@@ -36,101 +42,23 @@ smbus2_stub.i2c_msg = type("i2c_msg", (), {
 
 # requests needs a post stub
 requests_stub = sys.modules["requests"]
-requests_stub.post = lambda *a, **kw: None
+if not hasattr(requests_stub, "post"):
+    requests_stub.post = lambda *a, **kw: None
 
 # RPi.GPIO sub-module
 rpigpio = _make_stub("RPi.GPIO")
 sys.modules["RPi"].GPIO = rpigpio
 
+from crc import crc8  # noqa: E402  (shared hardware-free module)
+from derived import (  # noqa: E402
+    celsius_to_fahrenheit, fahrenheit_to_celsius, hpa_to_inhg, inhg_to_hpa,
+    ms_to_kmh, kmh_to_ms, dew_point, heat_index, wind_chill, degrees_to_compass,
+)
+
 # ---------------------------------------------------------------------------
-# Pure helper implementations (extracted inline so tests don't import
-# hardware-initialising module-level code from env3_dht22_combined.py)
+# SHT30 conversion and sanity-check helpers
 # ---------------------------------------------------------------------------
 
-def crc8(data: list) -> int:
-    """CRC-8 / MAXIM — same algorithm used by SHT30 sensor."""
-    crc = 0xFF
-    for byte in data:
-        crc ^= byte
-        for _ in range(8):
-            if crc & 0x80:
-                crc = (crc << 1) ^ 0x31
-            else:
-                crc = crc << 1
-    return crc & 0xFF
-
-
-def celsius_to_fahrenheit(celsius: float) -> float:
-    return celsius * 9 / 5 + 32
-
-
-def fahrenheit_to_celsius(fahrenheit: float) -> float:
-    return (fahrenheit - 32) * 5 / 9
-
-
-def hpa_to_inhg(hpa: float) -> float:
-    return hpa * 0.02953
-
-
-def inhg_to_hpa(inhg: float) -> float:
-    return inhg / 0.02953
-
-
-def ms_to_kmh(ms: float) -> float:
-    return ms * 3.6
-
-
-def kmh_to_ms(kmh: float) -> float:
-    return kmh / 3.6
-
-
-def dew_point(temp_c: float, humidity_rh: float) -> float:
-    """Magnus formula dew point (°C)."""
-    a, b = 17.27, 237.7
-    gamma = (a * temp_c / (b + temp_c)) + math.log(humidity_rh / 100.0)
-    return b * gamma / (a - gamma)
-
-
-def heat_index(temp_c: float, humidity_rh: float) -> float:
-    """Steadman heat index (°C). Valid for T ≥ 27°C and RH ≥ 40%."""
-    T = celsius_to_fahrenheit(temp_c)
-    R = humidity_rh
-    HI = (
-        -42.379
-        + 2.04901523 * T
-        + 10.14333127 * R
-        - 0.22475541 * T * R
-        - 0.00683783 * T * T
-        - 0.05481717 * R * R
-        + 0.00122874 * T * T * R
-        + 0.00085282 * T * R * R
-        - 0.00000199 * T * T * R * R
-    )
-    return fahrenheit_to_celsius(HI)
-
-
-def wind_chill(temp_c: float, wind_kmh: float) -> float:
-    """Environment Canada / NWS wind-chill index (°C). Valid T ≤ 10°C, v ≥ 4.8 km/h."""
-    return (
-        13.12
-        + 0.6215 * temp_c
-        - 11.37 * wind_kmh ** 0.16
-        + 0.3965 * temp_c * wind_kmh ** 0.16
-    )
-
-
-def degrees_to_compass(degrees: float) -> str:
-    """Convert wind direction in degrees to 16-point compass label."""
-    dirs = [
-        "N", "NNE", "NE", "ENE",
-        "E", "ESE", "SE", "SSE",
-        "S", "SSW", "SW", "WSW",
-        "W", "WNW", "NW", "NNW",
-    ]
-    idx = int((degrees % 360 + 11.25) / 22.5) % 16
-    return dirs[idx]
-
-
 def sht30_raw_to_celsius(raw: int) -> float:
     """Convert a raw 16-bit SHT30 temperature register value to °C."""
     return -45 + 175 * raw / 65535.0
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Background upload worker: the sampling side hands readings over without
+ever touching the network.
+
+``submit()`` puts a payload on a bounded in-memory queue and returns at
+once. A dedicated thread takes payloads off the queue in order and calls
+``send(payload) -> bool``; a payload that fails stays at the head and is
+retried after ``retry_delay`` seconds. When the queue is full the
+overflow policy decides what gives:
+
+- ``drop_oldest``: discard the oldest queued payload
+- ``coalesce``: merge the two oldest payloads into one (see ``coalesce_payloads``)
+- ``spill``: move the oldest payload to ``spill.append()``, e.g. the SQLite outbox
+"""
+
+import threading
+import time
+from collections import deque
+
+POLICIES = ('drop_oldest', 'coalesce', 'spill')
+
+
+def coalesce_payloads(older, newer, older_weight=1, newer_weight=1):
+    """Merge two payloads into one, weighting numeric fields by sample count.
+
+    Numbers present in both are averaged (rounded to one decimal like the
+    payload builder does); everything else, ``timestamp`` included, comes
+    from the newer payload.
+    """
+    merged = dict(older)
+    merged.update(newer)
+    total = older_weight + newer_weight
+    for key, new in newer.items():
+        old = older.get(key)
+        if (key != 'timestamp' and isinstance(new, (int, float)) and isinstance(old, (int, float))
+                and not isinstance(new, bool) and not isinstance(old, bool)):
+            merged[key] = round((old * older_weight + new * newer_weight) / total, 1)
+    return merged
+
+
+class UploadWorker:
+    """Bounded producer/consumer queue in front of a blocking ``send``."""
+
+    def __init__(self, send, maxsize=60, policy='drop_oldest', spill=None,
+                 coalesce=coalesce_payloads, retry_delay=5.0, name='uploader', clock=time.monotonic, log=print):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overflow policy {policy!r}, expected one of {POLICIES}")
+        if policy == 'spill' and spill is None:
+            raise ValueError("The spill policy needs a spill target")
+        self.send = send
+        self.maxsize = maxsize
+        self.policy = policy
+        self.spill = spill
+        self.coalesce = coalesce
+        self.retry_delay = retry_delay
+        self.name = name
+        self._clock = clock
+        self.log = log
+
+        # Entries are [enqueued_at, weight, payload]
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+
+        self.submitted = 0
+        self.sent = 0
+        self.failures = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.spilled = 0
+        self.max_depth = 0
+        self.last_lag = None
+        self.max_lag = 0.0
+        self._started_at = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            if self._started_at is None:
+                self._started_at = self._clock()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def _spill(self, payload):
+        try:
+            self.spill.append(payload)
+            self.spilled += 1
+            return True
+        except Exception as e:
+            self.log(f"Upload queue: spill failed, dropping reading: {e}")
+            self.dropped += 1
+            return False
+
+    def _make_room(self):
+        # Called with the lock held and the queue full. The head may be in
+        # flight on the worker thread; policies only touch the entries behind
+        # it when there are any, so a send is never merged or spilled twice.
+        if self.policy == 'coalesce' and len(self._queue) >= 3:
+            _, older_weight, older = self._queue[1]
+            enqueued, newer_weight, newer = self._queue[2]
+            del self._queue[1]
+            self._queue[1] = [enqueued, older_weight + newer_weight,
+                              self.coalesce(older, newer, older_weight, newer_weight)]
+            self.coalesced += 1
+            return
+        index = 1 if len(self._queue) > 1 else 0
+        _, _, payload = self._queue[index]
+        del self._queue[index]
+        if self.policy == 'spill':
+            self._spill(payload)
+        else:
+            self.dropped += 1
+
+    def submit(self, payload):
+        """Queue ``payload`` for upload; never blocks on the network."""
+        with self._cond:
+            if self.maxsize and len(self._queue) >= self.maxsize:
+                self._make_room()
+            self._queue.append([self._clock(), 1, payload])
+            self.submitted += 1
+            self.max_depth = max(self.max_depth, len(self._queue))
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                entry = self._queue[0]
+            try:
+                ok = self.send(entry[2])
+            except Exception as e:
+                self.log(f"Upload error: {e}")
+                ok = False
+            with self._cond:
+                if ok:
+                    if self._queue and self._queue[0] is entry:
+                        self._queue.popleft()
+                    self.sent += 1
+                    # Time from submit() to delivery
+                    self.last_lag = self._clock() - entry[0]
+                    self.max_lag = max(self.max_lag, self.last_lag)
+                    continue
+                self.failures += 1
+                # Back off, but wake up at once on stop()
+                self._cond.wait_for(lambda: self._stopping, timeout=self.retry_delay)
+
+    def depth(self):
+        with self._cond:
+            return len(self._queue)
+
+    def oldest_age(self):
+        """Seconds the head of the queue has been waiting, or ``None`` if empty."""
+        with self._cond:
+            return self._clock() - self._queue[0][0] if self._queue else None
+
+    def stats(self):
+        """Return queue figures for logging."""
+        with self._cond:
+            now = self._clock()
+            depth = len(self._queue)
+            age = now - self._queue[0][0] if self._queue else None
+        uptime = now - self._started_at if self._started_at is not None else 0.0
+        return {
+            'depth': depth,
+            'max_depth': self.max_depth,
+            'oldest_age': age,
+            'submitted': self.submitted,
+            'sent': self.sent,
+            'failures': self.failures,
+            'dropped': self.dropped,
+            'coalesced': self.coalesced,
+            'spilled': self.spilled,
+            'last_lag': self.last_lag,
+            'max_lag': self.max_lag,
+            'throughput': self.sent / uptime if uptime > 0 else None,
+        }
+
+    def join(self, timeout=None):
+        """Wait until the queue is empty; True if it emptied within ``timeout``."""
+        end = None if timeout is None else self._clock() + timeout
+        while self.depth():
+            if end is not None and self._clock() >= end:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stop(self, timeout=5.0):
+        """Stop the worker; whatever is still queued goes to ``spill`` if there is one."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        with self._cond:
+            left = list(self._queue)
+            self._queue.clear()
+        if self.spill is not None:
+            for _, _, payload in left:
+                self._spill(payload)
+        elif left:
+            self.dropped += len(left)
+            self.log(f"Upload queue: {len(left)} reading(s) discarded on stop")
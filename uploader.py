@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+HTTP upload transport for the weather station.
+
+``UploadSession`` is a pooled keep-alive ``requests.Session``: uploads reuse
+one TCP+TLS connection instead of paying a handshake per reading, the
+server address is resolved once per ``dns_ttl``, and ``warm()`` re-opens
+the connection while the sensors are being read so the POST itself does not
+wait for it. It counts handshakes, connection reuse and request latency.
+
+``BatchTransport`` posts several readings in one request, as a JSON array,
+NDJSON or packed binary records (``payload_codec``), gzip-compressed. The
+batch size adapts to the measured round-trip time: quick answers double it
+(up to ``max_batch``), slow answers or failures halve it.
+"""
+
+import gzip
+import json
+import socket
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from payload_codec import MEDIA_TYPE, accepts_binary, encode_records
+from retry import PAYLOAD_ERRORS, REJECTED
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'binary': MEDIA_TYPE,
+}
+
+
+class DNSCache:
+    """Remember ``getaddrinfo`` results for ``ttl`` seconds."""
+
+    def __init__(self, ttl=300.0, clock=time.monotonic, resolve=socket.getaddrinfo):
+        self.ttl = ttl
+        self._clock = clock
+        self._resolve = resolve
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+
+    def lookup(self, host, port):
+        """Return an address for ``host``, resolving it again once the entry expired."""
+        key = (host, port)
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now < entry[1]:
+                self.hits += 1
+                return entry[0]
+        infos = self._resolve(host, port, 0, socket.SOCK_STREAM)
+        address = infos[0][4][0]
+        with self._lock:
+            self.lookups += 1
+            self._entries[key] = (address, now + self.ttl)
+        return address
+
+    def forget(self, host, port):
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections resolve through a DNSCache and report new sockets."""
+
+    def __init__(self, dns, on_connect, **kwargs):
+        self._dns = dns
+        self._on_connect = on_connect
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        dns, on_connect = self._dns, self._on_connect
+
+        class _Connect:
+            def _new_conn(self):
+                host = self._dns_host
+                try:
+                    self._dns_host = dns.lookup(host, self.port)
+                    try:
+                        sock = super()._new_conn()
+                    except Exception:
+                        # The cached address may be stale; resolve again next time
+                        dns.forget(host, self.port)
+                        raise
+                finally:
+                    # TLS hostname checks use self.host, never the resolved address
+                    self._dns_host = host
+                on_connect()
+                return sock
+
+        class _HTTPConnection(_Connect, HTTPConnection):
+            pass
+
+        class _HTTPSConnection(_Connect, HTTPSConnection):
+            pass
+
+        class _HTTPPool(HTTPConnectionPool):
+            ConnectionCls = _HTTPConnection
+
+        class _HTTPSPool(HTTPSConnectionPool):
+            ConnectionCls = _HTTPSConnection
+
+        self.poolmanager.pool_classes_by_scheme = {'http': _HTTPPool, 'https': _HTTPSPool}
+
+
+class UploadSession:
+    """Keep-alive HTTP session with a bounded pool and connection metrics.
+
+    Offers ``post``/``head`` like ``requests`` so it can be passed wherever
+    the module is used as ``session``. ``pool_size`` bounds the number of
+    idle connections kept per host.
+    """
+
+    def __init__(self, url, pool_size=2, dns_ttl=300.0, timeout=10,
+                 latency_window=100, clock=time.monotonic, resolve=socket.getaddrinfo):
+        self.url = url
+        self.timeout = timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.dns = DNSCache(ttl=dns_ttl, clock=clock, resolve=resolve)
+
+        self.session = requests.Session()
+        adapter = _PooledAdapter(self.dns, self._connected, pool_connections=1,
+                                 pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.handshakes = 0
+        self.requests = 0
+        self.reused = 0
+        self.warmups = 0
+        self.heads = 0
+        # Accept-Post from the last warm-up; advertises the compact encoding
+        self.accept_post = None
+        self.latencies = deque(maxlen=latency_window)
+
+    def _connected(self):
+        with self._lock:
+            self.handshakes += 1
+
+    def request(self, method, url=None, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        before = self.handshakes
+        started = self._clock()
+        try:
+            return self.session.request(method, url or self.url, **kwargs)
+        finally:
+            latency = self._clock() - started
+            with self._lock:
+                self.requests += 1
+                if method == 'HEAD':
+                    self.heads += 1
+                if self.handshakes == before:
+                    self.reused += 1
+                self.latencies.append(latency)
+
+    def post(self, url=None, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def head(self, url=None, **kwargs):
+        return self.request('HEAD', url, **kwargs)
+
+    def warm(self):
+        """Make sure a connection to the server is open before the next upload.
+
+        Sends a HEAD request; the status does not matter, only that the
+        pooled connection is (re)established. Returns False on network errors.
+        Each call costs a request, so callers warm only before a likely
+        upload; HEADs are counted apart in ``stats()``.
+        """
+        self.warmups += 1
+        try:
+            response = self.head(allow_redirects=False)
+        except requests.RequestException:
+            return False
+        self.accept_post = response.headers.get('Accept-Post')
+        return True
+
+    def accepts_binary(self):
+        """True if the server advertised the compact payload encoding."""
+        return accepts_binary(self.accept_post)
+
+    def stats(self):
+        """Return handshake, reuse and latency figures for logging."""
+        with self._lock:
+            latencies = sorted(self.latencies)
+            requests_made = self.requests
+            reused = self.reused
+            handshakes = self.handshakes
+        return {
+            'requests': requests_made,
+            'handshakes': handshakes,
+            'reuse_ratio': reused / requests_made if requests_made else None,
+            'mean_latency': sum(latencies) / len(latencies) if latencies else None,
+            'p50_latency': latencies[len(latencies) // 2] if latencies else None,
+            'max_latency': latencies[-1] if latencies else None,
+            'dns_lookups': self.dns.lookups,
+            'dns_hits': self.dns.hits,
+            'warmups': self.warmups,
+            'heads': self.heads,
+        }
+
+    def close(self):
+        self.session.close()
+
+
+def encode_batch(payloads, fmt='json', compress=True):
+    """Return ``(body, headers)`` for a list of payloads."""
+    if fmt == 'json':
+        body = json.dumps(payloads, separators=(',', ':')).encode('utf-8')
+    elif fmt == 'ndjson':
+        body = ''.join(json.dumps(p, separators=(',', ':')) + '\n' for p in payloads).encode('utf-8')
+    elif fmt == 'binary':
+        body = encode_records(payloads)
+    else:
+        raise ValueError(f"Unknown batch format {fmt!r}, expected one of {sorted(CONTENT_TYPES)}")
+    headers = {'Content-Type': CONTENT_TYPES[fmt]}
+    if compress:
+        body = gzip.compress(body, compresslevel=6)
+        headers['Content-Encoding'] = 'gzip'
+    return body, headers
+
+
+class BatchTransport:
+    """POST readings in batches and adapt the batch size to the round-trip time."""
+
+    def __init__(self, url, session=None, fmt='json', compress=True, timeout=10,
+                 initial_batch=10, min_batch=1, max_batch=500, target_rtt=2.0,
+                 max_delay=300.0, retry=None, clock=time.monotonic, log=print):
+        self.url = url
+        self.session = session if session is not None else requests
+        # Optional retry.UploadRetry; without it a batch gets one attempt
+        self.retry = retry
+        self.fmt = fmt
+        self.compress = compress
+        self.timeout = timeout
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.target_rtt = target_rtt
+        self.max_delay = max_delay
+        self._clock = clock
+        self.log = log
+
+        self.batch_size = max(min_batch, min(initial_batch, max_batch))
+        self.last_rtt = None
+        self.batches_sent = 0
+        self.payloads_sent = 0
+        self.bytes_sent = 0
+        self.fallbacks = 0
+
+    def _adapt(self, rtt, ok):
+        if not ok or rtt > self.target_rtt:
+            self.batch_size = max(self.min_batch, self.batch_size // 2)
+        elif rtt < self.target_rtt / 2:
+            self.batch_size = min(self.max_batch, self.batch_size * 2)
+
+    def send_batch(self, payloads):
+        """POST ``payloads`` as one request; True if the server accepted them.
+
+        A batch the configured format cannot encode (e.g. a payload outside
+        the binary schema) is sent as JSON instead.
+        """
+        try:
+            body, headers = encode_batch(payloads, self.fmt, self.compress)
+        except ValueError as e:
+            self.log(f"✗ Batch not encodable as {self.fmt}, sending JSON: {e}")
+            self.fallbacks += 1
+            body, headers = encode_batch(payloads, 'json', self.compress)
+        if self.retry is not None:
+            ok = self.retry.send(lambda: self.session.post(
+                self.url, data=body, headers=headers, timeout=self.timeout))
+            self.last_rtt = self.retry.last_rtt
+            self._adapt(self.last_rtt if self.last_rtt is not None else 0.0, ok)
+            return self._sent(ok, payloads, body)
+        started = self._clock()
+        try:
+            response = self.session.post(self.url, data=body, headers=headers, timeout=self.timeout)
+            ok = response.status_code == 200
+            if not ok:
+                self.log(f"✗ Server error: {response.status_code} - {response.text[:200]}")
+                if response.status_code in PAYLOAD_ERRORS:
+                    ok = REJECTED
+        except Exception as e:
+            self.log(f"✗ Network error: {e}")
+            ok = False
+        self.last_rtt = self._clock() - started
+        self._adapt(self.last_rtt, ok)
+        return self._sent(ok, payloads, body)
+
+    def _sent(self, ok, payloads, body):
+        if ok:
+            self.batches_sent += 1
+            self.payloads_sent += len(payloads)
+            self.bytes_sent += len(body)
+        return ok
+
+    def due(self, outbox):
+        """True when the outbox holds a full batch or its oldest entry is ``max_delay`` old."""
+        if len(outbox) >= self.batch_size:
+            return True
+        age = outbox.oldest_age()
+        return age is not None and age >= self.max_delay
+
+    def flush(self, outbox):
+        """Drain the outbox in adaptive batches; returns the number delivered."""
+        return outbox.drain_batches(self.send_batch, lambda: self.batch_size)